@@ -0,0 +1,74 @@
+import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.analytics import crud_analytics
+from app.db import get_db
+from app.deps import get_auth_user
+from app.schema.analytics import UtmGroupBy, UtmReport
+from app.schema.user import MeUser
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Longest date range one report may cover
+MAX_REPORT_DAYS = 366
+DEFAULT_REPORT_DAYS = 30
+
+
+@router.get("/utm", response_model=UtmReport)
+async def utm_report(
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    group_by: List[UtmGroupBy] = Query(
+        [UtmGroupBy.UTM_SOURCE, UtmGroupBy.UTM_MEDIUM, UtmGroupBy.UTM_CAMPAIGN]
+    ),
+    utm_source: Optional[str] = None,
+    utm_medium: Optional[str] = None,
+    utm_campaign: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: MeUser = Depends(get_auth_user),
+) -> UtmReport:
+    """
+    Leads, qualified leads, quoted and converted leads and accepted revenue
+    per UTM source / medium / campaign (and `day`, if grouped by it), for
+    leads created between `date_from` and `date_to` (the last 30 days by
+    default). Served from daily rollups refreshed in the background;
+    `pending_days` counts days in the range with changes not rolled up yet.
+    Pass an empty `utm_*` value to select leads without it.
+    """
+    date_to = date_to or datetime.datetime.utcnow().date()
+    date_from = date_from or date_to - datetime.timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    if (date_to - date_from).days >= MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Date range can't be longer than {MAX_REPORT_DAYS} days",
+        )
+    group_by = list(dict.fromkeys(group_by))
+    utm = {
+        key: value
+        for key, value in (
+            ("utm_source", utm_source),
+            ("utm_medium", utm_medium),
+            ("utm_campaign", utm_campaign),
+        )
+        if value is not None
+    }
+    items, totals = await crud_analytics.utm_report(
+        db, date_from=date_from, date_to=date_to, group_by=group_by, utm=utm
+    )
+    refreshed_at, pending_days = await crud_analytics.freshness(
+        db, date_from=date_from, date_to=date_to
+    )
+    return UtmReport(
+        date_from=date_from,
+        date_to=date_to,
+        group_by=group_by,
+        items=items,
+        totals=totals,
+        refreshed_at=refreshed_at,
+        pending_days=pending_days,
+    )
@@ -1,13 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.audit import crud_audit
+from app.crud.user import user_crud
 from app.db import get_db
 from app.deps import get_auth_user
-from app.models import AuditLog
-from app.schema.auditlog import AuditLogFilters, AuditLogPagination, AuditLogResponse
+from app.models import AuditLog, EntityType
+from app.schema.auditlog import (
+    AuditEntityState,
+    AuditLogFilters,
+    AuditLogPagination,
+    AuditLogResponse,
+    AuditTimeline,
+    AuditTimelineEvent,
+    ExportFormat,
+)
 from app.schema.user import MeUser
+from app.util.audit.export import MEDIA_TYPES, encode_export
+from app.util.fields import item_value, parse_fields, select_fields, sparse_page
+from app.util.pagination import encode_cursor
+from app.util.setting import get_settings
+
+settings = get_settings()
 
 router = APIRouter(prefix="/audit-logs", tags=["Audit Logs"])
 
@@ -16,6 +35,9 @@ router = APIRouter(prefix="/audit-logs", tags=["Audit Logs"])
 async def get_audit_logs(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    with_total: bool = False,
+    fields: Optional[str] = None,
     filters: AuditLogFilters = Depends(AuditLogFilters),
     db: AsyncSession = Depends(get_db),
     current_user: MeUser = Depends(get_auth_user),
@@ -23,18 +45,159 @@ async def get_audit_logs(
     """
     Retrieve audit logs.
     Only accessible by Admin and Manager roles.
+    Pass the returned `next_cursor` as `cursor` to fetch the next page;
+    `with_total` adds an exact count of the matching logs, `total` is null
+    otherwise.
+    `fields` is a comma separated list of the audit log fields to return
+    (`id` is always included); the user is only loaded when listed.
     """
-    logs = await crud_audit.get_multi(db, skip=skip, limit=limit, filters=filters)
+    names = parse_fields(fields, AuditLogResponse.model_fields)
+    logs = await crud_audit.get_multi(
+        db,
+        skip=skip,
+        limit=limit + 1,
+        filters=filters,
+        cursor=cursor,
+        columns=names and select_fields(names, "created_at"),
+    )
+    has_next = len(logs) > limit
+    logs = logs[:limit]
+    total = await crud_audit.count(db, filters) if with_total else None
+    page = dict(
+        total=total,
+        page=skip,
+        limit=limit,
+        has_next=has_next,
+        has_prev=skip > 0 or cursor is not None,
+        next_cursor=(
+            encode_cursor(
+                item_value(logs[-1], "created_at"), item_value(logs[-1], "id")
+            )
+            if has_next
+            else None
+        ),
+    )
+    if names is not None:
+        return sparse_page(logs, names, **page)
+    return AuditLogPagination(items=jsonable_encoder(logs), **page)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_audit_logs(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    compress: bool = Query(False, alias="gzip"),
+    filters: AuditLogFilters = Depends(AuditLogFilters),
+    db: AsyncSession = Depends(get_db),
+    current_user: MeUser = Depends(get_auth_user),
+) -> StreamingResponse:
+    """
+    Stream every audit log matching the filters, oldest first, as NDJSON or
+    CSV, optionally gzipped.
+    """
+    bind = db.bind
+    chunk_size = int(getattr(settings, "AUDIT_EXPORT_CHUNK_SIZE", 1000))
+
+    async def body():
+        # get_db's session is closed before the body is sent, use our own
+        async with AsyncSession(bind=bind) as session:
+            rows = crud_audit.stream(session, filters, chunk_size=chunk_size)
+            async for chunk in encode_export(rows, export_format.value, compress):
+                yield chunk
+
+    filename = f"audit_logs.{export_format.value}" + (".gz" if compress else "")
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if compress else MEDIA_TYPES[export_format.value],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/search", response_model=AuditLogPagination)
+async def search_audit_logs(
+    q: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = 100,
+    filters: AuditLogFilters = Depends(AuditLogFilters),
+    db: AsyncSession = Depends(get_db),
+    current_user: MeUser = Depends(get_auth_user),
+) -> AuditLogPagination:
+    """
+    Search audit log actions and contexts for `q`, best matches first.
+    The other filters narrow the search the same way as on the list endpoint.
+    Matches are not counted, `total` is null.
+    """
+    logs = await crud_audit.search(db, q, filters=filters, skip=skip, limit=limit + 1)
+    has_next = len(logs) > limit
+    logs = logs[:limit]
     return AuditLogPagination(
         items=jsonable_encoder(logs),
-        total=len(logs),
         page=skip,
         limit=limit,
-        has_next=len(logs) == limit,
+        has_next=has_next,
         has_prev=skip > 0,
     )
 
 
+@router.get(
+    "/entities/{entity_type}/{entity_id}/timeline", response_model=AuditTimeline
+)
+async def get_entity_timeline(
+    entity_type: EntityType,
+    entity_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: MeUser = Depends(get_auth_user),
+) -> AuditTimeline:
+    """
+    History of one entity, newest first.
+    Pass the returned `next_cursor` as `cursor` to fetch older events.
+    """
+    rows = await crud_audit.get_timeline(
+        db, entity_type, entity_id, limit=limit + 1, cursor=cursor
+    )
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    usernames = await user_crud.get_usernames(db, (row["user_id"] for row in rows))
+    return AuditTimeline(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        items=[
+            AuditTimelineEvent(**row, username=usernames.get(row["user_id"]))
+            for row in rows
+        ],
+        limit=limit,
+        has_next=has_next,
+        next_cursor=(
+            encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_next else None
+        ),
+    )
+
+
+@router.get(
+    "/entities/{entity_type}/{entity_id}/state", response_model=AuditEntityState
+)
+async def get_entity_state(
+    entity_type: EntityType,
+    entity_id: int,
+    at: Optional[datetime.datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: MeUser = Depends(get_auth_user),
+) -> AuditEntityState:
+    """
+    Reconstruct an entity's state at a point in time (now by default) from its
+    latest audit snapshot and the field-level diffs recorded after it.
+    `state` is null when the entity had been deleted by then.
+    """
+    at = at or datetime.datetime.utcnow()
+    if at.tzinfo:
+        at = at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    state = await crud_audit.get_state(db, entity_type, entity_id, at)
+    if not state:
+        raise HTTPException(status_code=404, detail="No audit history for entity")
+    return state
+
+
 @router.get("/{audit_id}", response_model=AuditLogResponse)
 async def get_audit_log(
     audit_id: int,
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -7,14 +9,22 @@ from app.db import get_db
 from app.deps import get_auth_user
 from app.models import LeadStatus
 from app.schema.lead import (  # Pydantic schemas for leads
+    LeadBulkStatusResult,
+    LeadBulkUpdateStatus,
     LeadCreate,
     LeadFilters,
+    LeadImportResult,
     LeadOut,
     LeadPagination,
+    LeadStatusRejection,
     LeadUpdate,
     LeadUpdateStatus,
+    LeadWithDuplicates,
 )
 from app.schema.user import MeUser
+from app.util.fields import item_value, parse_fields, select_fields, sparse_page
+from app.util.lead_import import detect_format, import_leads
+from app.util.pagination import SORT_PATTERN, TOTAL_PATTERN, encode_cursor
 
 router = APIRouter(prefix="/leads", tags=["Leads"])
 
@@ -23,32 +33,153 @@ router = APIRouter(prefix="/leads", tags=["Leads"])
 async def read_leads(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: str = Query("created_at", pattern=SORT_PATTERN),
+    total: Optional[str] = Query(None, pattern=TOTAL_PATTERN),
+    fields: Optional[str] = None,
     filters: LeadFilters = Depends(LeadFilters),
     db: AsyncSession = Depends(get_db),
     user=Depends(get_auth_user),
 ):
-    leads = await crud_lead.get_multi(db, skip=skip, limit=limit, filters=filters)
-    total = len(leads)
-    return LeadPagination(
-        items=jsonable_encoder(leads),
+    """
+    List leads, most recently created (or updated, with `sort`) first.
+    Pass the returned `next_cursor` as `cursor` to fetch the next page.
+    `total=exact` counts every matching lead in the same query,
+    `total=estimate` takes the database's cheaper row estimate; without
+    either `total` is null.
+    Searching with `q` orders by relevance and pages with `skip` instead.
+    `fields` is a comma separated list of the lead fields to return (`id` is
+    always included); only those columns are read.
+    """
+    if cursor and filters.q:
+        raise HTTPException(status_code=400, detail="cursor can't be used with q")
+    names = parse_fields(fields, LeadOut.model_fields)
+    leads, count = await crud_lead.get_page(
+        db,
+        skip=skip,
+        limit=limit + 1,
+        filters=filters,
+        cursor=cursor,
+        sort=sort,
         total=total,
+        columns=names and select_fields(names, sort),
+    )
+    has_next = len(leads) > limit
+    leads = leads[:limit]
+    page = dict(
+        total=count,
         page=skip,
         limit=limit,
-        has_next=total == limit,  # if total is equal to limit, probably there next page
-        has_prev=skip > 0,
+        has_next=has_next,
+        has_prev=skip > 0 or cursor is not None,
+        next_cursor=(
+            encode_cursor(
+                item_value(leads[-1], sort), item_value(leads[-1], "id"), sort
+            )
+            if has_next and not filters.q
+            else None
+        ),
     )
+    if names is not None:
+        return sparse_page(leads, names, **page)
+    return LeadPagination(items=jsonable_encoder(leads), **page)
+
+
+async def check_duplicates(
+    db: AsyncSession,
+    lead_in: dict,
+    reject: bool = False,
+    exclude_id: Optional[int] = None,
+) -> List[int]:
+    """
+    Ids of existing leads ``lead_in`` looks like a duplicate of, refused with
+    a 409 when ``reject`` is set. It is a check, not a constraint: two
+    requests saving the same lead at once can both pass it.
+    """
+    duplicates = await crud_lead.find_duplicates(
+        db,
+        name=lead_in.get("name"),
+        email=lead_in.get("email"),
+        phone=lead_in.get("phone"),
+        exclude_id=exclude_id,
+    )
+    if duplicates and reject:
+        raise HTTPException(
+            status_code=409,
+            detail="Lead duplicates existing lead(s) "
+            + ", ".join(map(str, duplicates)),
+        )
+    return duplicates
 
 
-@router.post("/", response_model=LeadOut)
+@router.post("/", response_model=LeadWithDuplicates)
 async def create_lead(
     lead_in: LeadCreate,
+    reject_duplicates: bool = False,
     db: AsyncSession = Depends(get_db),
     user: MeUser = Depends(get_auth_user),
 ):
+    """
+    Create a lead. Existing leads it looks like a duplicate of are listed
+    in `duplicates`; with `reject_duplicates=true` it is refused with a 409
+    instead.
+    """
     from app.models import Lead  # import the model
 
+    duplicates = await check_duplicates(db, lead_in.model_dump(), reject_duplicates)
+
     lead = Lead(**lead_in.dict())
-    return await crud_lead.create(db, obj_in=lead, user_id=user.id)
+    lead = await crud_lead.create(db, obj_in=lead, user_id=user.id)
+    return LeadWithDuplicates.model_validate(lead).model_copy(
+        update={"duplicates": duplicates}
+    )
+
+
+@router.post("/import", response_model=LeadImportResult)
+async def import_leads_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+    user: MeUser = Depends(get_auth_user),
+):
+    """
+    Bulk create leads from a CSV (with a header row) or NDJSON file.
+    The format is taken from the file name unless `format` is given.
+    Invalid rows are skipped and reported by line number.
+    """
+    return await import_leads(
+        db,
+        file.file,
+        format=format or detect_format(file.filename, file.content_type),
+        user_id=user.id,
+        source=file.filename or "upload",
+    )
+
+
+@router.put("/bulk/status", response_model=LeadBulkStatusResult)
+async def update_leads_status(
+    leads_in: LeadBulkUpdateStatus,
+    db: AsyncSession = Depends(get_db),
+    user: MeUser = Depends(get_auth_user),
+):
+    """
+    Move up to 1000 leads to the same status at once, under the same rules
+    as a single status change. Leads that can't be moved are listed in
+    `rejected` with the reason; the others are updated.
+    """
+    if leads_in.status == LeadStatus.NEW:
+        raise HTTPException(
+            status_code=400, detail="You can't change status lead to NEW"
+        )
+    updated, rejected = await crud_lead.update_status_many(
+        db, ids=leads_in.ids, status=leads_in.status, user_id=user.id
+    )
+    return LeadBulkStatusResult(
+        updated=updated,
+        rejected=[
+            LeadStatusRejection(id=id, reason=reason) for id, reason in rejected.items()
+        ],
+    )
 
 
 @router.get("/{lead_id}", response_model=LeadOut)
@@ -63,18 +194,39 @@ async def read_lead(
     return lead
 
 
-@router.put("/{lead_id}", response_model=LeadOut)
+@router.put("/{lead_id}", response_model=LeadWithDuplicates)
 async def update_lead(
     lead_id: int,
     lead_in: LeadUpdate,
+    reject_duplicates: bool = False,
     db: AsyncSession = Depends(get_db),
     user: MeUser = Depends(get_auth_user),
 ):
+    """
+    Update a lead. When its name, email or phone changes, the leads it now
+    looks like a duplicate of are listed in `duplicates`; with
+    `reject_duplicates=true` the change is refused with a 409 instead.
+    """
     lead = await crud_lead.get(db, id=lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
-    return await crud_lead.update(
-        db, db_obj=lead, obj_in=lead_in.dict(exclude_unset=True), user_id=user.id
+    changes = lead_in.dict(exclude_unset=True)
+    duplicates: List[int] = []
+    if {"name", "email", "phone"} & changes.keys():
+        duplicates = await check_duplicates(
+            db,
+            {
+                "name": lead.name,
+                "email": lead.email,
+                "phone": lead.phone,
+                **changes,
+            },
+            reject_duplicates,
+            exclude_id=lead.id,
+        )
+    lead = await crud_lead.update(db, db_obj=lead, obj_in=changes, user_id=user.id)
+    return LeadWithDuplicates.model_validate(lead).model_copy(
+        update={"duplicates": duplicates}
     )
 
 
@@ -1,45 +1,142 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud import crud_lead, crud_quotation
 from app.db import get_db
 from app.deps import get_auth_user, user_role_check
-from app.models import LeadStatus, QuotationLineItem, QuotationStatus
+from app.models import LeadStatus, QuotationStatus
 from app.schema import MeUser
 from app.schema.quotation import (  # Pydantic schemas for quotations
     QuotationCreate,
     QuotationFilters,
+    QuotationLineItem,
+    QuotationLineItemsPatch,
     QuotationOut,
     QuotationPagination,
+    QuotationSummary,
+    QuotationSummaryPagination,
     QuotationUpdate,
     QuotationUpdateStatus,
 )
-from app.util.email.index import render_invoice_html, send_email
+from app.util.email.outbox import email_sender, enqueue
+from app.util.email.render import invoice_context, render_invoice, render_pool
+from app.util.fields import item_value, parse_fields, select_fields, sparse_page
+from app.util.pagination import SORT_PATTERN, TOTAL_PATTERN, encode_cursor
 
 router = APIRouter(prefix="/quotations", tags=["Quotations"])
 
 
+async def read_page(
+    db: AsyncSession,
+    *,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    sort: str,
+    total: Optional[str],
+    filters: QuotationFilters,
+    names: Optional[List[str]],
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """A page of quotations with only ``names`` loaded, and its paging fields"""
+    quotations, count = await crud_quotation.get_page(
+        db,
+        skip=skip,
+        limit=limit + 1,
+        filters=filters,
+        cursor=cursor,
+        sort=sort,
+        total=total,
+        columns=names and select_fields(names, sort),
+    )
+    has_next = len(quotations) > limit
+    quotations = quotations[:limit]
+    page = dict(
+        total=count,
+        page=skip,
+        limit=limit,
+        has_next=has_next,
+        has_prev=skip > 0 or cursor is not None,
+        next_cursor=(
+            encode_cursor(
+                item_value(quotations[-1], sort),
+                item_value(quotations[-1], "id"),
+                sort,
+            )
+            if has_next
+            else None
+        ),
+    )
+    return quotations, page
+
+
 @router.get("/", response_model=QuotationPagination)
 async def read_quotations(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: str = Query("created_at", pattern=SORT_PATTERN),
+    total: Optional[str] = Query(None, pattern=TOTAL_PATTERN),
+    fields: Optional[str] = None,
     filters: QuotationFilters = Depends(QuotationFilters),
     db: AsyncSession = Depends(get_db),
     user=Depends(get_auth_user),
 ):
-    quotations = await crud_quotation.get_multi(
-        db, skip=skip, limit=limit, filters=filters
-    )
-    total = len(quotations)
-    return QuotationPagination(
-        items=jsonable_encoder(quotations),
+    """
+    List quotations, most recently created (or updated, with `sort`) first.
+    Pass the returned `next_cursor` as `cursor` to fetch the next page.
+    `total=exact` counts every matching quotation in the same query,
+    `total=estimate` takes the database's cheaper row estimate; without
+    either `total` is null.
+    `fields` is a comma separated list of the quotation fields to return
+    (`id` is always included); line items are only loaded when listed.
+    `/quotations/summary` lists quotations without their line items.
+    """
+    names = parse_fields(fields, QuotationOut.model_fields)
+    quotations, page = await read_page(
+        db,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
         total=total,
-        page=skip,
+        filters=filters,
+        names=names,
+    )
+    if names is not None:
+        return sparse_page(quotations, names, **page)
+    return QuotationPagination(items=jsonable_encoder(quotations), **page)
+
+
+@router.get("/summary", response_model=QuotationSummaryPagination)
+async def read_quotation_summaries(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: str = Query("created_at", pattern=SORT_PATTERN),
+    total: Optional[str] = Query(None, pattern=TOTAL_PATTERN),
+    filters: QuotationFilters = Depends(QuotationFilters),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(get_auth_user),
+):
+    """
+    List quotations as `/quotations/` does, with a line item count instead of
+    the line items, which are then fetched per quotation from
+    `/quotations/{id}/line-items`.
+    """
+    quotations, page = await read_page(
+        db,
+        skip=skip,
         limit=limit,
-        has_next=total == limit,  # if total is equal to limit, probably there next page
-        has_prev=skip > 0,
+        cursor=cursor,
+        sort=sort,
+        total=total,
+        filters=filters,
+        names=list(QuotationSummary.model_fields),
     )
+    return QuotationSummaryPagination(items=quotations, **page)
 
 
 @router.post("/", response_model=QuotationOut)
@@ -51,17 +148,13 @@ async def create_quotation(
     lead = await crud_lead.get(db, id=quotation_in.lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
-    from app.models import Quotation  # import the model
+    from app.models import Quotation, QuotationLineItem  # import the models
 
     line_items = [QuotationLineItem(**item.dict()) for item in quotation_in.line_items]
     # remove line_items from the quotation_in dict
     quotation_in_dict = quotation_in.dict()
     quotation_in_dict.pop("line_items")
-    quotation = Quotation(
-        **quotation_in_dict,
-        status=QuotationStatus.DRAFT,
-        total_price=sum(item.price * item.quantity for item in line_items),
-    )
+    quotation = Quotation(**quotation_in_dict, status=QuotationStatus.DRAFT)
     quotation.line_items = line_items
     return await crud_quotation.create(db, obj_in=quotation, user_id=user.id)
 
@@ -78,6 +171,19 @@ async def read_quotation(
     return quotation
 
 
+@router.get("/{quotation_id}/line-items", response_model=List[QuotationLineItem])
+async def read_quotation_line_items(
+    quotation_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: MeUser = Depends(get_auth_user),
+):
+    quotation = await crud_quotation.get(db, id=quotation_id, line_items=False)
+    if not quotation:
+        raise HTTPException(status_code=404, detail="Quotation not found")
+    items = await crud_quotation.get_line_items(db, quotation_id)
+    return list(items.values())
+
+
 @router.put("/{quotation_id}/line-items", response_model=QuotationOut)
 async def update_quotation_line_items(
     quotation_id: int,
@@ -97,8 +203,9 @@ async def update_quotation_line_items(
         )
 
     # check all line_items in quotation_in are in quotation.line_items
+    line_item_ids = {line_item.id for line_item in quotation.line_items}
     for item in quotation_in.line_items:
-        if item.id not in [line_item.id for line_item in quotation.line_items]:
+        if item.id not in line_item_ids:
             raise HTTPException(status_code=404, detail="Line item not found")
 
     return await crud_quotation.update_line_items(
@@ -109,6 +216,52 @@ async def update_quotation_line_items(
     )
 
 
+@router.patch("/{quotation_id}/line-items", response_model=QuotationOut)
+async def patch_quotation_line_items(
+    quotation_id: int,
+    patch_in: QuotationLineItemsPatch,
+    db: AsyncSession = Depends(get_db),
+    user: MeUser = Depends(get_auth_user),
+):
+    """
+    Add, update and remove line items of a draft quotation in one request.
+    `update` entries change only the fields they give; `total_price` is
+    recomputed from the resulting line items.
+    """
+    quotation = await crud_quotation.get(
+        db, id=quotation_id, line_items=False, for_update=True
+    )
+    if not quotation:
+        raise HTTPException(status_code=404, detail="Quotation not found")
+    if quotation.status != QuotationStatus.DRAFT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Quotation is not in draft status, current status: {quotation.status.value}",
+        )
+
+    changed = [item.id for item in patch_in.update] + patch_in.remove
+    if len(set(changed)) < len(changed):
+        raise HTTPException(
+            status_code=400,
+            detail="A line item can only be updated or removed once per patch",
+        )
+    items = await crud_quotation.get_line_items(db, quotation_id)
+    missing = [id for id in changed if id not in items]
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Line item not found: {', '.join(map(str, missing))}",
+        )
+
+    return await crud_quotation.patch_line_items(
+        db,
+        db_obj=quotation,
+        items=items,
+        patch=patch_in.model_dump(),
+        user_id=user.id,
+    )
+
+
 @router.put("/{quotation_id}/status", response_model=QuotationOut)
 async def update_quotation_status(
     quotation_id: int,
@@ -193,19 +346,17 @@ async def send_quotation(
 
     if lead.email is None or lead.status.value != LeadStatus.QUALIFIED.value:
         raise HTTPException(status_code=400, detail="Lead is not qualified")
-    html = render_invoice_html(
-        {"lead_name": lead.name, **quotation.__dict__}, "invoice_template.html"
-    )
-    response = send_email("Your Invoice #3", lead.email, html)
-    if response["status"] == "error":
-        raise HTTPException(status_code=400, detail=response["message"])
+    html = await render_pool.run(render_invoice, invoice_context(quotation, lead.name))
+    # queued in the same transaction as the status change, delivered in the
+    # background by email_sender
+    enqueue(db, to_email=lead.email, subject="Your Invoice #3", html_body=html)
     updated_quotation = await crud_quotation.update(
         db,
         db_obj=quotation,
         obj_in={"status": QuotationStatus.SENT.value},
         user_id=user.id,
     )
-    # send email to the client
+    email_sender.wake()
     return {"detail": "Quotation sent successfully", "quotation": updated_quotation}
 
 
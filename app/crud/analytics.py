@@ -0,0 +1,78 @@
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import LeadAttributionDaily, LeadAttributionDirtyDay
+from app.schema.analytics import UtmGroupBy, UtmReportRow
+
+METRICS = ["leads", "qualified", "quoted", "converted", "revenue"]
+UTM_KEYS = ["utm_source", "utm_medium", "utm_campaign"]
+
+
+def _report_row(values: Dict[str, Any]) -> UtmReportRow:
+    leads = values["leads"]
+    return UtmReportRow(
+        **{
+            key: value if value != "" or key not in UTM_KEYS else None
+            for key, value in values.items()
+        },
+        conversion_rate=values["converted"] / leads if leads else 0.0,
+    )
+
+
+class CRUDAnalytics:
+    async def utm_report(
+        self,
+        db: AsyncSession,
+        *,
+        date_from: datetime.date,
+        date_to: datetime.date,
+        group_by: List[UtmGroupBy],
+        utm: Optional[Dict[str, str]] = None,
+    ) -> Tuple[List[UtmReportRow], UtmReportRow]:
+        """
+        Lead and conversion totals per ``group_by`` keys over the days
+        ``date_from`` to ``date_to``, read from the daily rollups only.
+        ``utm`` filters on exact UTM values. Returns the rows and their totals.
+        """
+        rollup = LeadAttributionDaily
+        keys = [getattr(rollup, key.value) for key in group_by]
+        query = (
+            select(
+                *keys,
+                *(func.sum(getattr(rollup, name)).label(name) for name in METRICS),
+            )
+            .where(rollup.day >= date_from, rollup.day <= date_to)
+            .group_by(*keys)
+            .order_by(*keys)
+        )
+        for key, value in (utm or {}).items():
+            query = query.where(getattr(rollup, key) == value)
+        rows = [dict(row) for row in (await db.execute(query)).mappings()]
+        totals = {name: sum(row[name] or 0 for row in rows) for name in METRICS}
+        for row in rows:
+            row.update({name: row[name] or 0 for name in METRICS})
+        return [_report_row(row) for row in rows], _report_row(totals)
+
+    async def freshness(
+        self, db: AsyncSession, *, date_from: datetime.date, date_to: datetime.date
+    ) -> Tuple[Optional[datetime.datetime], int]:
+        """Last refresh of the range's rollups and its days still to refresh"""
+        refreshed_at = await db.execute(
+            select(func.max(LeadAttributionDaily.refreshed_at)).where(
+                LeadAttributionDaily.day >= date_from,
+                LeadAttributionDaily.day <= date_to,
+            )
+        )
+        pending = await db.execute(
+            select(func.count(LeadAttributionDirtyDay.day)).where(
+                LeadAttributionDirtyDay.day >= date_from,
+                LeadAttributionDirtyDay.day <= date_to,
+            )
+        )
+        return refreshed_at.scalar(), pending.scalar_one()
+
+
+crud_analytics = CRUDAnalytics()
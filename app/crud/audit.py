@@ -1,16 +1,23 @@
-import asyncio
-import json
-from typing import List, Optional
+import datetime
+from typing import Any, AsyncIterator, List, Mapping, Optional
 
 from fastapi import Depends
-from sqlalchemy import select
+from sqlalchemy import func, insert, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.expression import Select
 
 from app.db import AsyncSessionLocal
-from app.models import AuditLog
+from app.models import AuditLog, EntityType, User, audit_log_search
 from app.schema import AuditLogCreate
-from app.schema.auditlog import AuditLogFilters
+from app.schema.auditlog import AuditEntityState, AuditLogFilters
+from app.util.audit.diff import apply_diff
+from app.util.audit.writer import audit_writer
+from app.util.pagination import apply_keyset
+from app.util.search import RANK_WINDOW
+from app.util.setting import get_settings
+
+settings = get_settings()
 
 
 class CRUDAudit:
@@ -25,14 +32,97 @@ class CRUDAudit:
         filters: AuditLogFilters = Depends(AuditLogFilters),
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> List[Any]:
+        """
+        Get audit logs newest first. With a cursor the page is fetched by
+        seeking on the (created_at, id) index and ``skip`` is ignored.
+        With ``columns`` only those are selected, and ``user`` only loaded
+        when listed; the items are row mappings instead of ``AuditLog``
+        objects then.
+        """
+        if columns is None:
+            query = select(AuditLog).options(selectinload(AuditLog.user))
+        else:
+            names = [name for name in columns if name != "user"]
+            if "user" in columns:
+                names.append("user_id")
+            query = select(*(getattr(AuditLog, name) for name in dict.fromkeys(names)))
+        query = self._apply_filters(query, filters, db.bind.dialect.name)
+        query = apply_keyset(query, AuditLog.created_at, AuditLog.id, cursor)
+        if not cursor:
+            query = query.offset(skip)
+        result = await db.execute(query.limit(limit))
+        if columns is None:
+            return result.scalars().all()
+        logs = [dict(row) for row in result.mappings()]
+        if "user" in columns and logs:
+            users = User.__table__
+            result = await db.execute(
+                select(
+                    users.c.id,
+                    users.c.username,
+                    users.c.role_id,
+                    users.c.created_at,
+                    users.c.updated_at,
+                ).where(users.c.id.in_({log["user_id"] for log in logs}))
+            )
+            by_id = {row["id"]: dict(row) for row in result.mappings()}
+            for log in logs:
+                log["user"] = by_id.get(log["user_id"])
+        return logs
+
+    async def count(self, db: AsyncSession, filters: AuditLogFilters) -> int:
+        query = select(func.count(AuditLog.id))
+        query = self._apply_filters(query, filters, db.bind.dialect.name)
+        result = await db.execute(query)
+        return result.scalar_one()
+
+    async def search(
+        self,
+        db: AsyncSession,
+        q: str,
+        filters: AuditLogFilters,
+        skip: int = 0,
+        limit: int = 100,
     ) -> List[AuditLog]:
+        """
+        Audit logs whose action or context contains ``q``, best matches first.
+        Without other filters only the newest matches are ranked, see
+        ``TextSearch.ranked``.
+        """
+        dialect = db.bind.dialect.name
+        query = select(AuditLog).options(selectinload(AuditLog.user))
+        query = self._apply_filters(query, filters, dialect)
+        # other filters already narrow the matches, rank all of them then
+        window = None if filters.model_dump(exclude_none=True) else RANK_WINDOW
+        query = audit_log_search.ranked(query, dialect, q, window=window)
+        query = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+        result = await db.execute(query.offset(skip).limit(limit))
+        return result.scalars().all()
+
+    async def stream(
+        self, db: AsyncSession, filters: AuditLogFilters, chunk_size: int = 1000
+    ) -> AsyncIterator[List[Mapping[str, Any]]]:
+        """
+        Yield matching audit rows oldest first, ``chunk_size`` plain row
+        mappings at a time, from a server-side cursor. No ORM objects are
+        built, so memory stays flat however many rows match.
+        """
         query = (
-            select(AuditLog)
-            .options(selectinload(AuditLog.user))
-            .order_by(AuditLog.created_at.desc())
-            .offset(skip)
-            .limit(limit)
+            select(*AuditLog.__table__.columns, User.username)
+            .join(User, AuditLog.user_id == User.id)
+            .order_by(AuditLog.created_at, AuditLog.id)
         )
+        query = self._apply_filters(query, filters, db.bind.dialect.name)
+        result = await db.stream(query)
+        async for rows in result.mappings().partitions(chunk_size):
+            yield rows
+
+    def _apply_filters(
+        self, query: Select, filters: AuditLogFilters, dialect: str
+    ) -> Select:
         if filters:
             if filters.entity_type:
                 query = query.where(AuditLog.entity_type == filters.entity_type)
@@ -41,34 +131,125 @@ class CRUDAudit:
             if filters.user_id:
                 query = query.where(AuditLog.user_id == filters.user_id)
             if filters.action:
-                query = query.where(AuditLog.action.ilike(f"%{filters.action}%"))
+                query = query.where(
+                    audit_log_search.contains(dialect, filters.action, ["action"])
+                )
             if filters.context:
-                query = query.where(AuditLog.context.ilike(f"%{filters.context}%"))
+                query = query.where(
+                    audit_log_search.contains(dialect, filters.context, ["context"])
+                )
             if filters.date_from:
                 query = query.where(AuditLog.created_at >= filters.date_from)
             if filters.date_to:
                 query = query.where(AuditLog.created_at <= filters.date_to)
-        result = await db.execute(query)
-        return result.scalars().all()
+        return query
 
     async def create(self, obj_in: AuditLogCreate) -> None:
-        # Create a new session for the background task
-        asyncio.create_task(self.create_async(obj_in))
+        # Queue the event, the audit writer compacts and inserts it with its batch
+        await audit_writer.submit(obj_in)
 
     async def create_async(self, obj_in: AuditLogCreate) -> AuditLog:
         async with AsyncSessionLocal() as session:
-            before_values = json.dumps(obj_in.before_values)
-            after_values = json.dumps(obj_in.after_values)
-            db_obj = AuditLog(
-                **obj_in.model_dump(exclude={"before_values", "after_values"}),
-                before_values=before_values,
-                after_values=after_values,
+            (row,) = await audit_writer.compactor.compact(
+                session, [obj_in.model_dump()]
             )
+            db_obj = AuditLog(**row)
             session.add(db_obj)
             await session.commit()
             await session.refresh(db_obj)
             return db_obj
 
+    async def create_many(
+        self, db: AsyncSession, objs_in: List[AuditLogCreate]
+    ) -> None:
+        """
+        Insert audit records through the caller's session, so they commit or
+        roll back with the change they describe. Meant for bulk jobs, where
+        queueing thousands of records would only hold them back.
+        """
+        if not objs_in:
+            return
+        now = datetime.datetime.utcnow()
+        rows = [
+            {**obj_in.model_dump(), "created_at": now, "updated_at": now}
+            for obj_in in objs_in
+        ]
+        rows = await audit_writer.compactor.compact(db, rows)
+        await db.execute(insert(AuditLog), rows)
+
+    async def get_timeline(
+        self,
+        db: AsyncSession,
+        entity_type: EntityType,
+        entity_id: int,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> List[Mapping[str, Any]]:
+        """
+        An entity's audit events newest first, seeking on the
+        (entity_type, entity_id, created_at, id) index. Rows are plain
+        mappings; usernames are left to the caller to resolve in one batch.
+        """
+        query = select(
+            AuditLog.id,
+            AuditLog.action,
+            AuditLog.user_id,
+            AuditLog.before_values,
+            AuditLog.after_values,
+            AuditLog.snapshot,
+            AuditLog.context,
+            AuditLog.created_at,
+        ).where(AuditLog.entity_type == entity_type, AuditLog.entity_id == entity_id)
+        query = apply_keyset(query, AuditLog.created_at, AuditLog.id, cursor)
+        result = await db.execute(query.limit(limit))
+        return result.mappings().all()
+
+    async def get_state(
+        self,
+        db: AsyncSession,
+        entity_type: EntityType,
+        entity_id: int,
+        at: datetime.datetime,
+    ) -> Optional[AuditEntityState]:
+        """
+        Rebuild an entity as it was at ``at``: start from the latest full
+        snapshot at or before that time and replay the diffs recorded after it
+        """
+        entity = (AuditLog.entity_type == entity_type) & (
+            AuditLog.entity_id == entity_id
+        )
+        query = (
+            select(AuditLog)
+            .where(entity, AuditLog.snapshot.is_(True), AuditLog.created_at <= at)
+            .order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+            .limit(1)
+        )
+        base = (await db.execute(query)).scalar_one_or_none()
+        if base is None:
+            return None
+        query = (
+            select(AuditLog.after_values)
+            .where(
+                entity,
+                AuditLog.snapshot.is_(False),
+                AuditLog.created_at <= at,
+                tuple_(AuditLog.created_at, AuditLog.id) > (base.created_at, base.id),
+            )
+            .order_by(AuditLog.created_at, AuditLog.id)
+        )
+        diffs = (await db.execute(query)).scalars().all()
+        state = base.after_values if isinstance(base.after_values, dict) else None
+        for after_values in diffs:
+            state = apply_diff(state, after_values)
+        return AuditEntityState(
+            entity_type=entity_type,
+            entity_id=entity_id,
+            at=at,
+            state=state,
+            snapshot_id=base.id,
+            diffs_applied=len(diffs),
+        )
+
     async def update(
         self, db: AsyncSession, *, db_obj: AuditLog, obj_in: dict
     ) -> AuditLog:
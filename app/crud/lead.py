@@ -1,14 +1,28 @@
-from typing import List, Optional
+import datetime
+import re
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import Depends
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import Select
 
 from app.crud.audit import crud_audit
-from app.models import EntityType, Lead
+from app.models import EntityType, Lead, LeadStatus, Quotation, lead_search
 from app.schema.auditlog import AuditLogCreate
 from app.schema.lead import LeadFilters
+from app.util.analytics.rollup import mark_days
+from app.util.audit.diff import snapshot_row
+from app.util.fingerprint import email_key, name_fingerprint, phone_key
+from app.util.pagination import apply_keyset, fetch_page
+from app.util.search import RANK_WINDOW, prefix_match
+
+UTM_FIELDS = ["utm_source", "utm_medium", "utm_campaign", "utm_content", "utm_term"]
+# Fields the free text `q` parameter matches and ranks on
+SEARCH_FIELDS = ["name", "email", "phone"]
+# Blank fields of a merged lead are filled from its duplicates
+MERGE_FIELDS = ["email", "phone", *UTM_FIELDS]
 
 
 class CRUDLead:
@@ -23,31 +37,81 @@ class CRUDLead:
         skip: int = 0,
         limit: int = 100,
         filters: LeadFilters = Depends(LeadFilters),
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
     ) -> List[Lead]:
-        query = select(Lead).offset(skip).limit(limit)
+        leads, _ = await self.get_page(
+            db, skip=skip, limit=limit, filters=filters, cursor=cursor, sort=sort
+        )
+        return leads
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        filters: LeadFilters = Depends(LeadFilters),
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        total: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Tuple[List[Any], Optional[int]]:
+        """
+        Get a page of leads, newest ``sort`` first, and optionally a total.
+        With a cursor the page is fetched by seeking on the ``(sort, id)``
+        index and ``skip`` is ignored. A ``q`` search is ordered by relevance
+        instead and pages with ``skip`` only. With ``columns`` only those are
+        selected and the items are row mappings instead of ``Lead`` objects.
+        """
+        query = self._filtered(db.bind.dialect.name, filters, columns)
+        if filters.q:
+            page = query.order_by(Lead.id.desc()).offset(skip)
+        else:
+            page = apply_keyset(query, getattr(Lead, sort), Lead.id, cursor)
+            if not cursor:
+                page = page.offset(skip)
+        return await fetch_page(
+            db, query, page.limit(limit), total, mappings=columns is not None
+        )
+
+    def _filtered(
+        self, dialect: str, filters: LeadFilters, columns: Optional[List[str]] = None
+    ) -> Select:
+        if columns is None:
+            query = select(Lead)
+        else:
+            query = select(*(getattr(Lead, name) for name in columns))
         if filters.name:
-            query = query.where(Lead.name.ilike(f"%{filters.name}%"))
+            query = query.where(lead_search.contains(dialect, filters.name, ["name"]))
         if filters.email:
-            query = query.where(Lead.email.ilike(f"%{filters.email}%"))
+            query = query.where(
+                prefix_match(Lead.email_normalized, filters.email.lower(), dialect)
+            )
         if filters.phone:
-            query = query.where(Lead.phone.ilike(f"%{filters.phone}%"))
+            digits = re.sub(r"\D", "", filters.phone)
+            query = query.where(prefix_match(Lead.phone_digits, digits, dialect))
         if filters.status:
             query = query.where(Lead.status == filters.status)
-        if filters.utm_source:
-            query = query.where(Lead.utm_source.ilike(f"%{filters.utm_source}%"))
-        if filters.utm_medium:
-            query = query.where(Lead.utm_medium.ilike(f"%{filters.utm_medium}%"))
-        if filters.utm_campaign:
-            query = query.where(Lead.utm_campaign.ilike(f"%{filters.utm_campaign}%"))
-        if filters.utm_content:
-            query = query.where(Lead.utm_content.ilike(f"%{filters.utm_content}%"))
-        if filters.utm_term:
-            query = query.where(Lead.utm_term.ilike(f"%{filters.utm_term}%"))
-        result = await db.execute(query)
-        return result.scalars().all()
+        for name in UTM_FIELDS:
+            value = getattr(filters, name)
+            if value:
+                query = query.where(lead_search.contains(dialect, value, [name]))
+        if filters.q:
+            # other filters already narrow the matches, rank all of them then
+            narrowed = filters.model_dump(exclude_none=True, exclude={"q"})
+            query = lead_search.ranked(
+                query,
+                dialect,
+                filters.q,
+                window=None if narrowed else RANK_WINDOW,
+                columns=SEARCH_FIELDS,
+            )
+        return query
 
     async def create(self, db: AsyncSession, *, obj_in: Lead, user_id: int) -> Lead:
         db.add(obj_in)
+        await db.flush()
+        await mark_days(db, [obj_in.created_at])
         await db.commit()
         await db.refresh(obj_in)
         after_values = jsonable_encoder(obj_in)
@@ -61,6 +125,229 @@ class CRUDLead:
         await crud_audit.create(obj_in=obj_audit)
         return obj_in
 
+    async def find_duplicates(
+        self,
+        db: AsyncSession,
+        *,
+        name: Optional[str],
+        email: Optional[str] = None,
+        phone: Optional[str] = None,
+        exclude_id: Optional[int] = None,
+        limit: int = 10,
+    ) -> List[int]:
+        """
+        Ids of leads with the same email or phone, or, when neither is given,
+        leads without contact details and the same name fingerprint. Every
+        key is an indexed equality lookup.
+        """
+        if email or phone:
+            conditions = []
+            if email:
+                conditions.append(Lead.email_normalized == email_key(email))
+            if phone:
+                conditions.append(Lead.phone_digits == phone_key(phone))
+            query = select(Lead.id).where(or_(*conditions))
+        else:
+            fingerprint = name_fingerprint(name)
+            if not fingerprint:
+                return []
+            query = select(Lead.id).where(
+                Lead.name_fingerprint == fingerprint,
+                Lead.email.is_(None),
+                Lead.phone.is_(None),
+            )
+        if exclude_id is not None:
+            query = query.where(Lead.id != exclude_id)
+        result = await db.execute(query.order_by(Lead.id).limit(limit))
+        return result.scalars().all()
+
+    async def duplicate_clusters(self, db: AsyncSession) -> List[List[int]]:
+        """
+        Group every lead into clusters of duplicates, linked by any shared
+        match key (see ``find_duplicates``). Only rows whose key occurs more
+        than once are read, found with a GROUP BY over the key's index.
+        """
+        no_contact = and_(Lead.email.is_(None), Lead.phone.is_(None))
+        parent: Dict[int, int] = {}
+
+        def find(id: int) -> int:
+            while parent.setdefault(id, id) != id:
+                parent[id] = parent[parent[id]]
+                id = parent[id]
+            return id
+
+        for key, scope in [
+            (Lead.email_normalized, None),
+            (Lead.phone_digits, None),
+            (Lead.name_fingerprint, no_contact),
+        ]:
+            repeated = select(key).where(key.isnot(None))
+            query = select(Lead.id, key).where(key.isnot(None))
+            if scope is not None:
+                repeated, query = repeated.where(scope), query.where(scope)
+            repeated = repeated.group_by(key).having(func.count() > 1)
+            first: Dict[str, int] = {}
+            result = await db.stream(query.where(key.in_(repeated)))
+            async for id, value in result:
+                root = first.setdefault(value, id)
+                parent[find(id)] = find(root)
+        clusters: Dict[int, List[int]] = {}
+        for id in parent:
+            clusters.setdefault(find(id), []).append(id)
+        return sorted(sorted(ids) for ids in clusters.values() if len(ids) > 1)
+
+    async def merge(
+        self, db: AsyncSession, clusters: List[List[int]], *, user_id: int
+    ) -> int:
+        """
+        Merge each cluster of duplicates into its oldest lead: blank fields
+        are filled from the others, their quotations are re-pointed and they
+        are deleted. The clusters are merged in one transaction with a fixed
+        number of set-based statements, their audit records included.
+        Returns the number of leads removed.
+        """
+        ids = [id for cluster in clusters for id in cluster]
+        result = await db.execute(select(Lead.__table__).where(Lead.id.in_(ids)))
+        rows = {row["id"]: dict(row) for row in result.mappings()}
+        now = datetime.datetime.utcnow()
+        kept: List[Dict[str, Any]] = []
+        moved: List[Dict[str, int]] = []
+        audits: List[AuditLogCreate] = []
+        for cluster in clusters:
+            cluster = [id for id in cluster if id in rows]
+            if len(cluster) < 2:
+                continue
+            keep, duplicates = rows[cluster[0]], [rows[id] for id in cluster[1:]]
+            values = {name: keep[name] for name in MERGE_FIELDS}
+            for name in MERGE_FIELDS:
+                if values[name] is None:
+                    values[name] = next(
+                        (dup[name] for dup in duplicates if dup[name] is not None),
+                        None,
+                    )
+            kept.append({"b_id": keep["id"], **values})
+            context = f"merged into lead {keep['id']}"
+            for dup in duplicates:
+                moved.append({"b_from": dup["id"], "b_to": keep["id"]})
+                audits.append(
+                    AuditLogCreate(
+                        entity_type=EntityType.LEAD,
+                        entity_id=dup["id"],
+                        user_id=user_id,
+                        action="Delete Lead",
+                        before_values=snapshot_row(dup),
+                        context=context,
+                    )
+                )
+            audits.append(
+                AuditLogCreate(
+                    entity_type=EntityType.LEAD,
+                    entity_id=keep["id"],
+                    user_id=user_id,
+                    action="Merge Leads",
+                    before_values=snapshot_row(keep),
+                    after_values=snapshot_row({**keep, **values, "updated_at": now}),
+                    context="merged leads "
+                    + ", ".join(str(dup["id"]) for dup in duplicates),
+                )
+            )
+        if not moved:
+            return 0
+        leads, quotations = Lead.__table__, Quotation.__table__
+        await db.execute(
+            update(leads)
+            .where(leads.c.id == bindparam("b_id"))
+            .values(
+                {
+                    **{name: bindparam(name) for name in MERGE_FIELDS},
+                    "updated_at": now,
+                }
+            ),
+            kept,
+        )
+        await db.execute(
+            update(quotations)
+            .where(quotations.c.lead_id == bindparam("b_from"))
+            .values(lead_id=bindparam("b_to")),
+            moved,
+        )
+        await db.execute(
+            delete(leads).where(leads.c.id.in_([move["b_from"] for move in moved]))
+        )
+        await mark_days(db, [rows[id]["created_at"] for id in ids if id in rows])
+        await crud_audit.create_many(db, audits)
+        await db.commit()
+        return len(moved)
+
+    async def bulk_create(
+        self,
+        db: AsyncSession,
+        rows: List[Dict[str, Any]],
+        *,
+        user_id: int,
+        context: Optional[str] = None,
+    ) -> List[int]:
+        """
+        Insert already validated leads with one statement, commit, and record
+        a single audit entry for the whole batch
+        """
+        now = datetime.datetime.utcnow()
+        rows = [
+            {
+                **row,
+                "name_fingerprint": name_fingerprint(row["name"]),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for row in rows
+        ]
+        dialect = db.bind.dialect.name
+        if dialect == "postgresql":
+            ids = await self._copy(db, rows)
+        elif dialect == "sqlite":
+            # executemany reuses one compiled statement; the write lock is held
+            # from the first row to the commit, so the rowids are consecutive
+            await db.execute(insert(Lead), rows)
+            last = (await db.execute(select(func.last_insert_rowid()))).scalar_one()
+            ids = list(range(last - len(rows) + 1, last + 1))
+        else:
+            result = await db.execute(insert(Lead).values(rows).returning(Lead.id))
+            ids = result.scalars().all()
+        await mark_days(db, [now])
+        await db.commit()
+        obj_audit = AuditLogCreate(
+            entity_type=EntityType.LEAD,
+            entity_id=ids[0],
+            user_id=user_id,
+            action="Import Leads",
+            after_values={"count": len(ids), "ids": ids},
+            context=context,
+        )
+        await crud_audit.create(obj_in=obj_audit)
+        return ids
+
+    async def _copy(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> List[int]:
+        # COPY cannot return generated keys, so reserve the ids up front
+        conn = await db.connection()
+        query = select(func.nextval("leads_id_seq")).select_from(
+            func.generate_series(1, len(rows))
+        )
+        ids = (await conn.execute(query)).scalars().all()
+        columns = [
+            column.name for column in Lead.__table__.columns if column.computed is None
+        ]
+        records = []
+        for id, row in zip(ids, rows):
+            row = {**row, "id": id}
+            # the Postgres enum type holds member names, not values
+            row["status"] = LeadStatus(row["status"]).name
+            records.append(tuple(row.get(name) for name in columns))
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            Lead.__tablename__, records=records, columns=columns
+        )
+        return ids
+
     async def update(
         self, db: AsyncSession, *, db_obj: Lead, obj_in: dict, user_id: int
     ) -> Lead:
@@ -68,6 +355,7 @@ class CRUDLead:
         for field, value in obj_in.items():
             setattr(db_obj, field, value)
         db.add(db_obj)
+        await mark_days(db, [db_obj.created_at])
         await db.commit()
         await db.refresh(db_obj)
         after_values = jsonable_encoder(db_obj)
@@ -83,12 +371,68 @@ class CRUDLead:
         await crud_audit.create(obj_in=_obj_in)
         return db_obj
 
+    async def update_status_many(
+        self, db: AsyncSession, *, ids: List[int], status: LeadStatus, user_id: int
+    ) -> Tuple[List[int], Dict[int, str]]:
+        """
+        Move the leads ``ids`` to ``status`` with one ``UPDATE``, under the
+        rules of a single status change, and audit them with one insert.
+        Returns the updated ids and the reasons the others were rejected.
+        """
+        ids = list(dict.fromkeys(ids))
+        leads = Lead.__table__
+        result = await db.execute(select(leads).where(leads.c.id.in_(ids)))
+        rows = {row["id"]: dict(row) for row in result.mappings()}
+        rejected = {id: "Lead not found" for id in ids if id not in rows}
+        query = update(leads).where(leads.c.id.in_(rows))
+        if status == LeadStatus.QUALIFIED:
+            # re-checked in the UPDATE in case a concurrent write cleared it
+            query = query.where(leads.c.email.isnot(None), leads.c.email != "")
+            for id, row in rows.items():
+                if not row["email"]:
+                    rejected[id] = "Lead can't be QUALIFIED without an email"
+        if len(rejected) == len(ids):
+            return [], rejected
+        now = datetime.datetime.utcnow()
+        query = query.values(status=status, updated_at=now)
+        if db.bind.dialect.name == "postgresql":
+            result = await db.execute(query.returning(leads.c.id))
+            changed = set(result.scalars().all())
+        else:
+            await db.execute(query)
+            changed = set(rows) - set(rejected)
+        for id in set(rows) - set(rejected) - changed:
+            rejected[id] = "Lead was changed concurrently, try again"
+        updated = [id for id in ids if id in changed]
+        context = f"bulk status update of {len(updated)} leads"
+        await crud_audit.create_many(
+            db,
+            [
+                AuditLogCreate(
+                    entity_type=EntityType.LEAD,
+                    entity_id=id,
+                    user_id=user_id,
+                    action="Update Lead",
+                    before_values=snapshot_row(rows[id]),
+                    after_values=snapshot_row(
+                        {**rows[id], "status": status, "updated_at": now}
+                    ),
+                    context=context,
+                )
+                for id in updated
+            ],
+        )
+        await mark_days(db, [rows[id]["created_at"] for id in updated])
+        await db.commit()
+        return updated, rejected
+
     async def remove(
         self, db: AsyncSession, *, id: int, user_id: int
     ) -> Optional[Lead]:
         obj = await self.get(db, id=id)
         if obj:
             await db.delete(obj)
+            await mark_days(db, [obj.created_at])
             await db.commit()
             before_values = jsonable_encoder(obj)
             _obj_in = AuditLogCreate(
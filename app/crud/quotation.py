@@ -1,40 +1,127 @@
-from typing import List, Optional
+import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import Depends
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import bindparam, delete, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.crud.audit import crud_audit
-from app.models import EntityType, Quotation
+from app.models import EntityType, Quotation, QuotationLineItem
 from app.schema.auditlog import AuditLogCreate
 from app.schema.quotation import QuotationFilters
+from app.util.analytics.rollup import mark_leads
+from app.util.audit.diff import snapshot_row
+from app.util.money import Money, to_cents
+from app.util.pagination import apply_keyset, fetch_page
+
+# Line item columns an updating patch sets
+UPDATED_FIELDS = ["id", "description", "quantity", "price"]
+# Counted per quotation on the quotation_id index, without loading the lines
+LINE_ITEM_COUNT = (
+    select(func.count(QuotationLineItem.id))
+    .where(QuotationLineItem.quotation_id == Quotation.id)
+    .scalar_subquery()
+    .label("line_item_count")
+)
+
+
+def _changed(key: str, stored: Any, value: Any) -> bool:
+    # prices are read as Decimal but sent as float: Decimal("10.10") != 10.1
+    if key == "price":
+        return to_cents(stored) != to_cents(value)
+    return stored != value
 
 
 class CRUDQuotation:
-    async def get(self, db: AsyncSession, id: int) -> Optional[Quotation]:
-        query = (
-            select(Quotation)
-            .where(Quotation.id == id)
-            .options(selectinload(Quotation.line_items))
-        )
+    async def get(
+        self,
+        db: AsyncSession,
+        id: int,
+        line_items: bool = True,
+        for_update: bool = False,
+    ) -> Optional[Quotation]:
+        query = select(Quotation).where(Quotation.id == id)
+        if line_items:
+            query = query.options(selectinload(Quotation.line_items))
+        if for_update:
+            query = query.with_for_update()
         result = await db.execute(query)
         return result.scalar_one_or_none()
 
+    async def get_line_items(
+        self, db: AsyncSession, quotation_id: int
+    ) -> Dict[int, Dict[str, Any]]:
+        """Line items of a quotation as plain rows keyed by id, in id order"""
+        line_items = QuotationLineItem.__table__
+        result = await db.execute(
+            select(line_items)
+            .where(line_items.c.quotation_id == quotation_id)
+            .order_by(line_items.c.id)
+        )
+        return {row["id"]: dict(row) for row in result.mappings()}
+
+    async def line_items_total(self, db: AsyncSession, quotation_id: int) -> Decimal:
+        """Exact sum of quantity * price over a quotation's line items, in SQL"""
+        line_items = QuotationLineItem.__table__
+        result = await db.execute(
+            select(
+                func.coalesce(
+                    func.sum(line_items.c.quantity * line_items.c.price), 0, type_=Money
+                )
+            ).where(line_items.c.quotation_id == quotation_id)
+        )
+        return result.scalar_one()
+
     async def get_multi(
         self,
         db: AsyncSession,
         skip: int = 0,
         limit: int = 100,
         filters: QuotationFilters = Depends(QuotationFilters),
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
     ) -> List[Quotation]:
-        query = (
-            select(Quotation)
-            .offset(skip)
-            .limit(limit)
-            .options(selectinload(Quotation.line_items))
+        quotations, _ = await self.get_page(
+            db, skip=skip, limit=limit, filters=filters, cursor=cursor, sort=sort
         )
+        return quotations
+
+    async def get_page(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        filters: QuotationFilters = Depends(QuotationFilters),
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        total: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Tuple[List[Any], Optional[int]]:
+        """
+        Get a page of quotations, newest ``sort`` first, and optionally a
+        total. With a cursor the page is fetched by seeking on the
+        ``(sort, id)`` index and ``skip`` is ignored. With ``columns`` only
+        those are selected, and ``line_items`` only loaded when listed; the
+        items are row mappings instead of ``Quotation`` objects then.
+        ``line_item_count`` is counted in the same query.
+        """
+        if columns is None:
+            query = select(Quotation)
+        else:
+            query = select(
+                *(
+                    (
+                        LINE_ITEM_COUNT
+                        if name == "line_item_count"
+                        else getattr(Quotation, name)
+                    )
+                    for name in columns
+                    if name != "line_items"
+                )
+            )
         if filters.lead_id:
             query = query.where(Quotation.lead_id == filters.lead_id)
         if filters.status:
@@ -43,13 +130,50 @@ class CRUDQuotation:
             query = query.where(Quotation.total_price >= filters.price_from)
         if filters.price_to:
             query = query.where(Quotation.total_price <= filters.price_to)
-        result = await db.execute(query)
-        return result.scalars().all()
+        page = apply_keyset(query, getattr(Quotation, sort), Quotation.id, cursor)
+        if not cursor:
+            page = page.offset(skip)
+        if columns is None:
+            page = page.limit(limit).options(selectinload(Quotation.line_items))
+            return await fetch_page(db, query, page, total)
+        quotations, count = await fetch_page(
+            db, query, page.limit(limit), total, mappings=True
+        )
+        if "line_items" in columns:
+            await self._attach_line_items(db, quotations)
+        return quotations, count
+
+    async def _attach_line_items(
+        self, db: AsyncSession, quotations: List[Dict[str, Any]]
+    ) -> None:
+        items: Dict[int, List[Dict[str, Any]]] = {q["id"]: [] for q in quotations}
+        if not items:
+            return
+        line_items = QuotationLineItem.__table__
+        query = (
+            select(
+                line_items.c.quotation_id,
+                line_items.c.id,
+                line_items.c.description,
+                line_items.c.quantity,
+                line_items.c.price,
+            )
+            .where(line_items.c.quotation_id.in_(items))
+            .order_by(line_items.c.id)
+        )
+        for row in (await db.execute(query)).mappings():
+            item = dict(row)
+            items[item.pop("quotation_id")].append(item)
+        for quotation in quotations:
+            quotation["line_items"] = items[quotation["id"]]
 
     async def create(
         self, db: AsyncSession, *, obj_in: Quotation, user_id: int
     ) -> Quotation:
         db.add(obj_in)
+        await db.flush()
+        obj_in.total_price = await self.line_items_total(db, obj_in.id)
+        await mark_leads(db, [obj_in.lead_id])
         await db.commit()
         await db.refresh(obj_in)
         after_values = jsonable_encoder(obj_in)
@@ -69,23 +193,14 @@ class CRUDQuotation:
     ) -> Quotation:
         before_values = jsonable_encoder(db_obj)
         # update the line items
+        changes = {line_item["id"]: line_item for line_item in obj_in["line_items"]}
         for item in db_obj.line_items:
-            if item.id in [line_item["id"] for line_item in obj_in["line_items"]]:
-                _item = next(
-                    (
-                        line_item
-                        for line_item in obj_in["line_items"]
-                        if line_item["id"] == item.id
-                    ),
-                    None,
-                )
-                for field, value in _item.items() if _item is not None else {}:
-                    setattr(item, field, value)
-
-        db_obj.total_price = sum(
-            item.price * item.quantity for item in db_obj.line_items
-        )
+            for field, value in changes.get(item.id, {}).items():
+                setattr(item, field, value)
+        await db.flush()
+        db_obj.total_price = await self.line_items_total(db, db_obj.id)
         db.add(db_obj)
+        await mark_leads(db, [db_obj.lead_id])
         await db.commit()
         await db.refresh(db_obj)
         after_values = jsonable_encoder(db_obj)
@@ -100,16 +215,125 @@ class CRUDQuotation:
         await crud_audit.create(obj_in=_obj_in)
         return db_obj
 
+    async def patch_line_items(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: Quotation,
+        items: Dict[int, Dict[str, Any]],
+        patch: dict,
+        user_id: int,
+    ) -> Dict[str, Any]:
+        """
+        Add, update and remove line items of ``db_obj``, whose current
+        ``items`` are given as from ``get_line_items``. Updates and removes
+        are one set-based statement each, adds one statement on Postgres and
+        one per line elsewhere, and ``total_price`` is recomputed once.
+        ``db_obj`` must be read ``for_update`` so patches don't interleave.
+        A patch that changes nothing writes nothing, not even an audit record.
+        Returns the quotation with its line items as plain values.
+        """
+        line_items = QuotationLineItem.__table__
+        now = datetime.datetime.utcnow()
+        after = dict(items)
+        updated = []
+        for change in patch["update"]:
+            item = items[change["id"]]
+            values = {key: value for key, value in change.items() if value is not None}
+            if any(_changed(key, item[key], value) for key, value in values.items()):
+                item = after[item["id"]] = {**item, **values, "updated_at": now}
+                updated.append(item)
+        if not (updated or patch["remove"] or patch["add"]):
+            # nothing to write: end the transaction to release the row lock
+            await db.commit()
+            return {**self._columns(db_obj), "line_items": list(items.values())}
+        if updated:
+            await db.execute(
+                update(line_items)
+                .where(line_items.c.id == bindparam("b_id"))
+                .values(
+                    description=bindparam("b_description"),
+                    quantity=bindparam("b_quantity"),
+                    price=bindparam("b_price"),
+                    updated_at=now,
+                ),
+                [{f"b_{key}": item[key] for key in UPDATED_FIELDS} for item in updated],
+            )
+        if patch["remove"]:
+            await db.execute(
+                delete(line_items).where(line_items.c.id.in_(patch["remove"]))
+            )
+            for id in patch["remove"]:
+                del after[id]
+        if patch["add"]:
+            rows = [
+                {
+                    **item,
+                    "quotation_id": db_obj.id,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for item in patch["add"]
+            ]
+            if db.bind.dialect.name == "postgresql":
+                added = await db.execute(
+                    insert(line_items).values(rows).returning(line_items)
+                )
+                after.update((row["id"], dict(row)) for row in added.mappings())
+            else:
+                # no RETURNING here: take each new id from its own insert, as
+                # reused ids (of lines just removed) rule out reading them back
+                for row in rows:
+                    result = await db.execute(insert(line_items), row)
+                    (id,) = result.inserted_primary_key
+                    after[id] = {**row, "id": id}
+        snapshots = {id: snapshot_row(item) for id, item in items.items()}
+        before_values = {
+            **snapshot_row(self._columns(db_obj)),
+            "line_items": list(snapshots.values()),
+        }
+        db_obj.total_price = await self.line_items_total(db, db_obj.id)
+        db_obj.updated_at = now
+        db.add(db_obj)
+        await mark_leads(db, [db_obj.lead_id])
+        await db.commit()
+        quotation = {**self._columns(db_obj), "line_items": list(after.values())}
+        _obj_in = AuditLogCreate(
+            entity_type=EntityType.QUOTATION,
+            entity_id=db_obj.id,
+            user_id=user_id,
+            action="Update Quotation Line Items",
+            before_values=before_values,
+            after_values={
+                **snapshot_row(self._columns(db_obj)),
+                # unchanged lines share their snapshot with before_values
+                "line_items": [
+                    snapshots[id] if item is items.get(id) else snapshot_row(item)
+                    for id, item in after.items()
+                ],
+            },
+        )
+        await crud_audit.create(obj_in=_obj_in)
+        return quotation
+
+    def _columns(self, db_obj: Quotation) -> Dict[str, Any]:
+        return {
+            column.name: getattr(db_obj, column.name)
+            for column in Quotation.__table__.columns
+        }
+
     async def update(
         self, db: AsyncSession, *, db_obj: Quotation, obj_in: dict, user_id: int
     ) -> Quotation:
-        before_values = obj_in
+        before_values = jsonable_encoder(db_obj)
+        lead_ids = [db_obj.lead_id]
         for field, value in obj_in.items():
             setattr(db_obj, field, value)
         db.add(db_obj)
+        await mark_leads(db, [*lead_ids, db_obj.lead_id])
         await db.commit()
         await db.refresh(db_obj)
-        after_values = obj_in
+        after_values = jsonable_encoder(db_obj)
         _obj_in = AuditLogCreate(
             entity_type=EntityType.QUOTATION,
             entity_id=db_obj.id,
@@ -128,6 +352,7 @@ class CRUDQuotation:
         before_values = jsonable_encoder(obj)
         if obj:
             await db.delete(obj)
+            await mark_leads(db, [obj.lead_id])
             await db.commit()
             _obj_in = AuditLogCreate(
                 entity_type=EntityType.QUOTATION,
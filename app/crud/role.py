@@ -9,6 +9,7 @@ from app.crud.audit import crud_audit
 from app.models import EntityType, Permission, Role
 from app.schema.auditlog import AuditLogCreate
 from app.schema.user import RoleCreate, RoleUpdate
+from app.util.auth.identity import identity_cache
 
 
 class CRUDRole:
@@ -101,6 +102,7 @@ class CRUDRole:
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        identity_cache.invalidate_role(db_obj.id)
         if permission_ids is not None:
             before_values = jsonable_encoder(db_obj.permissions)
             action = "Update Role Permissions"
@@ -131,6 +133,7 @@ class CRUDRole:
             obj.permissions = []
             await db.delete(obj)
             await db.commit()
+            identity_cache.invalidate_role(obj.id)
             before_values = jsonable_encoder(obj)
             _obj_in = AuditLogCreate(
                 entity_type=EntityType.ROLE,
@@ -157,6 +160,7 @@ class CRUDRole:
             role.permissions.append(permission)
             await db.commit()
             await db.refresh(role)
+            identity_cache.invalidate_role(role.id)
             after_values = jsonable_encoder(role.permissions)
             _obj_in = AuditLogCreate(
                 entity_type=EntityType.ROLE,
@@ -184,6 +188,7 @@ class CRUDRole:
             role.permissions.remove(permission)
             await db.commit()
             await db.refresh(role)
+            identity_cache.invalidate_role(role.id)
             after_values = jsonable_encoder(role.permissions)
             _obj_in = AuditLogCreate(
                 entity_type=EntityType.ROLE,
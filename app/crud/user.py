@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Union
 
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
@@ -9,7 +9,18 @@ from sqlalchemy.orm import selectinload
 from app.crud.audit import crud_audit
 from app.models import EntityType, Role, User
 from app.schema.auditlog import AuditLogCreate
-from app.util.auth.hasher import hash_password, verify_password
+from app.util.auth.hasher import hash_password_async, verify_password_async
+from app.util.auth.identity import identity_cache
+from app.util.cache import TTLCache
+from app.util.setting import get_settings
+
+settings = get_settings()
+
+# user id -> username, for labelling audit events without joining users
+username_cache: TTLCache[int, str] = TTLCache(
+    maxsize=int(getattr(settings, "IDENTITY_CACHE_SIZE", 10000)),
+    ttl=float(getattr(settings, "IDENTITY_CACHE_TTL", 30)),
+)
 
 
 class CRUDUser:
@@ -35,9 +46,29 @@ class CRUDUser:
             .options(selectinload(User.role).options(selectinload(Role.permissions)))
         )
         result = await db.execute(query)
-        print(result)
         return result.scalar_one_or_none()
 
+    async def get_usernames(
+        self, db: AsyncSession, ids: Iterable[int]
+    ) -> Dict[int, str]:
+        """
+        Map user IDs to usernames, loading the ones not cached in one query
+        """
+        names: Dict[int, str] = {}
+        missing = set()
+        for id in set(ids):
+            name = username_cache.get(id)
+            if name is None:
+                missing.add(id)
+            else:
+                names[id] = name
+        if missing:
+            query = select(User.id, User.username).where(User.id.in_(missing))
+            for id, username in await db.execute(query):
+                username_cache.set(id, username)
+                names[id] = username
+        return names
+
     async def get_multi(
         self, db: AsyncSession, skip: int = 0, limit: int = 100
     ) -> List[User]:
@@ -59,7 +90,7 @@ class CRUDUser:
         """
         db_obj = User(
             username=obj_in["username"],
-            hashed_password=hash_password(obj_in["password"]),
+            hashed_password=await hash_password_async(obj_in["password"]),
             role_id=obj_in["role_id"],
         )
         db.add(db_obj)
@@ -87,12 +118,11 @@ class CRUDUser:
         Update user
         """
         update_data = obj_in.copy() if isinstance(obj_in, dict) else obj_in.dict()
+        before_values = jsonable_encoder(db_obj)
         if "role_id" in update_data:
-            before_values = jsonable_encoder(db_obj.role)
-        else:
-            before_values = jsonable_encoder(db_obj)
+            before_values["role"] = jsonable_encoder(db_obj.role)
         if "password" in update_data:
-            hashed_password = hash_password(update_data["password"])
+            hashed_password = await hash_password_async(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
 
@@ -102,12 +132,14 @@ class CRUDUser:
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        identity_cache.invalidate_user(db_obj.id)
+        username_cache.pop(db_obj.id)
+        after_values = jsonable_encoder(db_obj)
         if "role_id" in update_data:
             action = "Update User Role"
-            after_values = jsonable_encoder(db_obj.role)
+            after_values["role"] = jsonable_encoder(db_obj.role)
         else:
             action = "Update User"
-            after_values = jsonable_encoder(db_obj)
         _obj_in = AuditLogCreate(
             entity_type=EntityType.USER,
             entity_id=db_obj.id,
@@ -129,6 +161,8 @@ class CRUDUser:
         if obj:
             await db.delete(obj)
             await db.commit()
+            identity_cache.invalidate_user(obj.id)
+            username_cache.pop(obj.id)
             before_values = jsonable_encoder(obj)
             _obj_in = AuditLogCreate(
                 entity_type=EntityType.USER,
@@ -149,7 +183,7 @@ class CRUDUser:
         user = await self.get_by_username(db, username=username)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             raise HTTPException(status_code=400, detail="Incorrect email or password")
         return user
 
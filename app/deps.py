@@ -1,49 +1,79 @@
-import fnmatch
-from typing import List
+from typing import List, Tuple
 
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db import get_db
 from app.schema import MeUser, TokenPayload
+from app.util.auth.identity import identity_cache
+from app.util.cache import TTLCache
 from app.util.setting import get_settings
 
 settings = get_settings()
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Verified tokens keyed by their signature, kept until the token's `exp`
+token_cache: TTLCache[str, Tuple[str, TokenPayload]] = TTLCache(
+    maxsize=int(getattr(settings, "TOKEN_CACHE_SIZE", 10000))
+)
+
 
 # Function to verify the access token extracted from the request
 def verify_access_token(token: str) -> TokenPayload:
+    signature = token.rpartition(".")[2]
+    cached = token_cache.get(signature)
+    if cached is not None and cached[0] == token:
+        return cached[1]
     try:
         payload = jwt.decode(
             token, str(settings.SECRET_KEY), algorithms=[str(settings.ALGORITHM)]
         )
-        return TokenPayload(sub=str(payload["sub"]), user=MeUser(**payload["user"]))
-    except (jwt.JWTError, ValidationError):
+        token_payload = TokenPayload(
+            sub=str(payload["sub"]),
+            role_id=payload["rid"],
+            permission_version=payload["pv"],
+        )
+    except (jwt.JWTError, ValidationError, KeyError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
+    if payload.get("exp") is not None:
+        token_cache.set(
+            signature, (token, token_payload), expires_at=float(payload["exp"])
+        )
+    return token_payload
 
 
-def get_auth_user(request: Request, token: str = Depends(reusable_oauth2)) -> MeUser:
+async def get_auth_user(
+    request: Request,
+    token: str = Depends(reusable_oauth2),
+    db: AsyncSession = Depends(get_db),
+) -> MeUser:
     payload = verify_access_token(token)
     if not request:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
         )
+    identity = await identity_cache.resolve(db, payload)
+    if identity is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+    user, matcher = identity
     request.state.sub = payload.sub
-    request.state.user = payload.user
+    request.state.user = user
     key = f"{request.method.capitalize()}:{request.url.path}"
     key = f"{key}/" if not key.endswith("/") else key
     # check if the key matches any of the permissions
-    print(payload.user.role.permissions, key)
-    for permission in payload.user.role.permissions:
-        if fnmatch.fnmatch(key, permission.name):
-            return MeUser(**payload.user.__dict__)
+    if matcher.match(key):
+        return user
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Insufficient privileges",
@@ -1,10 +1,19 @@
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import auditlog, auth, leads, quotations, roles, users
+from app.api import analytics, auditlog, auth, leads, quotations, roles, users
+from app.db import engine
+from app.util.analytics.rollup import attribution_refresher
+from app.util.audit.partitions import ensure_partitions
+from app.util.audit.writer import audit_writer
+from app.util.auth.hasher import hash_pool
+from app.util.email.outbox import email_sender
+from app.util.email.render import precompile_templates, render_pool
 from app.util.setting import get_settings
+from app.util.tasks import background_tasks
 
 settings = get_settings()
 
@@ -12,12 +21,29 @@ settings = get_settings()
 logger = logging.getLogger("app")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    precompile_templates()
+    await ensure_partitions(engine)
+    await audit_writer.start()
+    await attribution_refresher.start()
+    await email_sender.start()
+    yield
+    await email_sender.stop()
+    await attribution_refresher.stop()
+    await audit_writer.stop()
+    await background_tasks.drain()
+    hash_pool.shutdown()
+    render_pool.shutdown()
+
+
 app: FastAPI = FastAPI(
     title="Async CRM Backend",
     root_path="",
     openapi_url="/openapi.json",
     swagger_ui_parameters={"docExpansion": "none"},
     debug=False,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -46,3 +72,4 @@ app.include_router(roles.router)
 app.include_router(leads.router)
 app.include_router(quotations.router)
 app.include_router(auditlog.router)
+app.include_router(analytics.router)
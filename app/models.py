@@ -3,17 +3,26 @@ import enum
 
 from sqlalchemy import (
     JSON,
+    Boolean,
     Column,
+    Computed,
+    Date,
     DateTime,
     Enum,
-    Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
+    true,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import DeclarativeMeta, declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
+
+from app.util.fingerprint import name_fingerprint
+from app.util.money import Money
+from app.util.search import TextSearch
 
 Base: DeclarativeMeta = declarative_base()
 
@@ -85,6 +94,36 @@ class Lead(TimeStamp):
     utm_campaign = Column(String, nullable=True)
     utm_content = Column(String, nullable=True)
     utm_term = Column(String, nullable=True)
+    # Lookup keys computed by the database, so every write path (ORM, bulk
+    # insert, COPY) keeps them in step. Phones are stored as E.164, which
+    # leaves only the "+" to strip.
+    email_normalized = Column(String, Computed("lower(email)", persisted=True))
+    phone_digits = Column(String, Computed("ltrim(phone, '+')", persisted=True))
+    # Duplicate match key for leads without email or phone, see
+    # app.util.fingerprint. Core inserts have to fill it in themselves.
+    name_fingerprint = Column(String, nullable=True, index=True)
+
+    __table_args__ = (
+        # keyset pagination on either sort key
+        Index("ix_leads_created_at_id", "created_at", "id"),
+        Index("ix_leads_updated_at_id", "updated_at", "id"),
+        # text_pattern_ops lets Postgres use the index for LIKE 'prefix%'
+        Index(
+            "ix_leads_email_normalized",
+            "email_normalized",
+            postgresql_ops={"email_normalized": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_leads_phone_digits",
+            "phone_digits",
+            postgresql_ops={"phone_digits": "text_pattern_ops"},
+        ),
+    )
+
+    @validates("name")
+    def _set_name_fingerprint(self, key: str, name: str) -> str:
+        self.name_fingerprint = name_fingerprint(name)
+        return name
 
 
 class QuotationStatus(str, enum.Enum):
@@ -103,7 +142,8 @@ class Quotation(TimeStamp):
     status = Column(
         Enum(QuotationStatus), default=QuotationStatus.DRAFT, nullable=False
     )
-    total_price = Column(Float, default=0.0)
+    # sum of quantity * price over the line items, kept by crud_quotation
+    total_price = Column(Money, nullable=False, default=0)
     # Relationship to the lead
     lead = relationship("Lead", backref="quotations")
     # One-to-many relationship to line items
@@ -111,14 +151,22 @@ class Quotation(TimeStamp):
         "QuotationLineItem", back_populates="quotation", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (
+        Index("ix_quotations_created_at_id", "created_at", "id"),
+        Index("ix_quotations_updated_at_id", "updated_at", "id"),
+        Index("ix_quotations_lead_id_created_at_id", "lead_id", "created_at", "id"),
+    )
+
 
 class QuotationLineItem(TimeStamp):
     __tablename__ = "quotation_line_items"
     id = Column(Integer, primary_key=True, index=True)
-    quotation_id = Column(Integer, ForeignKey("quotations.id"), nullable=False)
+    quotation_id = Column(
+        Integer, ForeignKey("quotations.id"), nullable=False, index=True
+    )
     description = Column(String, nullable=False)
     quantity = Column(Integer, nullable=False)
-    price = Column(Float, nullable=False)
+    price = Column(Money, nullable=False)
     # Back reference to quotation
     quotation = relationship("Quotation", back_populates="line_items")
 
@@ -133,13 +181,104 @@ class EntityType(str, enum.Enum):
 
 
 class AuditLog(TimeStamp):
+    # On Postgres the migrations range partition the table by month on
+    # created_at with a (id, created_at) primary key; create_all still builds
+    # a plain table, which partition maintenance leaves alone. See
+    # app/util/audit/partitions.py
     __tablename__ = "audit_logs"
     id = Column(Integer, primary_key=True, index=True)
     entity_type = Column(Enum(EntityType), nullable=False)
     entity_id = Column(Integer, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     action = Column(String, nullable=False)
-    before_values = Column(JSON, nullable=True)
-    after_values = Column(JSON, nullable=True)
+    before_values = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    after_values = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     context = Column(String, nullable=True)
+    # False when before/after hold only the changed fields
+    snapshot = Column(Boolean, nullable=False, default=True, server_default=true())
     user = relationship("User", backref="audit_logs")
+
+    __table_args__ = (
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index(
+            "ix_audit_logs_entity_timeline",
+            "entity_type",
+            "entity_id",
+            "created_at",
+            "id",
+        ),
+        Index("ix_audit_logs_user_id_created_at", "user_id", "created_at"),
+    )
+
+
+class LeadAttributionDaily(Base):
+    """
+    Lead counts and conversion per lead creation day and UTM source, medium
+    and campaign, kept by app.util.analytics.rollup. Missing UTM values are
+    stored as "" so they can be part of the key.
+    """
+
+    __tablename__ = "lead_attribution_daily"
+    day = Column(Date, primary_key=True)
+    utm_source = Column(String, primary_key=True)
+    utm_medium = Column(String, primary_key=True)
+    utm_campaign = Column(String, primary_key=True)
+    leads = Column(Integer, nullable=False, default=0)
+    qualified = Column(Integer, nullable=False, default=0)
+    # leads with at least one quotation / an accepted quotation
+    quoted = Column(Integer, nullable=False, default=0)
+    converted = Column(Integer, nullable=False, default=0)
+    # total price of accepted quotations
+    revenue = Column(Money, nullable=False, default=0)
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+class LeadAttributionDirtyDay(Base):
+    # lead creation days whose rollup rows are out of date
+    __tablename__ = "lead_attribution_dirty_days"
+    day = Column(Date, primary_key=True)
+
+
+class EmailStatus(str, enum.Enum):
+    PENDING = "Pending"
+    SENT = "Sent"
+    FAILED = "Failed"
+
+
+class EmailOutbox(TimeStamp):
+    """
+    Outgoing email, added in the transaction that decides to send it and
+    delivered in the background by app.util.email.outbox
+    """
+
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_body = Column(String, nullable=False)
+    status = Column(Enum(EmailStatus), nullable=False, default=EmailStatus.PENDING)
+    # delivery attempts so far; pending mail is (re)tried from next_attempt_at
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+
+audit_log_search = TextSearch(AuditLog.__table__, ["action", "context"])
+lead_search = TextSearch(
+    Lead.__table__,
+    [
+        "name",
+        "email",
+        "phone",
+        "utm_source",
+        "utm_medium",
+        "utm_campaign",
+        "utm_content",
+        "utm_term",
+    ],
+)
@@ -0,0 +1,37 @@
+import datetime
+import enum
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class UtmGroupBy(str, enum.Enum):
+    DAY = "day"
+    UTM_SOURCE = "utm_source"
+    UTM_MEDIUM = "utm_medium"
+    UTM_CAMPAIGN = "utm_campaign"
+
+
+class UtmReportRow(BaseModel):
+    # Only the grouped-by keys are set; a missing UTM value is reported as null
+    day: Optional[datetime.date] = None
+    utm_source: Optional[str] = None
+    utm_medium: Optional[str] = None
+    utm_campaign: Optional[str] = None
+    leads: int
+    qualified: int
+    quoted: int
+    converted: int
+    revenue: float
+    conversion_rate: float
+
+
+class UtmReport(BaseModel):
+    date_from: datetime.date
+    date_to: datetime.date
+    group_by: List[UtmGroupBy]
+    items: List[UtmReportRow]
+    totals: UtmReportRow
+    refreshed_at: Optional[datetime.datetime] = None
+    # Days in the range with writes not rolled up yet
+    pending_days: int
@@ -1,10 +1,11 @@
+import enum
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, List, Optional
 
-from pydantic import BaseModel, Json
+from pydantic import BaseModel
 
 from app.models import EntityType
-from app.schema.user import UserInDBBase
+from app.schema.user import TimeStamp
 
 # from app.schema.user import MeUser
 
@@ -14,9 +15,17 @@ class AuditLogCreate(BaseModel):
     entity_id: int
     user_id: int
     action: str
-    before_values: Optional[dict] = None
-    after_values: Optional[dict] = None
+    before_values: Optional[Any] = None
+    after_values: Optional[Any] = None
     context: Optional[str] = None
+    snapshot: bool = True
+
+
+class AuditLogUser(TimeStamp):
+    # Usernames were validated as emails on write, listing does not re-parse them
+    id: int
+    username: str
+    role_id: int
 
 
 class AuditLogResponse(BaseModel):
@@ -25,12 +34,13 @@ class AuditLogResponse(BaseModel):
     entity_id: int
     user_id: int
     action: str
-    before_values: Optional[Json] = None
-    after_values: Optional[Json] = None
+    before_values: Optional[Any] = None
+    after_values: Optional[Any] = None
     context: Optional[str] = None
+    snapshot: bool = True
     created_at: datetime
     updated_at: datetime
-    user: UserInDBBase
+    user: AuditLogUser
 
     class Config:
         from_attributes = True
@@ -38,11 +48,48 @@ class AuditLogResponse(BaseModel):
 
 class AuditLogPagination(BaseModel):
     items: List[AuditLogResponse]
-    total: int
+    # None unless the request asked for a count
+    total: Optional[int] = None
     page: int
     limit: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
+
+
+class AuditEntityState(BaseModel):
+    entity_type: EntityType
+    entity_id: int
+    at: datetime
+    state: Optional[dict] = None
+    snapshot_id: int
+    diffs_applied: int
+
+
+class AuditTimelineEvent(BaseModel):
+    id: int
+    action: str
+    user_id: int
+    username: Optional[str] = None
+    before_values: Optional[Any] = None
+    after_values: Optional[Any] = None
+    snapshot: bool = True
+    context: Optional[str] = None
+    created_at: datetime
+
+
+class AuditTimeline(BaseModel):
+    entity_type: EntityType
+    entity_id: int
+    items: List[AuditTimelineEvent]
+    limit: int
+    has_next: bool
+    next_cursor: Optional[str] = None
+
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
 
 
 class AuditLogFilters(BaseModel):
@@ -20,4 +20,5 @@ class RegisterBody(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: Optional[str] = None
-    user: MeUser
+    role_id: int
+    permission_version: str
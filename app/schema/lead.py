@@ -46,6 +46,20 @@ class LeadUpdateStatus(BaseModel):
     status: LeadStatus
 
 
+class LeadBulkUpdateStatus(LeadUpdateStatus):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class LeadStatusRejection(BaseModel):
+    id: int
+    reason: str
+
+
+class LeadBulkStatusResult(BaseModel):
+    updated: List[int]
+    rejected: List[LeadStatusRejection]
+
+
 class LeadOut(LeadBase):
     id: int
     created_at: datetime
@@ -55,17 +69,28 @@ class LeadOut(LeadBase):
         from_attributes = True
 
 
+class LeadWithDuplicates(LeadOut):
+    # Existing leads sharing its email, phone or (without those) name; a
+    # warning only, the lead is saved regardless
+    duplicates: List[int] = []
+
+
 class LeadPagination(BaseModel):
     items: List[LeadOut]
-    total: int
+    # None unless the request asked for a count
+    total: Optional[int] = None
     page: int
     limit: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
 
 
 class LeadFilters(BaseModel):
+    # free text over name, email and phone, best matches first
+    q: str | None = None
     name: str | None = None
+    # email and phone match from the start, ignoring case and the leading "+"
     email: str | None = None
     phone: str | None = None
     status: LeadStatus | None = None
@@ -74,3 +99,15 @@ class LeadFilters(BaseModel):
     utm_campaign: str | None = None
     utm_content: str | None = None
     utm_term: str | None = None
+
+
+class LeadImportError(BaseModel):
+    line: int
+    errors: List[str]
+
+
+class LeadImportResult(BaseModel):
+    imported: int
+    failed: int
+    batches: int
+    errors: List[LeadImportError]
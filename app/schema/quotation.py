@@ -45,6 +45,12 @@ class QuotationUpdate(BaseModel):
     line_items: List[QuotationLineItemUpdate]
 
 
+class QuotationLineItemsPatch(BaseModel):
+    add: List[QuotationLineItemCreate] = []
+    update: List[QuotationLineItemUpdate] = []
+    remove: List[int] = []
+
+
 class QuotationUpdateStatus(BaseModel):
     status: QuotationStatus
 
@@ -61,11 +67,31 @@ class QuotationOut(QuotationBase):
 
 class QuotationPagination(BaseModel):
     items: List[QuotationOut]
-    total: int
+    # None unless the request asked for a count
+    total: Optional[int] = None
+    page: int
+    limit: int
+    has_next: bool
+    has_prev: bool
+    next_cursor: Optional[str] = None
+
+
+class QuotationSummary(QuotationBase):
+    id: int
+    line_item_count: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class QuotationSummaryPagination(BaseModel):
+    items: List[QuotationSummary]
+    # None unless the request asked for a count
+    total: Optional[int] = None
     page: int
     limit: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
 
 
 class QuotationFilters(BaseModel):
@@ -2,16 +2,21 @@ import asyncio
 from typing import AsyncGenerator, Dict
 
 import pytest
+from fastapi.encoders import jsonable_encoder
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from app.crud import user_crud
 from app.db import get_db
 from app.main import app
 from app.models import Base
+from app.schema import MeUser
 from app.tests.test_seed import create_defaults, create_tables
-from app.tests.utils.db import get_test_db
+from app.tests.utils.db import AsyncSessionLocal, get_test_db
+from app.util.audit.writer import audit_writer
+from app.util.auth.token import ApiToken
 from app.util.setting import get_settings
 
 settings = get_settings()
@@ -46,6 +51,7 @@ async def override_get_db():
 
 
 app.dependency_overrides[get_db] = get_test_db
+audit_writer.session_factory = AsyncSessionLocal
 
 
 # Fixture to set up the database tables for the tests.
@@ -73,8 +79,25 @@ async def seed_database():
     await create_defaults()
 
 
+async def token_headers(username: str) -> Dict[str, str]:
+    async for db in get_test_db():
+        user = await user_crud.get_by_username(db, username)
+        token = ApiToken().generate_token(userObj=MeUser(**jsonable_encoder(user)))
+        return {"Authorization": f"Bearer {token}"}
+    return {}
+
+
+@pytest.fixture
+async def admin_token_headers() -> Dict[str, str]:
+    return await token_headers("admin@gmail.com")
+
+
+@pytest.fixture
+async def manager_token_headers() -> Dict[str, str]:
+    return await token_headers("manager@gmail.com")
+
+
 @pytest.fixture
-def admin_token_headers() -> Dict[str, str]:
-    return {
-        "Authorization": f"Bearer eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJleHAiOjE3NDU5NTk4NDQuMDI4NywibmJmIjoxNzQzMzY3ODQ0LCJzdWIiOiIxIiwidXNlciI6eyJjcmVhdGVkX2F0IjoiMjAyNS0wMy0zMFQxODo0OTo1NS43OTA1NzUiLCJ1cGRhdGVkX2F0IjoiMjAyNS0wMy0zMFQxODo0OTo1NS43OTA1NzUiLCJpZCI6MSwidXNlcm5hbWUiOiJhZG1pbkBnbWFpbC5jb20iLCJyb2xlX2lkIjoxLCJyb2xlIjp7ImlkIjoxLCJuYW1lIjoiQWRtaW4iLCJkZXNjcmlwdGlvbiI6IkFkbWluIHdpdGggcGVybWlzc2lvbiB0byBtYW5hZ2UgdXNlcnMsIHJvbGVzLCBhbmQgYXVkaXQgbG9ncy4iLCJwZXJtaXNzaW9ucyI6W3siaWQiOjIsIm5hbWUiOiJHRVQ6L3VzZXJzL21lLyIsImRlc2NyaXB0aW9uIjoiUGVybWlzc2lvbiB0byBHRVQ6L3VzZXJzL21lLyJ9LHsiaWQiOjMsIm5hbWUiOiJHRVQ6L3VzZXJzLyIsImRlc2NyaXB0aW9uIjoiUGVybWlzc2lvbiB0byBHRVQ6L3VzZXJzLyJ9LHsiaWQiOjQsIm5hbWUiOiJHRVQ6L3VzZXJzLyovIiwiZGVzY3JpcHRpb24iOiJQZXJtaXNzaW9uIHRvIEdFVDovdXNlcnMvKi8ifSx7ImlkIjo1LCJuYW1lIjoiUFVUOi91c2Vycy8qLyIsImRlc2NyaXB0aW9uIjoiUGVybWlzc2lvbiB0byBQVVQ6L3VzZXJzLyovIn0seyJpZCI6NiwibmFtZSI6IkRFTEVURTovdXNlcnMvKi8iLCJkZXNjcmlwdGlvbiI6IlBlcm1pc3Npb24gdG8gREVMRVRFOi91c2Vycy8qLyJ9LHsiaWQiOjcsIm5hbWUiOiJQVVQ6L3VzZXJzLyovcm9sZS8iLCJkZXNjcmlwdGlvbiI6IlBlcm1pc3Npb24gdG8gUFVUOi91c2Vycy8qL3JvbGUvIn0seyJpZCI6OCwibmFtZSI6IkdFVDovcm9sZXMvIiwiZGVzY3JpcHRpb24iOiJQZXJtaXNzaW9uIHRvIEdFVDovcm9sZXMvIn0seyJpZCI6OSwibmFtZSI6IlBPU1Q6L3JvbGVzLyIsImRlc2NyaXB0aW9uIjoiUGVybWlzc2lvbiB0byBQT1NUOi9yb2xlcy8ifSx7ImlkIjoxMCwibmFtZSI6IkdFVDovcm9sZXMvKi8iLCJkZXNjcmlwdGlvbiI6IlBlcm1pc3Npb24gdG8gR0VUOi9yb2xlcy8qLyJ9LHsiaWQiOjExLCJuYW1lIjoiUFVUOi9yb2xlcy8qLyIsImRlc2NyaXB0aW9uIjoiUGVybWlzc2lvbiB0byBQVVQ6L3JvbGVzLyovIn0seyJpZCI6MTIsIm5hbWUiOiJERUxFVEU6L3JvbGVzLyovIiwiZGVzY3JpcHRpb24iOiJQZXJtaXNzaW9uIHRvIERFTEVURTovcm9sZXMvKi8ifSx7ImlkIjoxMywibmFtZSI6IlBPU1Q6L3JvbGVzLyovcGVybWlzc2lvbnMvKi8iLCJkZXNjcmlwdGlvbiI6IlBlcm1pc3Npb24gdG8gUE9TVDovcm9sZXMvKi9wZXJtaXNzaW9ucy8qLyJ9LHsiaWQiOjE0LCJuYW1lIjoiREVMRVRFOi9yb2xlcy8qL3Blcm1pc3Npb25zLyovIiwiZGVzY3JpcHRpb24iOiJQZXJtaXNzaW9uIHRvIERFTEVURTovcm9sZXMvKi9wZXJtaXNzaW9ucy8qLyJ9XX19LCJ0eXBlIjoiYXBpIiwiYWN0aW9uIjoiYWNjZXNzIn0.Un09M0Z2FBks7U6dSjpMCSH4JmfXosiMDL9slzfKER4"
-    }
+async def auditor_token_headers() -> Dict[str, str]:
+    # "All roles" is the seeded role with the audit log permissions
+    return await token_headers("all@gmail.com")
@@ -0,0 +1,101 @@
+import datetime
+from typing import Dict
+
+from httpx import AsyncClient
+
+from app.tests.utils.db import get_test_db
+from app.util.analytics.rollup import rebuild, refresh_all
+
+
+async def test_utm_report(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    async def create(lead: dict) -> int:
+        r = await client.post("/leads/", json=lead, headers=manager_token_headers)
+        assert r.status_code == 200, r.text
+        return r.json()["id"]
+
+    async def report(**params) -> dict:
+        r = await client.get(
+            "/analytics/utm", params=params, headers=manager_token_headers
+        )
+        assert r.status_code == 200, r.text
+        return r.json()
+
+    campaign = {"utm_source": "rollup-ads", "utm_medium": "cpc"}
+    spring = await create(
+        {
+            "name": "Rollup One",
+            "email": "rollup.one@example.com",
+            **campaign,
+            "utm_campaign": "spring",
+        }
+    )
+    unquoted = await create(
+        {"name": "Rollup Two", **campaign, "utm_campaign": "spring"}
+    )
+    plain = await create({"name": "Rollup Three", **campaign})
+    r = await client.put(
+        f"/leads/{spring}/status",
+        json={"status": "Qualified"},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    for lead_id, price in ((spring, 40), (plain, 7)):
+        r = await client.post(
+            "/quotations/",
+            json={
+                "lead_id": lead_id,
+                "line_items": [{"description": "Seat", "quantity": 2, "price": price}],
+            },
+            headers=manager_token_headers,
+        )
+        quotation_id = r.json()["id"]
+    for status in ("Submitted", "Approved", "Sent", "Accepted"):
+        r = await client.put(
+            f"/quotations/{quotation_id}/status",
+            json={"status": status},
+            headers=manager_token_headers,
+        )
+        assert r.status_code == 200, r.text
+
+    assert (await report(utm_source="rollup-ads"))["pending_days"] == 1
+    async for db in get_test_db():
+        assert await refresh_all(db) >= 1
+    result = await report(utm_source="rollup-ads", group_by=["day", "utm_campaign"])
+    assert result["pending_days"] == 0
+    today = datetime.datetime.utcnow().date().isoformat()
+    rows = [
+        (item["day"], item["utm_campaign"], item["leads"], item["qualified"])
+        + (item["quoted"], item["converted"], item["revenue"])
+        for item in result["items"]
+    ]
+    assert rows == [
+        (today, None, 1, 0, 1, 1, 14.0),
+        (today, "spring", 2, 1, 1, 0, 0.0),
+    ]
+    assert result["items"][0]["utm_source"] is None
+    totals = result["totals"]
+    assert (totals["leads"], totals["converted"]) == (3, 1)
+    assert round(totals["conversion_rate"], 3) == 0.333
+
+    r = await client.delete(f"/leads/{unquoted}", headers=manager_token_headers)
+    assert r.status_code == 200, r.text
+    assert (await report(utm_source="rollup-ads"))["pending_days"] == 1
+    async for db in get_test_db():
+        await refresh_all(db)
+    result = await report(utm_source="rollup-ads", utm_campaign="spring")
+    assert [(item["leads"], item["qualified"]) for item in result["items"]] == [(1, 1)]
+    assert (await report(utm_source="rollup-ads", utm_campaign=""))["totals"][
+        "revenue"
+    ] == 14.0
+    async for db in get_test_db():
+        assert await rebuild(db) >= 1
+    assert (await report(utm_source="rollup-ads"))["totals"]["leads"] == 2
+
+    r = await client.get(
+        "/analytics/utm",
+        params={"date_from": "2020-01-01", "date_to": "2024-01-01"},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 400
@@ -0,0 +1,356 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+from typing import Any, Dict, List
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from app.crud.audit import crud_audit
+from app.models import AuditLog, EntityType
+from app.schema.auditlog import AuditLogCreate
+from app.tests.utils.db import engine, get_test_db
+from app.util.audit.export import EXPORT_COLUMNS
+from app.util.audit.partitions import (
+    ensure_partitions,
+    expired_partitions,
+    plan_partitions,
+)
+from app.util.audit.writer import audit_writer
+
+
+async def count_audit_logs() -> int:
+    async for db in get_test_db():
+        return (await db.execute(select(func.count(AuditLog.id)))).scalar_one()
+    return 0
+
+
+async def test_audit_writer_batches_events() -> None:
+    await audit_writer.flush()
+    before, batches = await count_audit_logs(), audit_writer.batches
+    for i in range(5):
+        await audit_writer.submit(
+            AuditLogCreate(
+                entity_type=EntityType.LEAD,
+                entity_id=i + 1,
+                user_id=1,
+                action="Batched",
+                after_values={"index": i},
+            )
+        )
+    await audit_writer.flush()
+    assert await count_audit_logs() == before + 5
+    assert audit_writer.batches == batches + 1
+    assert audit_writer.stats()["queue_depth"] == 0
+    async for db in get_test_db():
+        query = select(AuditLog.after_values).where(AuditLog.action == "Batched")
+        stored = (await db.execute(query)).scalars().all()
+        assert {"index": 4} in stored
+
+
+async def test_list_audit_logs(
+    client: AsyncClient, auditor_token_headers: Dict[str, str]
+) -> None:
+    login_data = {"username": "admin@gmail.com", "password": "admin123"}
+    await client.post("/auth/login", data=login_data)
+    await audit_writer.flush()
+    r = await client.get(
+        "/audit-logs/", params={"action": "Login"}, headers=auditor_token_headers
+    )
+    assert r.status_code == 200, r.text
+    items = r.json()["items"]
+    assert items and all(item["action"] == "Login" for item in items)
+    assert items[0]["user"]["username"] == "admin@gmail.com"
+    assert isinstance(items[0]["after_values"], dict)
+
+
+async def test_audit_logs_cursor_pagination(
+    client: AsyncClient, auditor_token_headers: Dict[str, str]
+) -> None:
+    for i in range(5):
+        await audit_writer.submit(
+            AuditLogCreate(
+                entity_type=EntityType.LEAD, entity_id=i, user_id=1, action="Paged"
+            )
+        )
+    await audit_writer.flush()
+    params: Dict[str, Any] = {"action": "Paged", "limit": 2, "with_total": True}
+    seen = []
+    while True:
+        r = await client.get(
+            "/audit-logs/", params=params, headers=auditor_token_headers
+        )
+        assert r.status_code == 200, r.text
+        data = r.json()
+        assert data["total"] == 5
+        seen += [item["id"] for item in data["items"]]
+        if not data["has_next"]:
+            break
+        params["cursor"] = data["next_cursor"]
+    assert len(seen) == 5 and seen == sorted(seen, reverse=True)
+
+    r = await client.get(
+        "/audit-logs/", params={"cursor": "garbage"}, headers=auditor_token_headers
+    )
+    assert r.status_code == 400
+
+
+async def test_audit_logs_sparse_fields(
+    client: AsyncClient, auditor_token_headers: Dict[str, str]
+) -> None:
+    for i in range(3):
+        await audit_writer.submit(
+            AuditLogCreate(
+                entity_type=EntityType.LEAD, entity_id=i, user_id=1, action="Sparse"
+            )
+        )
+    await audit_writer.flush()
+    params: Dict[str, Any] = {"action": "Sparse", "limit": 2, "fields": "action"}
+    r = await client.get("/audit-logs/", params=params, headers=auditor_token_headers)
+    assert r.status_code == 200, r.text
+    first = r.json()
+    assert [set(item) for item in first["items"]] == [{"id", "action"}] * 2
+    r = await client.get(
+        "/audit-logs/",
+        params={**params, "fields": "user,entity_id", "cursor": first["next_cursor"]},
+        headers=auditor_token_headers,
+    )
+    (item,) = r.json()["items"]
+    assert item["id"] < first["items"][-1]["id"]
+    assert (item["entity_id"], item["user"]["id"]) == (0, 1)
+    assert "user_id" not in item
+
+    r = await client.get(
+        "/audit-logs/", params={"fields": "id,secret"}, headers=auditor_token_headers
+    )
+    assert r.status_code == 400
+
+
+async def test_audit_diff_mode_and_state(
+    client: AsyncClient, auditor_token_headers: Dict[str, str]
+) -> None:
+    compactor = audit_writer.compactor
+    compactor.diff_mode, compactor.snapshot_every = True, 3
+    state = {"id": 7001, "name": "Acme", "status": "New", "phone": "1"}
+    changes = [{"name": "Acme Ltd"}, {"status": "Contacted"}, {"phone": "2"}]
+    try:
+        await crud_audit.create(
+            AuditLogCreate(
+                entity_type=EntityType.LEAD,
+                entity_id=7001,
+                user_id=1,
+                action="Create Lead",
+                after_values=state,
+            )
+        )
+        for change in changes:
+            before, state = state, {**state, **change}
+            await crud_audit.create(
+                AuditLogCreate(
+                    entity_type=EntityType.LEAD,
+                    entity_id=7001,
+                    user_id=1,
+                    action="Update Lead",
+                    before_values=before,
+                    after_values=state,
+                )
+            )
+        # rows are compacted as the writer flushes them
+        await audit_writer.flush()
+    finally:
+        compactor.diff_mode, compactor.snapshot_every = False, 0
+
+    r = await client.get(
+        "/audit-logs/",
+        params={"entity_id": 7001, "entity_type": "Lead", "limit": 10},
+        headers=auditor_token_headers,
+    )
+    rows = list(reversed(r.json()["items"]))
+    assert [row["snapshot"] for row in rows] == [True, False, False, True]
+    assert rows[1]["before_values"] == {"name": "Acme"}
+    assert rows[1]["after_values"] == {"name": "Acme Ltd"}
+
+    url = "/audit-logs/entities/Lead/7001/state"
+    r = await client.get(url, headers=auditor_token_headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["state"] == state and r.json()["diffs_applied"] == 0
+
+    r = await client.get(
+        url, params={"at": rows[2]["created_at"]}, headers=auditor_token_headers
+    )
+    assert r.json()["state"] == {**rows[0]["after_values"], **changes[0], **changes[1]}
+    assert r.json()["diffs_applied"] == 2
+
+    r = await client.get(
+        "/audit-logs/entities/Lead/999999/state", headers=auditor_token_headers
+    )
+    assert r.status_code == 404
+
+
+async def test_audit_snapshots_counted_across_a_batch() -> None:
+    compactor = audit_writer.compactor
+    compactor.diff_mode, compactor.snapshot_every = True, 2
+    states = [{"id": 7002, "name": f"Name {n}"} for n in range(5)]
+    key = (EntityType.LEAD, 7002)
+
+    def updates(start: int, end: int) -> List[AuditLogCreate]:
+        return [
+            AuditLogCreate(
+                entity_type=EntityType.LEAD,
+                entity_id=7002,
+                user_id=1,
+                action="Update Lead",
+                before_values=states[n],
+                after_values=states[n + 1],
+            )
+            for n in range(start, end)
+        ]
+
+    try:
+        async for db in get_test_db():
+            await crud_audit.create_many(db, updates(0, 3))
+            await db.commit()
+            assert await compactor.diffs_since_snapshot(db, [key]) == {key: 1}
+            # the next batch picks up the count from the database
+            await crud_audit.create_many(db, updates(3, 4))
+            await db.commit()
+            query = (
+                select(AuditLog.snapshot)
+                .where(AuditLog.entity_id == 7002)
+                .order_by(AuditLog.id)
+            )
+            flags = (await db.execute(query)).scalars().all()
+            assert flags == [False, True, False, True]
+    finally:
+        compactor.diff_mode, compactor.snapshot_every = False, 0
+
+
+def test_partition_planning() -> None:
+    today = datetime.date(2026, 11, 17)
+    planned = plan_partitions(today, ahead=2)
+    assert [name for name, *_ in planned] == [
+        "audit_logs_y2026m11",
+        "audit_logs_y2026m12",
+        "audit_logs_y2027m01",
+    ]
+    assert planned[-1][1:] == (datetime.date(2027, 1, 1), datetime.date(2027, 2, 1))
+    names = ["audit_logs_y2025m10", "audit_logs_y2025m11", "audit_logs_y2026m01"]
+    assert expired_partitions(names + ["audit_logs_old"], today, 12) == [
+        "audit_logs_y2025m10"
+    ]
+
+
+async def test_search_audit_logs(
+    client: AsyncClient, auditor_token_headers: Dict[str, str]
+) -> None:
+    for action, context in [
+        ("Export Quotation", "quarterly pricing review"),
+        ("Update Quotation", "pricing"),
+        ("Update Lead", "follow-up call"),
+    ]:
+        await audit_writer.submit(
+            AuditLogCreate(
+                entity_type=EntityType.QUOTATION,
+                entity_id=1,
+                user_id=1,
+                action=action,
+                context=context,
+            )
+        )
+    await audit_writer.flush()
+
+    r = await client.get(
+        "/audit-logs/search", params={"q": "PRICING"}, headers=auditor_token_headers
+    )
+    assert r.status_code == 200, r.text
+    contexts = [item["context"] for item in r.json()["items"]]
+    assert set(contexts) == {"quarterly pricing review", "pricing"}
+    # the exact match scores better than the longer context
+    assert contexts[0] == "pricing"
+
+    r = await client.get(
+        "/audit-logs/",
+        params={"action": "xport quot", "with_total": True},
+        headers=auditor_token_headers,
+    )
+    assert [item["action"] for item in r.json()["items"]] == ["Export Quotation"]
+    assert r.json()["total"] == 1
+
+
+async def test_export_audit_logs(
+    client: AsyncClient, auditor_token_headers: Dict[str, str]
+) -> None:
+    for i in range(3):
+        await audit_writer.submit(
+            AuditLogCreate(
+                entity_type=EntityType.LEAD,
+                entity_id=i,
+                user_id=1,
+                action="Exported",
+                after_values={"name": f"lead, {i}"},
+            )
+        )
+    await audit_writer.flush()
+    params: Dict[str, Any] = {"action": "Exported"}
+
+    r = await client.get(
+        "/audit-logs/export", params=params, headers=auditor_token_headers
+    )
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["entity_id"] for row in rows] == [0, 1, 2]
+    assert rows[0]["after_values"] == {"name": "lead, 0"}
+    assert rows[0]["username"] == "admin@gmail.com"
+
+    r = await client.get(
+        "/audit-logs/export",
+        params={**params, "format": "csv", "gzip": True},
+        headers=auditor_token_headers,
+    )
+    assert r.headers["content-type"] == "application/gzip"
+    reader = csv.DictReader(io.StringIO(gzip.decompress(r.content).decode()))
+    records = list(reader)
+    assert len(records) == 3 and records[2]["entity_type"] == "Lead"
+    assert json.loads(records[2]["after_values"]) == {"name": "lead, 2"}
+
+    r = await client.get(
+        "/audit-logs/export",
+        params={"action": "no such action", "format": "csv"},
+        headers=auditor_token_headers,
+    )
+    assert r.text.splitlines() == [",".join(EXPORT_COLUMNS)]
+
+
+async def test_entity_timeline(
+    client: AsyncClient, auditor_token_headers: Dict[str, str]
+) -> None:
+    for i in range(5):
+        await audit_writer.submit(
+            AuditLogCreate(
+                entity_type=EntityType.QUOTATION,
+                entity_id=8001,
+                user_id=1,
+                action=f"Step {i}",
+            )
+        )
+    await audit_writer.flush()
+    url = "/audit-logs/entities/Quotation/8001/timeline"
+    params: Dict[str, Any] = {"limit": 2}
+    actions = []
+    while True:
+        r = await client.get(url, params=params, headers=auditor_token_headers)
+        assert r.status_code == 200, r.text
+        data = r.json()
+        assert all(item["username"] == "admin@gmail.com" for item in data["items"])
+        actions += [item["action"] for item in data["items"]]
+        if not data["has_next"]:
+            break
+        params["cursor"] = data["next_cursor"]
+    assert actions == [f"Step {i}" for i in reversed(range(5))]
+
+
+async def test_ensure_partitions_skips_sqlite() -> None:
+    assert await ensure_partitions(engine) == []
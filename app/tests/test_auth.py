@@ -1,5 +1,12 @@
+import time
+
 from fastapi.encoders import jsonable_encoder
 from httpx import AsyncClient
+from jose import jwt
+
+from app.deps import token_cache
+from app.util.auth.hasher import hash_password_async, hash_pool, verify_password_async
+from app.util.cache import TTLCache
 
 
 async def test_login(client: AsyncClient) -> None:
@@ -24,3 +31,47 @@ async def test_register_user(client: AsyncClient) -> None:
     assert response.status_code == 200, f"Register failed: {response.text}"
     data = response.json()
     assert data["username"] == "testuser@gmail.com"
+
+
+async def test_verified_token_is_cached(client: AsyncClient) -> None:
+    login_data = {"username": "admin@gmail.com", "password": "admin123"}
+    response = await client.post("/auth/login", data=login_data)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    r = await client.get("/users/me", headers=headers)
+    assert r.status_code == 200
+    hits = token_cache.hits
+    r = await client.get("/users/me", headers=headers)
+    assert r.status_code == 200
+    assert token_cache.hits == hits + 1
+
+
+def test_ttl_cache_expiry_and_eviction() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=2)
+    cache.set("expired", 1, expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+async def test_login_token_is_compact(client: AsyncClient) -> None:
+    login_data = {"username": "admin@gmail.com", "password": "admin123"}
+    response = await client.post("/auth/login", data=login_data)
+    token = response.json()["access_token"]
+    claims = jwt.get_unverified_claims(token)
+    assert "user" not in claims
+    assert claims["sub"] == str(response.json()["id"])
+    assert claims["rid"] == response.json()["me"]["role_id"]
+    assert len(token) < 400
+
+
+async def test_password_hashing_runs_on_worker_pool() -> None:
+    completed = hash_pool.completed
+    hashed = await hash_password_async("secret")
+    assert await verify_password_async("secret", hashed)
+    assert not await verify_password_async("wrong", hashed)
+    assert hash_pool.completed == completed + 3
+    assert hash_pool.in_flight == 0 and hash_pool.queued == 0
@@ -0,0 +1,188 @@
+import datetime
+import smtplib
+import socket
+from typing import Any, Dict, List
+
+import pytest
+from aiosmtpd.controller import Controller
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from app.models import EmailOutbox, EmailStatus
+from app.tests.utils.db import AsyncSessionLocal, get_test_db
+from app.util.email.index import build_message
+from app.util.email.outbox import OutboxSender, SMTPPool, enqueue
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def queue(*to_emails: str) -> List[int]:
+    async with AsyncSessionLocal() as db:
+        messages = [
+            enqueue(db, to_email=to_email, subject="Hi", html_body="<p>Hi</p>")
+            for to_email in to_emails
+        ]
+        await db.commit()
+        return [message.id for message in messages]
+
+
+async def outbox(ids: List[int]) -> List[EmailOutbox]:
+    async with AsyncSessionLocal() as db:
+        query = select(EmailOutbox).where(EmailOutbox.id.in_(ids))
+        return list((await db.execute(query.order_by(EmailOutbox.id))).scalars())
+
+
+async def test_send_quotation_queues_email(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    r = await client.post(
+        "/leads/",
+        json={"name": "Mailed Lead", "email": "mailed.lead@example.com"},
+        headers=manager_token_headers,
+    )
+    lead_id = r.json()["id"]
+    r = await client.put(
+        f"/leads/{lead_id}/status",
+        json={"status": "Qualified"},
+        headers=manager_token_headers,
+    )
+    r = await client.post(
+        "/quotations/",
+        json={
+            "lead_id": lead_id,
+            "line_items": [{"description": "Seat", "quantity": 2, "price": 9.5}],
+        },
+        headers=manager_token_headers,
+    )
+    quotation_id = r.json()["id"]
+    for status in ("Submitted", "Approved"):
+        await client.put(
+            f"/quotations/{quotation_id}/status",
+            json={"status": status},
+            headers=manager_token_headers,
+        )
+
+    r = await client.post(
+        f"/quotations/{quotation_id}/send", headers=manager_token_headers
+    )
+    assert r.status_code == 200, r.text
+    assert r.json()["quotation"]["status"] == "Sent"
+    async for db in get_test_db():
+        query = select(EmailOutbox).where(
+            EmailOutbox.to_email == "mailed.lead@example.com"
+        )
+        (message,) = (await db.execute(query)).scalars().all()
+        assert message.status == EmailStatus.PENDING and message.attempts == 0
+        assert "$19.00" in message.html_body
+
+
+async def test_outbox_retries_with_backoff() -> None:
+    ids = await queue("retry@example.com")
+    pool = SMTPPool("127.0.0.1", free_port(), starttls=False, timeout=2)
+    sender = OutboxSender(
+        pool, session_factory=AsyncSessionLocal, retry_seconds=60, max_attempts=2
+    )
+
+    # mail queued by other tests may go out in the same batch
+    assert await sender.deliver() >= 1
+    (message,) = await outbox(ids)
+    assert (message.status, message.attempts) == (EmailStatus.PENDING, 1)
+    assert message.last_error and message.sent_at is None
+    assert message.next_attempt_at > datetime.datetime.utcnow()
+    # not due again until the backoff has passed
+    assert await sender.deliver() == 0
+
+    async with AsyncSessionLocal() as db:
+        message.next_attempt_at = datetime.datetime.utcnow()
+        await db.merge(message)
+        await db.commit()
+    assert await sender.deliver() >= 1
+    (message,) = await outbox(ids)
+    assert (message.status, message.attempts) == (EmailStatus.FAILED, 2)
+    assert sender.stats()["failed"] == 1
+
+
+async def test_outbox_reuses_smtp_connections() -> None:
+    received: List[Any] = []
+
+    class Handler:
+        async def handle_DATA(self, server: Any, session: Any, envelope: Any) -> str:
+            received.append(envelope)
+            return "250 OK"
+
+    port = free_port()
+    controller = Controller(Handler(), hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        to_emails = [f"pooled.{n}@example.com" for n in range(6)]
+        ids = await queue(*to_emails)
+        pool = SMTPPool("127.0.0.1", port, starttls=False, size=2)
+        sender = OutboxSender(pool, session_factory=AsyncSessionLocal)
+        assert await sender.deliver() >= 6
+        await pool.close()
+    finally:
+        controller.stop()
+
+    assert to_emails == sorted(
+        envelope.rcpt_tos[0]
+        for envelope in received
+        if envelope.rcpt_tos[0] in to_emails
+    )
+    assert pool.connects <= 2
+    messages = await outbox(ids)
+    assert {message.status for message in messages} == {EmailStatus.SENT}
+    assert all(message.sent_at for message in messages)
+
+
+async def test_smtp_pool_keeps_connection_after_refusal() -> None:
+    received: List[Any] = []
+
+    class Handler:
+        async def handle_RCPT(
+            self, server: Any, session: Any, envelope: Any, address: str, *args: Any
+        ) -> str:
+            if address.startswith("refused"):
+                return "550 No such user"
+            envelope.rcpt_tos.append(address)
+            return "250 OK"
+
+        async def handle_DATA(self, server: Any, session: Any, envelope: Any) -> str:
+            received.append(envelope)
+            return "250 OK"
+
+    port = free_port()
+    controller = Controller(Handler(), hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        pool = SMTPPool("127.0.0.1", port, starttls=False, size=1)
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            await pool.send(build_message("Hi", "refused@example.com", "<p>Hi</p>"))
+        await pool.send(build_message("Hi", "kept@example.com", "<p>Hi</p>"))
+        await pool.close()
+    finally:
+        controller.stop()
+
+    assert [envelope.rcpt_tos for envelope in received] == [["kept@example.com"]]
+    assert pool.connects == 1
+
+
+async def test_outbox_lease_and_abandoned_attempts() -> None:
+    pool = SMTPPool("127.0.0.1", free_port(), starttls=False, size=2, timeout=30)
+    assert OutboxSender(pool, batch_size=50).lease_seconds == 25 * 2 * 30
+
+    # claimed for its last attempt by a sender that died before recording it
+    (id,) = await queue("abandoned@example.com")
+    async with AsyncSessionLocal() as db:
+        (message,) = await outbox([id])
+        message.attempts = 2
+        await db.merge(message)
+        await db.commit()
+    sender = OutboxSender(pool, session_factory=AsyncSessionLocal, max_attempts=2)
+    await sender.deliver()
+    (message,) = await outbox([id])
+    assert (message.status, message.attempts) == (EmailStatus.FAILED, 2)
+    assert message.sent_at is None
@@ -0,0 +1,37 @@
+import datetime
+from decimal import Decimal
+
+from app.models import Quotation, QuotationLineItem, QuotationStatus
+from app.util.email.render import (
+    invoice_context,
+    precompile_templates,
+    render_invoice,
+    render_invoices,
+)
+
+
+def quotation(id: int) -> Quotation:
+    now = datetime.datetime(2026, 10, 1, 9, 30)
+    return Quotation(
+        id=id,
+        status=QuotationStatus.APPROVED,
+        total_price=Decimal("21.50"),
+        created_at=now,
+        updated_at=now,
+        line_items=[
+            QuotationLineItem(description="Seat", quantity=2, price=Decimal("9.50")),
+            QuotationLineItem(description="Setup", quantity=1, price=Decimal("2.50")),
+        ],
+    )
+
+
+async def test_render_invoice() -> None:
+    assert precompile_templates() >= 1
+    html = render_invoice(invoice_context(quotation(7), "<b>Ada</b> & Co"))
+    assert "Hello &lt;b&gt;Ada&lt;/b&gt; &amp; Co" in html
+    assert "<strong>Status:</strong> Approved" in html
+    assert "<td>$19.00</td>" in html and "Grand Total:</strong> $21.50" in html
+
+    contexts = [invoice_context(quotation(n), f"Lead {n}") for n in range(250)]
+    rendered = await render_invoices(contexts, chunk_size=100)
+    assert rendered == [render_invoice(context) for context in contexts]
@@ -0,0 +1,359 @@
+from typing import Dict, List
+
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from app.models import AuditLog, Lead, Quotation, User
+from app.tests.utils.db import get_test_db
+from app.util.audit.writer import audit_writer
+from app.util.lead_dedup import dedup_leads
+
+
+async def test_import_leads_csv(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    body = (
+        "name,email,phone,status,utm_source\n"
+        "Import One,one@example.com,+15550001,New,google\n"
+        "Import Two,not-an-email,,,\n"
+        "Import Three,,+15550003,Contacted,\n"
+        ",missing@example.com,,,\n"
+    )
+    r = await client.post(
+        "/leads/import",
+        files={"file": ("campaign.csv", body, "text/csv")},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    result = r.json()
+    assert (result["imported"], result["failed"], result["batches"]) == (2, 2, 1)
+    assert [error["line"] for error in result["errors"]] == [3, 5]
+    assert "email" in result["errors"][0]["errors"][0]
+
+    await audit_writer.flush()
+    async for db in get_test_db():
+        leads = (
+            (await db.execute(select(Lead).where(Lead.name.like("Import %"))))
+            .scalars()
+            .all()
+        )
+        assert {lead.name: lead.utm_source for lead in leads} == {
+            "Import One": "google",
+            "Import Three": None,
+        }
+        audit = (
+            await db.execute(select(AuditLog).where(AuditLog.action == "Import Leads"))
+        ).scalar_one()
+        assert audit.after_values["count"] == 2
+        assert audit.context == "campaign.csv batch 1"
+
+
+async def test_import_leads_ndjson(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    body = '{"name": "Nd One"}\n\n{"name": "Nd Two", "status": "Bogus"}\n{oops\n'
+    r = await client.post(
+        "/leads/import",
+        params={"format": "ndjson"},
+        files={"file": ("leads.txt", body)},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    result = r.json()
+    assert (result["imported"], result["failed"]) == (1, 2)
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+
+
+async def test_search_leads(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    leads = [
+        {"name": "Findme Walker", "email": "Rita.Walker@Example.com"},
+        {"name": "Findme Carter", "phone": "+628123456789", "utm_source": "Findme-Ads"},
+        {"name": "Other Person", "email": "walker.fan@example.com"},
+    ]
+    for lead in leads:
+        r = await client.post("/leads/", json=lead, headers=manager_token_headers)
+        assert r.status_code == 200, r.text
+
+    async def names(**params) -> List[str]:
+        r = await client.get("/leads/", params=params, headers=manager_token_headers)
+        assert r.status_code == 200, r.text
+        return [item["name"] for item in r.json()["items"]]
+
+    # email and phone match on their normalized prefix
+    assert await names(email="RITA.walker@") == ["Findme Walker"]
+    assert await names(email="walker") == ["Other Person"]
+    assert await names(phone="62 812-345") == ["Findme Carter"]
+    assert await names(phone="8123") == []
+    # other text filters match anywhere, ignoring case
+    assert await names(name="me wal") == ["Findme Walker"]
+    assert await names(utm_source="DME-a") == ["Findme Carter"]
+    # q searches name, email and phone together
+    assert sorted(await names(q="walker")) == ["Findme Walker", "Other Person"]
+    assert await names(q="walker", name="findme") == ["Findme Walker"]
+    assert await names(q="3456") == ["Findme Carter"]
+    assert await names(q="ca") == ["Findme Carter"]
+
+
+async def test_paginate_leads(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    for i in range(5):
+        r = await client.post(
+            "/leads/",
+            json={"name": f"Pager {i}", "utm_campaign": "pager-campaign"},
+            headers=manager_token_headers,
+        )
+        assert r.status_code == 200, r.text
+
+    params = {"utm_campaign": "pager-campaign", "limit": 2, "total": "exact"}
+    names, cursor = [], None
+    while True:
+        r = await client.get(
+            "/leads/",
+            params={**params, "cursor": cursor} if cursor else params,
+            headers=manager_token_headers,
+        )
+        assert r.status_code == 200, r.text
+        page = r.json()
+        assert page["total"] == 5
+        names += [item["name"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        assert page["has_next"] == (cursor is not None)
+        if not cursor:
+            break
+    assert names == [f"Pager {i}" for i in reversed(range(5))]
+
+    # SQLite has no planner estimate, it falls back to an exact count
+    r = await client.get(
+        "/leads/",
+        params={**params, "total": "estimate"},
+        headers=manager_token_headers,
+    )
+    assert r.json()["total"] == 5
+    r = await client.get(
+        "/leads/",
+        params={**params, "skip": 10},
+        headers=manager_token_headers,
+    )
+    assert (r.json()["items"], r.json()["total"]) == ([], 5)
+    r = await client.get(
+        "/leads/",
+        params={key: value for key, value in params.items() if key != "total"},
+        headers=manager_token_headers,
+    )
+    assert (len(r.json()["items"]), r.json()["total"]) == (2, None)
+
+    r = await client.get(
+        "/leads/",
+        params={"q": "pager", "cursor": cursor or "x"},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 400
+    r = await client.get(
+        "/leads/", params={"cursor": "garbage"}, headers=manager_token_headers
+    )
+    assert r.status_code == 400
+
+
+async def test_duplicate_leads(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    async def create(lead: dict, duplicates: List[int] = []) -> int:
+        r = await client.post("/leads/", json=lead, headers=manager_token_headers)
+        assert r.status_code == 200, r.text
+        assert r.json()["duplicates"] == duplicates
+        return r.json()["id"]
+
+    first = await create({"name": "Dup One", "email": "dup.one@example.com"})
+    r = await client.post(
+        "/leads/",
+        json={"name": "Someone Else", "email": "DUP.One@example.com"},
+        params={"reject_duplicates": True},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 409
+    assert str(first) in r.json()["detail"]
+
+    by_email = await create(
+        {"name": "Dup Two", "email": "Dup.One@Example.com", "phone": "+15559990001"},
+        duplicates=[first],
+    )
+    by_phone = await create(
+        {"name": "Dup Three", "phone": "+15559990001", "utm_source": "dup-ads"},
+        duplicates=[by_email],
+    )
+    by_name = await create({"name": "Person, Dup"})
+    r = await client.post(
+        "/leads/",
+        json={"name": "dup  PERSON"},
+        params={"reject_duplicates": True},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 409
+    name_twin = await create({"name": "dup  PERSON"}, duplicates=[by_name])
+    # a lead with contact details is never matched on its name alone
+    await create({"name": "Dup Person", "email": "other.dup@example.com"})
+
+    r = await client.put(
+        f"/leads/{by_name}",
+        json={"phone": "+15559990001"},
+        params={"reject_duplicates": True},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 409
+    r = await client.put(
+        f"/leads/{first}", json={"utm_term": "kept"}, headers=manager_token_headers
+    )
+    assert r.status_code == 200, r.text
+
+    r = await client.post(
+        "/quotations/",
+        json={
+            "lead_id": by_phone,
+            "line_items": [{"description": "Seat", "quantity": 1, "price": 5}],
+        },
+        headers=manager_token_headers,
+    )
+    quotation_id = r.json()["id"]
+
+    async for db in get_test_db():
+        user_id = (await db.execute(select(User.id).limit(1))).scalar_one()
+        preview = await dedup_leads(db, user_id=user_id, dry_run=True)
+        assert (preview.clusters, preview.merged) == (2, 3)
+        result = await dedup_leads(db, user_id=user_id, batch_size=1)
+        assert (result.clusters, result.merged) == (2, 3)
+        leads = (
+            (await db.execute(select(Lead).where(Lead.name.ilike("%dup%"))))
+            .scalars()
+            .all()
+        )
+        survivors = {lead.id: lead for lead in leads}
+        assert set(survivors) == {first, by_name} | {
+            lead.id for lead in leads if lead.email == "other.dup@example.com"
+        }
+        assert not {by_email, by_phone, name_twin} & set(survivors)
+        merged = survivors[first]
+        assert (merged.phone, merged.utm_source, merged.utm_term) == (
+            "+15559990001",
+            "dup-ads",
+            "kept",
+        )
+        quotation = await db.get(Quotation, quotation_id)
+        assert quotation.lead_id == first
+        assert (await dedup_leads(db, user_id=user_id)).clusters == 0
+
+    await audit_writer.flush()
+    async for db in get_test_db():
+        actions = (
+            await db.execute(
+                select(AuditLog.entity_id, AuditLog.context).where(
+                    AuditLog.action.in_(["Merge Leads", "Delete Lead"]),
+                    AuditLog.entity_id.in_([first, by_email, by_phone]),
+                )
+            )
+        ).all()
+        assert sorted(actions) == sorted(
+            [
+                (first, f"merged leads {by_email}, {by_phone}"),
+                (by_email, f"merged into lead {first}"),
+                (by_phone, f"merged into lead {first}"),
+            ]
+        )
+
+
+async def test_bulk_lead_status(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    ids = []
+    for lead in (
+        {"name": "Bulk One", "email": "bulk.one@example.com"},
+        {"name": "Bulk Two", "email": "bulk.two@example.com"},
+        {"name": "Bulk Three", "phone": "+15557770003"},
+    ):
+        r = await client.post("/leads/", json=lead, headers=manager_token_headers)
+        ids.append(r.json()["id"])
+
+    r = await client.put(
+        "/leads/bulk/status",
+        json={"ids": [*ids, ids[0], 999999], "status": "Qualified"},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    result = r.json()
+    assert result["updated"] == ids[:2]
+    assert {item["id"] for item in result["rejected"]} == {ids[2], 999999}
+    for id, status in zip(ids, ["Qualified", "Qualified", "New"]):
+        r = await client.get(f"/leads/{id}", headers=manager_token_headers)
+        assert r.json()["status"] == status
+
+    r = await client.put(
+        "/leads/bulk/status",
+        json={"ids": ids, "status": "New"},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 400
+
+    await audit_writer.flush()
+    async for db in get_test_db():
+        audits = (
+            await db.execute(
+                select(AuditLog.before_values, AuditLog.after_values).where(
+                    AuditLog.entity_id == ids[0],
+                    AuditLog.action == "Update Lead",
+                )
+            )
+        ).all()
+        assert [(before["status"], after["status"]) for before, after in audits] == [
+            ("New", "Qualified")
+        ]
+
+
+async def test_lead_sparse_fields(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    for name in ("Sparse One", "Sparse Two"):
+        r = await client.post(
+            "/leads/",
+            json={"name": name, "utm_source": "sparse-fields"},
+            headers=manager_token_headers,
+        )
+        assert r.status_code == 200, r.text
+    params = {"utm_source": "sparse-fields", "fields": "name, status", "limit": 1}
+    r = await client.get("/leads/", params=params, headers=manager_token_headers)
+    assert r.status_code == 200, r.text
+    first = r.json()
+    assert first["items"][0]["name"] == "Sparse Two"
+    assert set(first["items"][0]) == {"id", "name", "status"}
+    r = await client.get(
+        "/leads/",
+        params={**params, "cursor": first["next_cursor"]},
+        headers=manager_token_headers,
+    )
+    assert [item["name"] for item in r.json()["items"]] == ["Sparse One"]
+
+
+async def test_lead_cursor_is_bound_to_its_sort(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    for name in ("Sorted One", "Sorted Two"):
+        await client.post(
+            "/leads/",
+            json={"name": name, "utm_source": "cursor-sort"},
+            headers=manager_token_headers,
+        )
+    params = {"utm_source": "cursor-sort", "limit": 1, "sort": "updated_at"}
+    r = await client.get("/leads/", params=params, headers=manager_token_headers)
+    cursor = r.json()["next_cursor"]
+    r = await client.get(
+        "/leads/",
+        params={**params, "cursor": cursor, "sort": "created_at"},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Cursor was issued for sort=updated_at"
+    r = await client.get(
+        "/leads/", params={**params, "cursor": cursor}, headers=manager_token_headers
+    )
+    assert [item["name"] for item in r.json()["items"]] == ["Sorted One"]
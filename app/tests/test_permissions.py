@@ -0,0 +1,26 @@
+from app.util.auth.permissions import PermissionMatcher, get_permission_matcher
+
+PERMISSIONS = ["GET:/users/", "GET:/users/*/", "PUT:/users/*/role/", "*:/health/"]
+
+
+def test_permission_matcher_exact_and_glob() -> None:
+    matcher = PermissionMatcher(PERMISSIONS)
+    assert matcher.match("Get:/users/")
+    assert matcher.match("Get:/users/12/")
+    assert matcher.match("Put:/users/12/role/")
+    assert matcher.match("Delete:/health/")
+    assert not matcher.match("Delete:/users/12/")
+    assert not matcher.match("Post:/users/")
+
+
+def test_permission_matcher_matches_fnmatch_star_semantics() -> None:
+    # "*" spans path separators, exactly like the previous fnmatch check
+    matcher = PermissionMatcher(["GET:/audit-logs/*/"])
+    assert matcher.match("Get:/audit-logs/entities/Lead/1/timeline/")
+
+
+def test_get_permission_matcher_is_cached() -> None:
+    first = get_permission_matcher(PERMISSIONS)
+    second = get_permission_matcher(list(reversed(PERMISSIONS)))
+    assert first is second
+    assert not PermissionMatcher([]).match("Get:/users/")
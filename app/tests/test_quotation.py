@@ -0,0 +1,325 @@
+from typing import Dict
+
+from httpx import AsyncClient
+from sqlalchemy import text
+
+from app.tests.utils.db import get_test_db
+from app.util.audit.writer import audit_writer
+
+
+async def test_paginate_quotations(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    r = await client.post(
+        "/leads/", json={"name": "Quoted Lead"}, headers=manager_token_headers
+    )
+    lead_id = r.json()["id"]
+    ids = []
+    for i in range(3):
+        r = await client.post(
+            "/quotations/",
+            json={
+                "lead_id": lead_id,
+                "line_items": [{"description": "Seat", "quantity": i + 1, "price": 10}],
+            },
+            headers=manager_token_headers,
+        )
+        assert r.status_code == 200, r.text
+        ids.append(r.json()["id"])
+
+    params = {"lead_id": lead_id, "limit": 2, "total": "exact"}
+    r = await client.get("/quotations/", params=params, headers=manager_token_headers)
+    first = r.json()
+    assert [item["id"] for item in first["items"]] == ids[:0:-1]
+    assert (first["total"], first["has_next"]) == (3, True)
+    assert first["items"][0]["line_items"][0]["quantity"] == 3
+
+    r = await client.get(
+        "/quotations/",
+        params={**params, "cursor": first["next_cursor"]},
+        headers=manager_token_headers,
+    )
+    second = r.json()
+    assert [item["id"] for item in second["items"]] == ids[:1]
+    assert (second["total"], second["has_next"], second["has_prev"]) == (3, False, True)
+    assert second["next_cursor"] is None
+
+
+async def test_quotation_sparse_fields(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    r = await client.post(
+        "/leads/", json={"name": "Sparse Lead"}, headers=manager_token_headers
+    )
+    lead_id = r.json()["id"]
+    r = await client.post(
+        "/quotations/",
+        json={
+            "lead_id": lead_id,
+            "line_items": [
+                {"description": "Seat", "quantity": 2, "price": 10},
+                {"description": "Setup", "quantity": 1, "price": 50},
+            ],
+        },
+        headers=manager_token_headers,
+    )
+    quotation_id = r.json()["id"]
+
+    params = {"lead_id": lead_id, "fields": "status,total_price", "total": "exact"}
+    r = await client.get("/quotations/", params=params, headers=manager_token_headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["items"] == [
+        {"id": quotation_id, "status": "Draft", "total_price": 70.0}
+    ]
+    assert r.json()["total"] == 1
+
+    params["fields"] = "line_items"
+    r = await client.get("/quotations/", params=params, headers=manager_token_headers)
+    (item,) = r.json()["items"]
+    assert [(line["description"], line["quantity"]) for line in item["line_items"]] == [
+        ("Seat", 2),
+        ("Setup", 1),
+    ]
+
+
+async def test_patch_quotation_line_items(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    r = await client.post(
+        "/leads/", json={"name": "Patched Lead"}, headers=manager_token_headers
+    )
+    r = await client.post(
+        "/quotations/",
+        json={
+            "lead_id": r.json()["id"],
+            "line_items": [
+                {"description": f"Line {n}", "quantity": 1, "price": 10}
+                for n in range(3)
+            ],
+        },
+        headers=manager_token_headers,
+    )
+    quotation = r.json()
+    first, second, third = (item["id"] for item in quotation["line_items"])
+
+    r = await client.patch(
+        f"/quotations/{quotation['id']}/line-items",
+        json={
+            "add": [{"description": "Extra", "quantity": 2, "price": 7.5}],
+            "update": [{"id": first, "quantity": 4}],
+            "remove": [second],
+        },
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    patched = r.json()
+    lines = [
+        (item["description"], item["quantity"], item["price"])
+        for item in patched["line_items"]
+    ]
+    assert lines == [("Line 0", 4, 10), ("Line 2", 1, 10), ("Extra", 2, 7.5)]
+    assert patched["total_price"] == 65
+    r = await client.get(
+        f"/quotations/{quotation['id']}", headers=manager_token_headers
+    )
+    assert r.json()["total_price"] == 65 and len(r.json()["line_items"]) == 3
+
+    for patch, status in (
+        ({"remove": [second]}, 404),
+        ({"update": [{"id": third, "price": 1}], "remove": [third]}, 400),
+    ):
+        r = await client.patch(
+            f"/quotations/{quotation['id']}/line-items",
+            json=patch,
+            headers=manager_token_headers,
+        )
+        assert r.status_code == status, r.text
+
+
+async def test_patch_without_changes_writes_nothing(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    r = await client.post(
+        "/leads/", json={"name": "Unchanged Lead"}, headers=manager_token_headers
+    )
+    r = await client.post(
+        "/quotations/",
+        json={
+            "lead_id": r.json()["id"],
+            "line_items": [{"description": "Seat", "quantity": 1, "price": 10.1}],
+        },
+        headers=manager_token_headers,
+    )
+    quotation = r.json()
+    item = quotation["line_items"][0]
+    await audit_writer.flush()
+
+    async def audit_count() -> int:
+        async for db in get_test_db():
+            result = await db.execute(
+                text(
+                    "SELECT count(*) FROM audit_logs"
+                    " WHERE entity_type = 'QUOTATION' AND entity_id = :id"
+                ),
+                {"id": quotation["id"]},
+            )
+            count = result.scalar_one()
+        return count
+
+    before = await audit_count()
+    r = await client.patch(
+        f"/quotations/{quotation['id']}/line-items",
+        json={"update": [{"id": item["id"], "price": 10.1, "quantity": 1}]},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    assert r.json()["updated_at"] == quotation["updated_at"]
+    await audit_writer.flush()
+    assert await audit_count() == before
+
+
+async def test_patch_replaces_last_line_item(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    r = await client.post(
+        "/leads/", json={"name": "Replaced Lead"}, headers=manager_token_headers
+    )
+    r = await client.post(
+        "/quotations/",
+        json={
+            "lead_id": r.json()["id"],
+            "line_items": [
+                {"description": f"Line {n}", "quantity": 1, "price": 10}
+                for n in range(2)
+            ],
+        },
+        headers=manager_token_headers,
+    )
+    quotation = r.json()
+    # the newest line has the table's highest id, which SQLite hands out again
+    first, last = (item["id"] for item in quotation["line_items"])
+
+    r = await client.patch(
+        f"/quotations/{quotation['id']}/line-items",
+        json={
+            "add": [{"description": "New", "quantity": 3, "price": 5}],
+            "remove": [last],
+        },
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    patched = r.json()
+    assert [item["description"] for item in patched["line_items"]] == [
+        "Line 0",
+        "New",
+    ]
+    assert patched["total_price"] == 25
+    r = await client.get(
+        f"/quotations/{quotation['id']}/line-items", headers=manager_token_headers
+    )
+    assert [item["id"] for item in r.json()] == [
+        item["id"] for item in patched["line_items"]
+    ]
+
+
+async def test_quotation_totals_are_exact(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    r = await client.post(
+        "/leads/", json={"name": "Cents Lead"}, headers=manager_token_headers
+    )
+    r = await client.post(
+        "/quotations/",
+        json={
+            "lead_id": r.json()["id"],
+            "line_items": [
+                {"description": "Seat", "quantity": 3, "price": 0.1},
+                {"description": "Setup", "quantity": 1, "price": 0.2},
+                {"description": "Support", "quantity": 3, "price": 19.99},
+            ],
+        },
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    quotation = r.json()
+    assert quotation["total_price"] == 60.47
+    support = quotation["line_items"][2]["id"]
+
+    r = await client.put(
+        f"/quotations/{quotation['id']}/line-items",
+        json={"line_items": [{"id": support, "price": 10.1}]},
+        headers=manager_token_headers,
+    )
+    assert r.status_code == 200, r.text
+    # summed as floats this would be 30.799999999999997
+    assert r.json()["total_price"] == 30.8
+    async for db in get_test_db():
+        stored = await db.execute(
+            text("SELECT total_price FROM quotations WHERE id = :id"),
+            {"id": quotation["id"]},
+        )
+        assert stored.scalar_one() == 3080
+
+
+async def test_quotation_summary_view(
+    client: AsyncClient, manager_token_headers: Dict[str, str]
+) -> None:
+    r = await client.post(
+        "/leads/", json={"name": "Summary Lead"}, headers=manager_token_headers
+    )
+    lead_id = r.json()["id"]
+    ids = []
+    for lines in (3, 1):
+        r = await client.post(
+            "/quotations/",
+            json={
+                "lead_id": lead_id,
+                "line_items": [
+                    {"description": f"Line {n}", "quantity": 2, "price": 5}
+                    for n in range(lines)
+                ],
+            },
+            headers=manager_token_headers,
+        )
+        ids.append(r.json()["id"])
+
+    params = {"lead_id": lead_id, "limit": 1, "total": "exact"}
+    r = await client.get(
+        "/quotations/summary", params=params, headers=manager_token_headers
+    )
+    assert r.status_code == 200, r.text
+    page = r.json()
+    assert page["total"] == 2 and page["has_next"]
+    (newest,) = page["items"]
+    assert set(newest) == {
+        "id",
+        "lead_id",
+        "status",
+        "total_price",
+        "line_item_count",
+        "created_at",
+        "updated_at",
+    }
+    assert (newest["id"], newest["line_item_count"], newest["total_price"]) == (
+        ids[1],
+        1,
+        10,
+    )
+    r = await client.get(
+        "/quotations/summary",
+        params={**params, "cursor": page["next_cursor"]},
+        headers=manager_token_headers,
+    )
+    assert [(item["id"], item["line_item_count"]) for item in r.json()["items"]] == [
+        (ids[0], 3)
+    ]
+    assert not r.json()["has_next"]
+
+    r = await client.get(
+        f"/quotations/{ids[0]}/line-items", headers=manager_token_headers
+    )
+    assert r.status_code == 200, r.text
+    assert [item["description"] for item in r.json()] == ["Line 0", "Line 1", "Line 2"]
+    assert set(r.json()[0]) == {"id", "description", "quantity", "price"}
+    r = await client.get("/quotations/0/line-items", headers=manager_token_headers)
+    assert r.status_code == 404
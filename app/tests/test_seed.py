@@ -35,19 +35,24 @@ async def create_defaults():
             "DELETE:/roles/*/permissions/*/",
             "GET:/leads/",
             "POST:/leads/",
+            "POST:/leads/import/",
             "GET:/leads/*/",
             "PUT:/leads/*/",
             "DELETE:/leads/*/",
             "PUT:/leads/*/status/",
+            "PUT:/leads/bulk/status/",
             "GET:/quotations/",
             "POST:/quotations/",
             "GET:/quotations/*/",
             "DELETE:/quotations/*/",
+            "GET:/quotations/*/line-items/",
             "PUT:/quotations/*/line-items/",
+            "PATCH:/quotations/*/line-items/",
             "PUT:/quotations/*/status/",
             "POST:/quotations/*/send/",
             "GET:/audit-logs/",
             "GET:/audit-logs/*/",
+            "GET:/analytics/utm/",
         ]
         for permission in permissions:
             permission = Permission(
@@ -68,6 +73,7 @@ async def create_defaults():
             select(Permission).where(
                 Permission.name.ilike(f"%leads%")
                 | Permission.name.ilike(f"%quotations%")
+                | Permission.name.ilike(f"%analytics%")
             )
         )
         manager_permissions = manager_permissions.scalars().all()
@@ -0,0 +1,34 @@
+import asyncio
+
+from app.util.tasks import TaskSupervisor
+
+
+async def test_task_supervisor_bounds_concurrency_and_counts_failures() -> None:
+    supervisor = TaskSupervisor("test", max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def job(fail: bool = False) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if fail:
+            raise ValueError("boom")
+
+    for i in range(5):
+        await supervisor.spawn(job(fail=i == 0))
+    await supervisor.drain()
+
+    assert peak <= 2
+    assert supervisor.active == 0
+    assert supervisor.succeeded == 4 and supervisor.failed == 1
+    assert "boom" in (supervisor.last_error or "")
+
+
+async def test_task_supervisor_drain_cancels_after_timeout() -> None:
+    supervisor = TaskSupervisor("test")
+    await supervisor.spawn(asyncio.sleep(10))
+    await supervisor.drain(timeout=0.01)
+    assert supervisor.cancelled == 1 and supervisor.active == 0
@@ -0,0 +1,261 @@
+"""
+Daily UTM attribution rollups kept in ``lead_attribution_daily``.
+
+    python -m app.util.analytics.rollup [--rebuild]
+
+Lead and quotation writes made through ``CRUDLead`` / ``CRUDQuotation`` mark
+the creation day of every lead they touch as dirty, in the same transaction.
+``refresh`` recomputes the rollup rows of dirty days from leads and their
+quotations, reading only those days' leads through the ``created_at`` index,
+so its cost follows the write volume rather than the size of the tables.
+The app refreshes every ``ANALYTICS_REFRESH_SECONDS``; ``--rebuild``
+recomputes every day, e.g. after data was changed outside the app.
+"""
+
+import argparse
+import asyncio
+import datetime
+import logging
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy import Date, and_, case, delete, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import Select
+
+from app.db import AsyncSessionLocal
+from app.models import (
+    Lead,
+    LeadAttributionDaily,
+    LeadAttributionDirtyDay,
+    LeadStatus,
+    Quotation,
+    QuotationStatus,
+)
+from app.util.setting import get_settings
+from app.util.tasks import background_tasks
+
+settings = get_settings()
+
+logger = logging.getLogger("app")
+
+# Dirty days recomputed per transaction
+DAYS_PER_REFRESH = 31
+ROLLUP_COLUMNS = [
+    "day",
+    "utm_source",
+    "utm_medium",
+    "utm_campaign",
+    "leads",
+    "qualified",
+    "quoted",
+    "converted",
+    "revenue",
+    "refreshed_at",
+]
+
+
+def lead_day(column: Any = Lead.created_at) -> Any:
+    return func.date(column, type_=Date)
+
+
+async def mark_days(db: AsyncSession, days: Iterable[Optional[datetime.date]]) -> None:
+    """
+    Flag rollup days as out of date, as part of the caller's transaction.
+    Datetimes mark their day. A day already marked is updated rather than
+    skipped, so the mark holds that row's lock until the caller commits and
+    ``refresh`` cannot clear it before the caller's leads are visible.
+    """
+    marked = {
+        day.date() if isinstance(day, datetime.datetime) else day
+        for day in days
+        if day is not None
+    }
+    rows = [{"day": day} for day in marked]
+    if not rows:
+        return
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+        query = dialect_insert(LeadAttributionDirtyDay)
+        query = query.on_conflict_do_update(
+            index_elements=[LeadAttributionDirtyDay.day],
+            set_={"day": query.excluded.day},
+        )
+        await db.execute(query, rows)
+        return
+    marked = await db.execute(
+        select(LeadAttributionDirtyDay.day).where(
+            LeadAttributionDirtyDay.day.in_([row["day"] for row in rows])
+        )
+    )
+    existing = set(marked.scalars())
+    rows = [row for row in rows if row["day"] not in existing]
+    if rows:
+        await db.execute(insert(LeadAttributionDirtyDay), rows)
+
+
+async def mark_leads(db: AsyncSession, lead_ids: Iterable[int]) -> None:
+    """Flag the creation days of ``lead_ids`` as out of date"""
+    ids = set(lead_ids)
+    if ids:
+        query = select(lead_day()).where(Lead.id.in_(ids)).distinct()
+        await mark_days(db, (await db.execute(query)).scalars().all())
+
+
+def aggregate(days: List[datetime.date]) -> Select:
+    """Rollup rows of ``days``, computed from leads and quotations"""
+    start = datetime.datetime.combine(min(days), datetime.time.min)
+    end = datetime.datetime.combine(max(days), datetime.time.min)
+    in_range = and_(
+        Lead.created_at >= start,
+        Lead.created_at < end + datetime.timedelta(days=1),
+    )
+    accepted = Quotation.status == QuotationStatus.ACCEPTED
+    quotations = (
+        select(
+            Quotation.lead_id,
+            func.sum(case((accepted, 1), else_=0)).label("accepted"),
+            func.sum(case((accepted, Quotation.total_price), else_=0)).label("revenue"),
+        )
+        .where(Quotation.lead_id.in_(select(Lead.id).where(in_range)))
+        .group_by(Quotation.lead_id)
+        .subquery()
+    )
+    keys = [
+        lead_day(),
+        func.coalesce(Lead.utm_source, ""),
+        func.coalesce(Lead.utm_medium, ""),
+        func.coalesce(Lead.utm_campaign, ""),
+    ]
+    return (
+        select(
+            *keys,
+            func.count(Lead.id),
+            func.sum(case((Lead.status == LeadStatus.QUALIFIED, 1), else_=0)),
+            func.count(quotations.c.lead_id),
+            func.sum(case((quotations.c.accepted > 0, 1), else_=0)),
+            func.coalesce(func.sum(quotations.c.revenue), 0),
+            literal(datetime.datetime.utcnow()),
+        )
+        .select_from(Lead)
+        .outerjoin(quotations, quotations.c.lead_id == Lead.id)
+        .where(in_range, lead_day().in_(days))
+        .group_by(*keys)
+    )
+
+
+async def refresh(db: AsyncSession, max_days: int = DAYS_PER_REFRESH) -> int:
+    """
+    Recompute up to ``max_days`` dirty days in one transaction and return how
+    many were refreshed. On Postgres, days locked by a transaction still
+    marking them (or by another refresher) are skipped and stay dirty for a
+    later call.
+    """
+    query = (
+        select(LeadAttributionDirtyDay.day)
+        .order_by(LeadAttributionDirtyDay.day)
+        .limit(max_days)
+        .with_for_update(skip_locked=True)
+    )
+    days = (await db.execute(query)).scalars().all()
+    if not days:
+        await db.commit()
+        return 0
+    await db.execute(
+        delete(LeadAttributionDirtyDay).where(LeadAttributionDirtyDay.day.in_(days))
+    )
+    await db.execute(
+        delete(LeadAttributionDaily).where(LeadAttributionDaily.day.in_(days))
+    )
+    await db.execute(
+        insert(LeadAttributionDaily).from_select(ROLLUP_COLUMNS, aggregate(days))
+    )
+    await db.commit()
+    return len(days)
+
+
+async def refresh_all(db: AsyncSession) -> int:
+    refreshed = 0
+    while days := await refresh(db):
+        refreshed += days
+    return refreshed
+
+
+async def rebuild(db: AsyncSession) -> int:
+    """Mark every day that has leads or rollup rows dirty and refresh them"""
+    days = (await db.execute(select(lead_day()).distinct())).scalars().all()
+    rolled_up = await db.execute(select(LeadAttributionDaily.day).distinct())
+    await mark_days(db, [*days, *rolled_up.scalars().all()])
+    await db.commit()
+    return await refresh_all(db)
+
+
+class RollupRefresher:
+    """Refreshes dirty rollup days in the background every ``interval`` seconds"""
+
+    def __init__(
+        self, session_factory: Any = AsyncSessionLocal, interval: float = 60.0
+    ) -> None:
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running or self.interval <= 0:
+            return
+        self._task = await background_tasks.spawn(self._run(), name="analytics-rollup")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        assert self._task is not None
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self.session_factory() as session:
+                    await refresh_all(session)
+            except Exception:
+                logger.exception("Refreshing the attribution rollups failed")
+            await asyncio.sleep(self.interval)
+
+
+attribution_refresher = RollupRefresher(
+    interval=float(getattr(settings, "ANALYTICS_REFRESH_SECONDS", 60))
+)
+
+
+def main() -> None:
+    from app.db import engine
+
+    parser = argparse.ArgumentParser(description="Refresh UTM attribution rollups")
+    parser.add_argument(
+        "--rebuild", action="store_true", help="recompute every day, not just dirty"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> int:
+        try:
+            async with AsyncSessionLocal() as db:
+                return await (rebuild(db) if args.rebuild else refresh_all(db))
+        finally:
+            await engine.dispose()
+
+    print(f"refreshed {asyncio.run(run())} days")
+
+
+if __name__ == "__main__":
+    main()
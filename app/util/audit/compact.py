@@ -0,0 +1,110 @@
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import AuditLog, EntityType
+from app.util.audit.diff import diff_values, is_diffable
+
+EntityKey = Tuple[EntityType, int]
+
+
+class AuditCompactor:
+    """
+    In diff mode, replaces the full before/after snapshots of update records
+    with the changed fields, keeping a full snapshot every ``snapshot_every``
+    updates of an entity (0: never).
+
+    Diffs since an entity's last snapshot are counted in the database, with
+    one query per batch for all the entities in it, so every process agrees
+    on when the next snapshot is due.
+    """
+
+    def __init__(self, diff_mode: bool = False, snapshot_every: int = 0) -> None:
+        self.diff_mode = diff_mode
+        self.snapshot_every = snapshot_every
+
+    async def diffs_since_snapshot(
+        self, db: AsyncSession, keys: Iterable[EntityKey]
+    ) -> Dict[EntityKey, int]:
+        """
+        How many diff records each entity has after its latest snapshot,
+        looking at no more than its newest ``snapshot_every`` records
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        entity = (AuditLog.entity_type, AuditLog.entity_id)
+        position = (
+            func.row_number()
+            .over(
+                partition_by=entity,
+                order_by=(AuditLog.created_at.desc(), AuditLog.id.desc()),
+            )
+            .label("position")
+        )
+        newest = (
+            select(*entity, AuditLog.snapshot, position)
+            .where(tuple_(*entity).in_(keys))
+            .subquery()
+        )
+        result = await db.execute(
+            select(newest.c.entity_type, newest.c.entity_id, newest.c.snapshot)
+            .where(newest.c.position <= self.snapshot_every)
+            .order_by(newest.c.entity_type, newest.c.entity_id, newest.c.position)
+        )
+        counts = dict.fromkeys(keys, 0)
+        done = set()
+        for entity_type, entity_id, snapshot in result:
+            key = (entity_type, entity_id)
+            if key in done:
+                continue
+            if snapshot:
+                done.add(key)
+            else:
+                counts[key] += 1
+        return counts
+
+    async def compact(
+        self, db: AsyncSession, rows: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Compact a batch of audit rows, oldest first, as they are about to be
+        inserted. Rows that are not updates are kept whole.
+        """
+        if not self.diff_mode:
+            return rows
+        updates = [
+            row
+            for row in rows
+            if is_diffable(row.get("before_values"), row.get("after_values"))
+        ]
+        if not updates:
+            return rows
+        counts: Dict[EntityKey, int] = {}
+        if self.snapshot_every:
+            counts = await self.diffs_since_snapshot(
+                db, ((row["entity_type"], row["entity_id"]) for row in updates)
+            )
+        compacted = []
+        for row in rows:
+            key = (row["entity_type"], row["entity_id"])
+            if not is_diffable(row.get("before_values"), row.get("after_values")):
+                if key in counts and row.get("snapshot", True):
+                    counts[key] = 0
+            elif self.snapshot_every and counts[key] + 1 >= self.snapshot_every:
+                counts[key] = 0
+            else:
+                if self.snapshot_every:
+                    counts[key] += 1
+                before_values, after_values = diff_values(
+                    row["before_values"], row["after_values"]
+                )
+                row = {
+                    **row,
+                    "before_values": before_values,
+                    "after_values": after_values,
+                    "snapshot": False,
+                }
+            compacted.append(row)
+        return compacted
@@ -0,0 +1,49 @@
+import datetime
+import decimal
+import enum
+from typing import Any, Dict, Optional, Tuple
+
+
+def is_diffable(before: Any, after: Any) -> bool:
+    return isinstance(before, dict) and isinstance(after, dict)
+
+
+def diff_values(
+    before: Dict[str, Any], after: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Reduce two snapshots to the fields whose value changed. A key missing from
+    ``after`` was not captured (e.g. an unloaded relationship), not removed,
+    so it is left out of the diff.
+    """
+    changed = [key for key, value in after.items() if before.get(key) != value]
+    return (
+        {key: before.get(key) for key in changed},
+        {key: after[key] for key in changed},
+    )
+
+
+def apply_diff(
+    state: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    if state is None:
+        return None
+    return {**state, **(after or {})}
+
+
+def snapshot_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Audit snapshot of a plain table row. Rows hold only scalars, datetimes,
+    enums and money, so encoding them directly is far cheaper than
+    ``jsonable_encoder`` when many rows are audited at once.
+    """
+    return {key: _encode(value) for key, value in row.items()}
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    # money is a Decimal, which jsonable_encoder writes as a float too
+    return float(value) if isinstance(value, decimal.Decimal) else value
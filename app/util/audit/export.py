@@ -0,0 +1,80 @@
+import csv
+import datetime
+import enum
+import io
+import json
+import zlib
+from typing import Any, AsyncIterator, List, Mapping
+
+EXPORT_COLUMNS = [
+    "id",
+    "created_at",
+    "entity_type",
+    "entity_id",
+    "user_id",
+    "username",
+    "action",
+    "context",
+    "snapshot",
+    "before_values",
+    "after_values",
+]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return str(value)
+
+
+def _ndjson(rows: List[Mapping[str, Any]]) -> str:
+    return "".join(
+        json.dumps({key: row[key] for key in EXPORT_COLUMNS}, default=_default) + "\n"
+        for row in rows
+    )
+
+
+def _cell(key: str, value: Any) -> str:
+    if value is None:
+        return ""
+    if key in ("before_values", "after_values"):
+        return json.dumps(value, default=_default)
+    return value if isinstance(value, str) else _default(value)
+
+
+def _csv(rows: List[Mapping[str, Any]], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([_cell(key, row[key]) for key in EXPORT_COLUMNS])
+    return buffer.getvalue()
+
+
+async def encode_export(
+    chunks: AsyncIterator[List[Mapping[str, Any]]], format: str, compress: bool
+) -> AsyncIterator[bytes]:
+    """
+    Turn chunks of audit rows into NDJSON or CSV bytes, optionally gzipped.
+    Each chunk is encoded and handed on as soon as it arrives, so memory use
+    is bounded by the chunk size rather than the export size.
+    """
+    gzip = zlib.compressobj(wbits=31) if compress else None
+    header = format == "csv"
+    async for rows in chunks:
+        text = _ndjson(rows) if format == "ndjson" else _csv(rows, header)
+        header = False
+        data = gzip.compress(text.encode()) if gzip else text.encode()
+        if data:
+            yield data
+    # an empty CSV export still gets its header line
+    tail = _csv([], header=True).encode() if header else b""
+    if gzip:
+        tail = gzip.compress(tail) + gzip.flush()
+    if tail:
+        yield tail
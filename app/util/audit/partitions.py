@@ -0,0 +1,303 @@
+"""
+Monthly partition maintenance for the Postgres ``audit_logs`` table.
+
+    python -m app.util.audit.partitions [--ahead 3] [--retention-months 12]
+        [--archive-dir archive/audit_logs] [--keep-detached] [--dry-run]
+
+Run it at least once a month (e.g. daily from cron): it pre-creates the next
+``ahead`` monthly partitions, detaches partitions older than the retention
+window and archives each one to ``<archive-dir>/<partition>.ndjson.gz``
+before dropping it.
+
+The app also makes sure of the current and next month at startup
+(``ensure_partitions``). Rows outside every monthly partition land in
+``audit_logs_default`` rather than failing the insert; they are moved into
+their month when its partition is created.
+"""
+
+import argparse
+import asyncio
+import datetime
+import gzip
+import logging
+import os
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.util.setting import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger("app")
+
+PARENT = "audit_logs"
+DEFAULT_PARTITION = "audit_logs_default"
+# Serializes partition changes between app instances starting together
+LOCK_KEY = 0x6175646974
+NAME_PATTERN = re.compile(r"^audit_logs_y(\d{4})m(\d{2})$")
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[datetime.date]:
+    match = NAME_PATTERN.match(name)
+    if not match:
+        return None
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def plan_partitions(
+    today: datetime.date, ahead: int
+) -> List[Tuple[str, datetime.date, datetime.date]]:
+    """Partitions (name, from, to) covering the current month and ``ahead`` more"""
+    current = month_start(today)
+    return [
+        (partition_name(month), month, add_months(month, 1))
+        for month in (add_months(current, i) for i in range(ahead + 1))
+    ]
+
+
+def expired_partitions(
+    names: List[str], today: datetime.date, retention_months: int
+) -> List[str]:
+    """Partitions whose whole month is older than the retention window"""
+    cutoff = add_months(month_start(today), -retention_months)
+    return sorted(
+        name
+        for name in names
+        if (month := partition_month(name)) is not None and month < cutoff
+    )
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """
+    Whether ``audit_logs`` is the partitioned table the migrations build;
+    ``create_all`` (e.g. ``make seed``) makes it a plain one
+    """
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table "
+            "JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+            "WHERE pg_class.relname = :parent"
+        ),
+        {"parent": PARENT},
+    )
+    return result.first() is not None
+
+
+async def list_partitions(conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": PARENT},
+    )
+    return [row[0] for row in result]
+
+
+async def list_detached(conn: AsyncConnection) -> List[str]:
+    """Monthly tables no longer attached to the parent (awaiting archival)"""
+    result = await conn.execute(
+        text(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' "
+            "AND NOT relispartition AND relname ~ :pattern"
+        ),
+        {"pattern": NAME_PATTERN.pattern},
+    )
+    return [row[0] for row in result]
+
+
+async def create_partitions(
+    conn: AsyncConnection, today: datetime.date, ahead: int
+) -> List[str]:
+    """
+    Create the default partition and any missing monthly ones. A month is
+    built as a plain table, filled with its rows from the default partition
+    and then attached, since Postgres refuses a new partition whose range
+    still has rows in the default one.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+    await conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} "
+            f"PARTITION OF {PARENT} DEFAULT"
+        )
+    )
+    existing = set(await list_partitions(conn))
+    created = []
+    for name, start, end in plan_partitions(today, ahead):
+        if name in existing:
+            continue
+        bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = (
+            f"created_at >= '{start.isoformat()}' AND created_at < '{end.isoformat()}'"
+        )
+        await conn.execute(
+            text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)")
+        )
+        await conn.execute(
+            text(
+                f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} "
+                f"WHERE {in_range}"
+            )
+        )
+        await conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"))
+        await conn.execute(
+            text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES {bounds}")
+        )
+        created.append(name)
+    return created
+
+
+async def ensure_partitions(
+    engine: AsyncEngine, ahead: int = 1, today: Optional[datetime.date] = None
+) -> List[str]:
+    """
+    Create the partitions for the current month and ``ahead`` more, if
+    missing. Called at app startup; does nothing off Postgres or when
+    ``audit_logs`` is not partitioned.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    today = today or datetime.datetime.utcnow().date()
+    async with engine.begin() as conn:
+        if not await is_partitioned(conn):
+            logger.warning(
+                "%s is not partitioned (created without migrations?), "
+                "skipping partition maintenance",
+                PARENT,
+            )
+            return []
+        created = await create_partitions(conn, today, ahead)
+    for name in created:
+        logger.info("Created partition %s", name)
+    return created
+
+
+async def archive_partition(
+    conn: AsyncConnection, name: str, archive_dir: str
+) -> Tuple[str, int]:
+    """
+    Stream a detached partition into a gzip NDJSON file. The file is written
+    under a temporary name and renamed once complete, so a crash never leaves
+    a truncated archive that looks finished.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.ndjson.gz")
+    rows = 0
+    result = await conn.stream(
+        text(f"SELECT row_to_json(t)::text FROM {name} t ORDER BY created_at, id")
+    )
+    with gzip.open(f"{path}.partial", "wt", encoding="utf-8") as archive:
+        async for (line,) in result:
+            archive.write(line)
+            archive.write("\n")
+            rows += 1
+    os.replace(f"{path}.partial", path)
+    return path, rows
+
+
+async def maintain(
+    engine: AsyncEngine,
+    *,
+    ahead: int,
+    retention_months: int,
+    archive_dir: str,
+    keep_detached: bool = False,
+    dry_run: bool = False,
+    today: Optional[datetime.date] = None,
+) -> None:
+    if engine.dialect.name != "postgresql":
+        logger.warning("audit_logs partitioning is only supported on PostgreSQL")
+        return
+    today = today or datetime.datetime.utcnow().date()
+    async with engine.connect() as conn:
+        async with conn.begin():
+            partitioned = await is_partitioned(conn)
+        if not partitioned:
+            logger.warning("%s is not partitioned, run the migrations first", PARENT)
+            return
+        if dry_run:
+            names = await list_partitions(conn)
+            planned = [name for name, *_ in plan_partitions(today, ahead)]
+            print("would create:", [name for name in planned if name not in names])
+            print("would detach:", expired_partitions(names, today, retention_months))
+            return
+        async with conn.begin():
+            for name in await create_partitions(conn, today, ahead):
+                logger.info("Created partition %s", name)
+        expired = expired_partitions(
+            await list_partitions(conn), today, retention_months
+        )
+        for name in expired:
+            async with conn.begin():
+                await conn.execute(
+                    text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+                )
+            logger.info("Detached partition %s", name)
+        if keep_detached:
+            return
+        # also picks up tables detached by an earlier run that failed to archive
+        for name in expired_partitions(
+            await list_detached(conn), today, retention_months
+        ):
+            async with conn.begin():
+                path, rows = await archive_partition(conn, name, archive_dir)
+                await conn.execute(text(f"DROP TABLE {name}"))
+            logger.info("Archived %s rows of %s to %s", rows, name, path)
+
+
+def main() -> None:
+    from app.db import engine
+
+    parser = argparse.ArgumentParser(description="Maintain audit_logs partitions")
+    parser.add_argument(
+        "--ahead", type=int, default=int(getattr(settings, "AUDIT_PARTITIONS_AHEAD", 3))
+    )
+    parser.add_argument(
+        "--retention-months",
+        type=int,
+        default=int(getattr(settings, "AUDIT_RETENTION_MONTHS", 12)),
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default=str(getattr(settings, "AUDIT_ARCHIVE_DIR", "archive/audit_logs")),
+    )
+    parser.add_argument("--keep-detached", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> None:
+        await maintain(
+            engine,
+            ahead=args.ahead,
+            retention_months=args.retention_months,
+            archive_dir=args.archive_dir,
+            keep_detached=args.keep_detached,
+            dry_run=args.dry_run,
+        )
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
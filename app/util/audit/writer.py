@@ -0,0 +1,191 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.db import AsyncSessionLocal
+from app.models import AuditLog
+from app.schema.auditlog import AuditLogCreate
+from app.util.audit.compact import AuditCompactor
+from app.util.setting import get_settings
+from app.util.tasks import TaskSupervisor
+
+settings = get_settings()
+
+logger = logging.getLogger("app")
+
+
+class AuditWriter:
+    """
+    Buffers audit events in memory and writes them with one multi-row INSERT
+    per batch. A batch is flushed when it reaches ``batch_size`` events or
+    ``flush_interval`` seconds after its first event, whichever comes first.
+
+    The queue holds at most ``max_queue`` events. When it is full, ``submit``
+    either waits for room (``overflow="block"``) or drops the event
+    (``overflow="drop"``). Batches are written by supervised tasks, at most
+    ``flush_concurrency`` at a time, while the next batch is collected.
+    Each batch goes through ``compactor`` on its way in, so diff mode costs
+    one query per batch rather than one per event.
+    """
+
+    def __init__(
+        self,
+        session_factory: Any = AsyncSessionLocal,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        max_queue: int = 10000,
+        overflow: str = "block",
+        flush_concurrency: int = 2,
+        compactor: Optional[AuditCompactor] = None,
+    ) -> None:
+        self.session_factory = session_factory
+        self.compactor = compactor or AuditCompactor()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.tasks = TaskSupervisor("audit-flush", max_concurrency=flush_concurrency)
+        self._queue: Optional["asyncio.Queue[Dict[str, Any]]"] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        # the queue and task belong to the loop that started the writer
+        return (
+            self._task is not None
+            and not self._task.done()
+            and self._task.get_loop() is asyncio.get_running_loop()
+        )
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name="audit-writer")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Flush everything still queued, then stop the writer
+        """
+        if not self.running:
+            return
+        try:
+            await self.flush(timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Audit queue not empty at shutdown: %s", self.stats())
+        assert self._task is not None
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.tasks.drain(timeout=timeout)
+
+    async def flush(self, timeout: float = 10.0) -> None:
+        """
+        Wait until every queued event has been written
+        """
+        if self._queue is not None and self.running:
+            await asyncio.wait_for(self._queue.join(), timeout)
+
+    async def submit(self, obj_in: AuditLogCreate) -> None:
+        if not self.running:
+            await self.start()
+        assert self._queue is not None
+        row = self._to_row(obj_in)
+        if self.overflow == "drop":
+            try:
+                self._queue.put_nowait(row)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return
+        else:
+            await self._queue.put(row)
+        self.enqueued += 1
+
+    def _to_row(self, obj_in: AuditLogCreate) -> Dict[str, Any]:
+        now = datetime.datetime.utcnow()
+        return {
+            **obj_in.model_dump(),
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self.tasks.spawn(self._write(batch), name="audit-flush")
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        assert self._queue is not None
+        started = time.perf_counter()
+        try:
+            async with self.session_factory() as session:
+                rows = await self.compactor.compact(session, batch)
+                await session.execute(insert(AuditLog), rows)
+                await session.commit()
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %s audit log(s)", len(batch))
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.batches += 1
+            self.last_flush_ms = elapsed
+            self.total_flush_ms += elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            for _ in batch:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "flushes_in_flight": self.tasks.active,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": (
+                round(self.total_flush_ms / self.batches, 3) if self.batches else 0.0
+            ),
+        }
+
+
+audit_writer = AuditWriter(
+    batch_size=int(getattr(settings, "AUDIT_BATCH_SIZE", 500)),
+    flush_interval=float(getattr(settings, "AUDIT_FLUSH_INTERVAL", 0.5)),
+    max_queue=int(getattr(settings, "AUDIT_QUEUE_SIZE", 10000)),
+    overflow=str(getattr(settings, "AUDIT_QUEUE_OVERFLOW", "block")),
+    flush_concurrency=int(getattr(settings, "AUDIT_FLUSH_CONCURRENCY", 2)),
+    compactor=AuditCompactor(
+        diff_mode=str(getattr(settings, "AUDIT_DIFF_MODE", "full")).lower() == "diff",
+        snapshot_every=int(getattr(settings, "AUDIT_SNAPSHOT_EVERY", 0)),
+    ),
+)
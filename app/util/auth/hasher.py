@@ -1,5 +1,10 @@
 from passlib.context import CryptContext
 
+from app.util.setting import get_settings
+from app.util.workers import WorkerPool
+
+settings = get_settings()
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
@@ -9,3 +14,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
+
+
+hash_pool = WorkerPool(
+    kind=str(getattr(settings, "PASSWORD_HASH_EXECUTOR", "thread")),
+    max_workers=int(getattr(settings, "PASSWORD_HASH_WORKERS", 4)),
+    name="hasher",
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await hash_pool.run(hash_password, password)
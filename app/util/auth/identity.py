@@ -0,0 +1,139 @@
+from dataclasses import dataclass, field
+from typing import Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import Role, User
+from app.schema import MeUser, TokenPayload
+from app.schema.user import Role as RoleSchema
+from app.util.auth.permissions import (
+    PermissionMatcher,
+    get_permission_matcher,
+    permission_set_version,
+)
+from app.util.cache import TTLCache
+from app.util.setting import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class RoleEntry:
+    role: RoleSchema
+    version: str
+    matcher: PermissionMatcher
+    # token versions already confirmed to be older than `version`
+    superseded: Set[str] = field(default_factory=set)
+
+
+def _role_entry(role: RoleSchema) -> RoleEntry:
+    names = [permission.name for permission in role.permissions]
+    return RoleEntry(
+        role=role,
+        version=permission_set_version(names),
+        matcher=get_permission_matcher(names),
+    )
+
+
+class IdentityCache:
+    """
+    In-process cache resolving compact token claims (user id, role id and
+    permission-set version) to the authenticated user and its permissions.
+
+    Every process keeps its own entries and ``invalidate_*`` only clears this
+    one, so with several workers a change to a user or role (a new role, a
+    revoked permission, a deletion) can take up to ``ttl`` seconds to reach
+    the others. A token issued after a permission change carries the new
+    version and makes any process reload that role at once.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30) -> None:
+        self.users: TTLCache[int, MeUser] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.roles: TTLCache[int, RoleEntry] = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def prime(self, me: MeUser) -> None:
+        """
+        Store an already loaded user (e.g. right after login)
+        """
+        entry = _role_entry(me.role)
+        self.roles.set(me.role_id, entry)
+        self.users.set(me.id, me.model_copy(update={"role": entry.role}))
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.users.pop(user_id)
+
+    def invalidate_role(self, role_id: int) -> None:
+        self.roles.pop(role_id)
+
+    async def resolve(
+        self, db: AsyncSession, payload: TokenPayload
+    ) -> Optional[Tuple[MeUser, PermissionMatcher]]:
+        """
+        Resolve token claims to the current user and its permission matcher.
+        Returns None when the user or its role no longer exists.
+        """
+        user_id = int(payload.sub) if payload.sub else 0
+        version = payload.permission_version
+        me = self.users.get(user_id)
+        fresh = me is None
+        if me is None:
+            me = await self._load_user(db, user_id)
+            if me is None:
+                return None
+
+        entry = self.roles.get(me.role_id)
+        if entry is None or (
+            not fresh
+            and me.role_id == payload.role_id
+            and entry.version != version
+            and version not in entry.superseded
+        ):
+            entry = await self._load_role(db, me.role_id)
+            if entry is None:
+                return None
+            fresh = True
+        if fresh and me.role_id == payload.role_id and entry.version != version:
+            # the token predates a permission change, current ones apply
+            entry.superseded.add(version)
+
+        if me.role is not entry.role:
+            me = me.model_copy(update={"role": entry.role})
+            self.users.set(me.id, me)
+        return me, entry.matcher
+
+    async def _load_user(self, db: AsyncSession, user_id: int) -> Optional[MeUser]:
+        query = (
+            select(User)
+            .where(User.id == user_id)
+            .options(selectinload(User.role).selectinload(Role.permissions))
+        )
+        result = await db.execute(query)
+        user = result.scalar_one_or_none()
+        if user is None:
+            return None
+        me = MeUser(**jsonable_encoder(user))
+        self.prime(me)
+        return self.users.get(me.id)
+
+    async def _load_role(self, db: AsyncSession, role_id: int) -> Optional[RoleEntry]:
+        query = (
+            select(Role)
+            .where(Role.id == role_id)
+            .options(selectinload(Role.permissions))
+        )
+        result = await db.execute(query)
+        role = result.scalar_one_or_none()
+        if role is None:
+            return None
+        entry = _role_entry(RoleSchema(**jsonable_encoder(role)))
+        self.roles.set(role_id, entry)
+        return entry
+
+
+identity_cache = IdentityCache(
+    maxsize=int(getattr(settings, "IDENTITY_CACHE_SIZE", 10000)),
+    ttl=float(getattr(settings, "IDENTITY_CACHE_TTL", 30)),
+)
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.user import user_crud
 from app.schema import LoginResponse, MeUser
+from app.util.auth.identity import identity_cache
 from app.util.auth.token import ApiToken
 
 
@@ -43,6 +44,7 @@ class MFAAuth(ApiToken):
             raise HTTPException(status_code=400, detail="Incorrect email or password")
         # return jsonable_encoder(user)
         me = MeUser(**jsonable_encoder(user))
+        identity_cache.prime(me)
         token = self.generate_token(userObj=me)
 
         return LoginResponse(
@@ -0,0 +1,88 @@
+import fnmatch
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, Pattern, Set
+
+GLOB_CHARS = frozenset("*?[")
+
+
+def _has_glob(value: str) -> bool:
+    return any(char in GLOB_CHARS for char in value)
+
+
+def _compile_globs(globs: Iterable[str]) -> Optional[Pattern[str]]:
+    pattern = "|".join(f"(?:{fnmatch.translate(glob)})" for glob in sorted(globs))
+    return re.compile(pattern) if pattern else None
+
+
+class PermissionMatcher:
+    """
+    Pre-compiled matcher for a set of permission globs such as ``GET:/users/*/``.
+
+    Literal permissions are kept in a set, globs are merged into one regex per
+    HTTP method, so a lookup costs a hash probe plus at most two regex matches
+    instead of one ``fnmatch`` call per permission. Matching is
+    case-insensitive, like ``fnmatch`` on case-insensitive platforms.
+    """
+
+    __slots__ = ("permissions", "_exact", "_by_method", "_any_method")
+
+    def __init__(self, permissions: Iterable[str]) -> None:
+        self.permissions: FrozenSet[str] = frozenset(p.lower() for p in permissions)
+        self._exact: Set[str] = set()
+        grouped: Dict[str, Set[str]] = {}
+        any_method: Set[str] = set()
+        for permission in self.permissions:
+            if not _has_glob(permission):
+                self._exact.add(permission)
+                continue
+            method, sep, _ = permission.partition(":")
+            if sep and not _has_glob(method):
+                grouped.setdefault(method, set()).add(permission)
+            else:
+                any_method.add(permission)
+        self._by_method: Dict[str, Pattern[str]] = {
+            method: regex
+            for method, globs in grouped.items()
+            if (regex := _compile_globs(globs)) is not None
+        }
+        self._any_method = _compile_globs(any_method)
+
+    def __len__(self) -> int:
+        return len(self.permissions)
+
+    def match(self, key: str) -> bool:
+        """
+        Check whether ``key`` (``"Method:/path/"``) is granted by any permission
+        """
+        key = key.lower()
+        if key in self._exact:
+            return True
+        regex = self._by_method.get(key.partition(":")[0])
+        if regex is not None and regex.match(key):
+            return True
+        return self._any_method is not None and bool(self._any_method.match(key))
+
+
+@lru_cache(maxsize=1024)
+def _cached_matcher(permissions: FrozenSet[str]) -> PermissionMatcher:
+    return PermissionMatcher(permissions)
+
+
+def get_permission_matcher(permissions: Iterable[str]) -> PermissionMatcher:
+    """
+    Get the compiled matcher for a permission set, compiling it on first use.
+    Matchers are cached per distinct set of permission names.
+    """
+    return _cached_matcher(frozenset(permissions))
+
+
+def permission_set_version(permissions: Iterable[str]) -> str:
+    """
+    Short, order-independent fingerprint of a permission set. It is embedded
+    in access tokens so a server can tell whether its cached copy of the
+    role's permissions is the one the token was issued against.
+    """
+    joined = "\n".join(sorted({p.lower() for p in permissions}))
+    return hashlib.sha256(joined.encode()).hexdigest()[:16]
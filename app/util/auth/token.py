@@ -2,10 +2,10 @@ from abc import ABC, abstractmethod
 from datetime import timedelta
 
 import arrow
-from fastapi.encoders import jsonable_encoder
 from jose import jwt
 
 from app.schema import MeUser
+from app.util.auth.permissions import permission_set_version
 from app.util.constants import DEFAULT_TIMEZONE
 from app.util.setting import get_settings
 
@@ -40,7 +40,10 @@ class AppBaseToken(ABC):
                 "exp": exp,
                 "nbf": now,
                 "sub": str(userObj.id),
-                "user": jsonable_encoder(userObj),
+                "rid": userObj.role_id,
+                "pv": permission_set_version(
+                    permission.name for permission in userObj.role.permissions
+                ),
                 "type": self.type,
                 "action": self.action,
             },
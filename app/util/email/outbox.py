@@ -0,0 +1,364 @@
+"""
+Outgoing email through the ``email_outbox`` table.
+
+    python -m app.util.email.outbox    # deliver everything due, then exit
+
+``enqueue`` adds a message in the caller's transaction, so it is sent only if
+that commits and a request never waits on SMTP. ``email_sender`` delivers due
+messages in the background over a small pool of SMTP connections that stay
+open and logged in between messages, and retries failures with exponential
+backoff until ``max_attempts``.
+"""
+
+import asyncio
+import datetime
+import logging
+import math
+import smtplib
+from email.message import Message
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import AsyncSessionLocal
+from app.models import EmailOutbox, EmailStatus
+from app.util.email.index import build_message
+from app.util.setting import get_settings
+from app.util.tasks import background_tasks
+
+settings = get_settings()
+
+logger = logging.getLogger("app")
+
+
+def _flag(value: Any) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def _close(connection: smtplib.SMTP) -> None:
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class SMTPPool:
+    """
+    Up to ``size`` SMTP connections, each set up (STARTTLS, login) once and
+    reused for later messages. smtplib blocks, so every exchange runs in a
+    worker thread and a connection carries one message at a time.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        size: int = 2,
+        timeout: float = 30.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self._idle: List[smtplib.SMTP] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.connects = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls()
+            if self.username and self.password:
+                connection.login(self.username, self.password)
+        except Exception:
+            _close(connection)
+            raise
+        self.connects += 1
+        return connection
+
+    async def send(self, message: Message) -> None:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.size)
+            self._loop = loop
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            # servers drop idle connections, so a reused one gets one retry
+            for retry in (connection is not None, False):
+                if connection is None:
+                    connection = await asyncio.to_thread(self._connect)
+                try:
+                    await asyncio.to_thread(connection.send_message, message)
+                except smtplib.SMTPServerDisconnected:
+                    _close(connection)
+                    connection = None
+                    if retry:
+                        continue
+                    raise
+                except smtplib.SMTPException:
+                    # refused recipients or data: smtplib has reset the
+                    # transaction and the connection stays usable
+                    self._idle.append(connection)
+                    raise
+                except OSError:
+                    _close(connection)
+                    raise
+                except Exception:
+                    self._idle.append(connection)
+                    raise
+                self._idle.append(connection)
+                return
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            try:
+                await asyncio.to_thread(connection.quit)
+            except Exception:
+                _close(connection)
+
+
+def enqueue(
+    db: AsyncSession, *, to_email: str, subject: str, html_body: str
+) -> EmailOutbox:
+    """Add an email to the outbox, sent once the caller commits"""
+    message = EmailOutbox(to_email=to_email, subject=subject, html_body=html_body)
+    db.add(message)
+    return message
+
+
+class OutboxSender:
+    """
+    Delivers due outbox messages, then sleeps until ``wake`` is called or
+    ``interval`` seconds pass. A claimed batch is leased for
+    ``lease_seconds``, by default as long as the pool can take to get
+    through it, so mail claimed by a sender that died is picked up again
+    afterwards, and concurrent senders on Postgres skip each other's rows.
+    Claiming counts as an attempt, so mail whose attempts all ended with
+    the sender dying is marked failed too. A failed message is retried
+    after ``retry_seconds`` doubled per earlier attempt.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPPool,
+        session_factory: Any = AsyncSessionLocal,
+        interval: float = 5.0,
+        batch_size: int = 50,
+        max_attempts: int = 5,
+        retry_seconds: float = 30.0,
+        lease_seconds: Optional[float] = None,
+    ) -> None:
+        self.pool = pool
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        if lease_seconds is None:
+            # every message may wait out the timeout to connect and to send
+            rounds = math.ceil(batch_size / pool.size)
+            lease_seconds = rounds * 2 * pool.timeout
+        self.lease_seconds = lease_seconds
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running or self.interval <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = await background_tasks.spawn(self._run(), name="email-outbox")
+
+    async def stop(self) -> None:
+        if self.running:
+            assert self._task is not None
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.pool.close()
+
+    def wake(self) -> None:
+        """Deliver now instead of at the next interval, e.g. after a commit"""
+        if self._wakeup is not None and self.running:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            self._wakeup.clear()
+            try:
+                while await self.deliver() == self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("Delivering queued email failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def deliver(self) -> int:
+        """Send one batch of due messages and return how many were claimed"""
+        outbox = EmailOutbox.__table__
+        now = datetime.datetime.utcnow()
+        async with self.session_factory() as db:
+            await db.execute(
+                update(outbox)
+                .where(
+                    outbox.c.status == EmailStatus.PENDING,
+                    outbox.c.next_attempt_at <= now,
+                    outbox.c.attempts >= self.max_attempts,
+                )
+                .values(
+                    status=EmailStatus.FAILED,
+                    last_error="Lease expired on the last attempt",
+                    updated_at=now,
+                )
+            )
+            query = (
+                select(outbox)
+                .where(
+                    outbox.c.status == EmailStatus.PENDING,
+                    outbox.c.next_attempt_at <= now,
+                    outbox.c.attempts < self.max_attempts,
+                )
+                .order_by(outbox.c.next_attempt_at, outbox.c.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            messages = [dict(row) for row in (await db.execute(query)).mappings()]
+            if messages:
+                lease = now + datetime.timedelta(seconds=self.lease_seconds)
+                await db.execute(
+                    update(outbox)
+                    .where(outbox.c.id.in_([m["id"] for m in messages]))
+                    .values(next_attempt_at=lease, attempts=outbox.c.attempts + 1)
+                )
+            await db.commit()
+        if not messages:
+            return 0
+
+        results = await asyncio.gather(
+            *(
+                self.pool.send(
+                    build_message(m["subject"], m["to_email"], m["html_body"])
+                )
+                for m in messages
+            ),
+            return_exceptions=True,
+        )
+        now = datetime.datetime.utcnow()
+        outcomes = [
+            self._outcome(message, result, now)
+            for message, result in zip(messages, results)
+        ]
+        async with self.session_factory() as db:
+            await db.execute(
+                update(outbox)
+                .where(outbox.c.id == bindparam("b_id"))
+                .values(
+                    status=bindparam("b_status"),
+                    attempts=bindparam("b_attempts"),
+                    next_attempt_at=bindparam("b_next_attempt_at"),
+                    last_error=bindparam("b_last_error"),
+                    sent_at=bindparam("b_sent_at"),
+                    updated_at=now,
+                ),
+                outcomes,
+            )
+            await db.commit()
+        return len(messages)
+
+    def _outcome(
+        self, message: Dict[str, Any], result: Any, now: datetime.datetime
+    ) -> Dict[str, Any]:
+        # as counted by the claim, ``message`` was read just before it
+        attempts = message["attempts"] + 1
+        if not isinstance(result, Exception):
+            self.sent += 1
+            status, error, sent_at = EmailStatus.SENT, None, now
+        else:
+            error, sent_at = f"{type(result).__name__}: {result}", None
+            if attempts >= self.max_attempts:
+                self.failed += 1
+                status = EmailStatus.FAILED
+                logger.error(
+                    "Giving up on email %s to %s after %s attempts: %s",
+                    message["id"],
+                    message["to_email"],
+                    attempts,
+                    error,
+                )
+            else:
+                status = EmailStatus.PENDING
+        delay = self.retry_seconds * 2 ** (attempts - 1)
+        return {
+            "b_id": message["id"],
+            "b_status": status,
+            "b_attempts": attempts,
+            "b_next_attempt_at": now + datetime.timedelta(seconds=delay),
+            "b_last_error": error,
+            "b_sent_at": sent_at,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "connects": self.pool.connects,
+        }
+
+
+email_sender = OutboxSender(
+    SMTPPool(
+        host=str(getattr(settings, "EMAIL_HOST", "localhost")),
+        port=int(getattr(settings, "EMAIL_PORT", 25)),
+        username=getattr(settings, "EMAIL_FROM", None),
+        password=getattr(settings, "EMAIL_PASSWORD", None),
+        starttls=_flag(getattr(settings, "EMAIL_USE_TLS", True)),
+        size=int(getattr(settings, "EMAIL_POOL_SIZE", 2)),
+    ),
+    interval=float(getattr(settings, "EMAIL_POLL_SECONDS", 5)),
+    batch_size=int(getattr(settings, "EMAIL_BATCH_SIZE", 50)),
+    max_attempts=int(getattr(settings, "EMAIL_MAX_ATTEMPTS", 5)),
+    retry_seconds=float(getattr(settings, "EMAIL_RETRY_SECONDS", 30)),
+)
+
+
+def main() -> None:
+    from app.db import engine
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> Dict[str, Any]:
+        try:
+            while await email_sender.deliver() == email_sender.batch_size:
+                pass
+            return email_sender.stats()
+        finally:
+            await email_sender.pool.close()
+            await engine.dispose()
+
+    stats = asyncio.run(run())
+    print(f"sent {stats['sent']} emails, {stats['failed']} failed for good")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Invoice rendering.
+
+Templates are compiled once, at startup with ``precompile_templates``, and
+kept for the life of the process; the file is not checked for changes on
+every render. Compiled bytecode is also cached on disk, so worker processes
+and restarts skip compiling. Templates see only an ``InvoiceContext``, never
+ORM objects, so a batch of contexts can be rendered in worker processes.
+"""
+
+import asyncio
+import datetime
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence
+
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    select_autoescape,
+)
+
+from app.util.setting import get_settings
+from app.util.workers import WorkerPool
+
+settings = get_settings()
+
+INVOICE_TEMPLATE = "invoice_template.html"
+# Contexts handed to a worker at once, so the pool overhead is per chunk
+RENDER_CHUNK_SIZE = 100
+
+env = Environment(
+    loader=FileSystemLoader("app/util/email/templates"),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    bytecode_cache=FileSystemBytecodeCache(
+        getattr(settings, "EMAIL_TEMPLATE_CACHE_DIR", None) or None
+    ),
+)
+
+
+@dataclass
+class InvoiceLine:
+    description: str
+    quantity: int
+    price: Decimal
+    total: Decimal
+
+
+@dataclass
+class InvoiceContext:
+    id: int
+    lead_name: str
+    status: str
+    total_price: Decimal
+    created_at: Optional[datetime.datetime]
+    updated_at: Optional[datetime.datetime]
+    line_items: List[InvoiceLine]
+
+
+def invoice_context(quotation: Any, lead_name: str) -> InvoiceContext:
+    """What the invoice template needs of a quotation with its line items"""
+    return InvoiceContext(
+        id=quotation.id,
+        lead_name=lead_name,
+        status=quotation.status.value,
+        total_price=quotation.total_price,
+        created_at=quotation.created_at,
+        updated_at=quotation.updated_at,
+        line_items=[
+            InvoiceLine(
+                description=item.description,
+                quantity=item.quantity,
+                price=item.price,
+                total=item.quantity * item.price,
+            )
+            for item in quotation.line_items
+        ],
+    )
+
+
+def precompile_templates() -> int:
+    """Compile every template into the environment's cache"""
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def render_invoice(
+    context: InvoiceContext, template_name: str = INVOICE_TEMPLATE
+) -> str:
+    return env.get_template(template_name).render(data=context)
+
+
+def render_invoice_chunk(
+    contexts: Sequence[InvoiceContext], template_name: str = INVOICE_TEMPLATE
+) -> List[str]:
+    template = env.get_template(template_name)
+    return [template.render(data=context) for context in contexts]
+
+
+render_pool = WorkerPool(
+    kind=str(getattr(settings, "EMAIL_RENDER_EXECUTOR", "thread")),
+    max_workers=int(getattr(settings, "EMAIL_RENDER_WORKERS", 4)),
+    name="renderer",
+)
+
+
+async def render_invoices(
+    contexts: Sequence[InvoiceContext],
+    template_name: str = INVOICE_TEMPLATE,
+    chunk_size: int = RENDER_CHUNK_SIZE,
+) -> List[str]:
+    """
+    Render many invoices on ``render_pool``, in chunks of ``chunk_size``,
+    and return them in the order of ``contexts``. Only a process pool
+    renders in parallel; threads just keep the event loop free. For batch
+    jobs: the API sends one invoice at a time, with ``render_invoice``.
+    """
+    chunks = []
+    for start in range(0, len(contexts), chunk_size):
+        end = start + chunk_size
+        chunks.append(contexts[start:end])
+    rendered = await asyncio.gather(
+        *(
+            render_pool.run(render_invoice_chunk, chunk, template_name)
+            for chunk in chunks
+        )
+    )
+    return [html for chunk in rendered for html in chunk]
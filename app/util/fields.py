@@ -0,0 +1,44 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """
+    Field names asked for by a comma separated ``fields`` query parameter, in
+    the order of ``allowed`` and always with ``id``, or ``None`` for all.
+    """
+    if fields is None:
+        return None
+    allowed = list(allowed)
+    names = {name.strip() for name in fields.split(",")} - {""}
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return [name for name in allowed if name in names or name == "id"]
+
+
+def select_fields(fields: List[str], *required: str) -> List[str]:
+    """``fields`` plus the ones the query needs itself, e.g. for the cursor"""
+    return list(dict.fromkeys([*fields, *required]))
+
+
+def item_value(item: Any, name: str) -> Any:
+    """``name`` of a list item, a row mapping or a model instance"""
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+def sparse_page(items: List[Dict[str, Any]], fields: List[str], **page: Any) -> Any:
+    """
+    A list response holding only ``fields`` of each item. The row mappings
+    are encoded as they are instead of being validated into the full model.
+    """
+    return JSONResponse(
+        jsonable_encoder(
+            {"items": [{name: item[name] for name in fields} for item in items]} | page
+        )
+    )
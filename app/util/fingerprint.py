@@ -0,0 +1,29 @@
+import re
+import unicodedata
+from typing import Optional
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def name_fingerprint(name: Optional[str]) -> Optional[str]:
+    """
+    Match key for a person's name: accents, case, punctuation and word
+    order are ignored, so "Lee, Ann-Marie" and "ann marie LEE" agree.
+    """
+    if not name:
+        return None
+    ascii_name = (
+        unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    )
+    tokens = sorted(set(_NON_ALNUM.split(ascii_name)) - {""})
+    return " ".join(tokens) or None
+
+
+def email_key(email: Optional[str]) -> Optional[str]:
+    """Python side of ``Lead.email_normalized``"""
+    return email.lower() if email else None
+
+
+def phone_key(phone: Optional[str]) -> Optional[str]:
+    """Python side of ``Lead.phone_digits``"""
+    return phone.lstrip("+") if phone else None
@@ -0,0 +1,98 @@
+"""
+Merge duplicate leads.
+
+    python -m app.util.lead_dedup --user-id 1 [--dry-run] [--batch-size 500]
+
+Leads are clustered by shared match keys (normalized email, phone digits,
+or the name fingerprint of leads with neither, see ``CRUDLead.find_duplicates``)
+and each cluster is merged into its oldest lead: blank fields are filled from
+the duplicates, their quotations move over and the duplicates are deleted.
+Clusters are merged ``batch_size`` at a time, one transaction per batch
+that also holds the batch's audit records.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.lead import crud_lead
+from app.util.setting import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger("app")
+
+
+@dataclass
+class DedupResult:
+    clusters: int = 0
+    merged: int = 0
+    cluster_seconds: float = 0.0
+    merge_seconds: float = 0.0
+
+
+async def dedup_leads(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    batch_size: Optional[int] = None,
+    dry_run: bool = False,
+) -> DedupResult:
+    batch_size = batch_size or int(getattr(settings, "LEAD_DEDUP_BATCH_SIZE", 500))
+    result = DedupResult()
+    started = time.perf_counter()
+    clusters = await crud_lead.duplicate_clusters(db)
+    result.clusters = len(clusters)
+    result.cluster_seconds = time.perf_counter() - started
+    if dry_run:
+        result.merged = sum(len(cluster) - 1 for cluster in clusters)
+        return result
+    started = time.perf_counter()
+    for offset in range(0, len(clusters), batch_size):
+        end = offset + batch_size
+        result.merged += await crud_lead.merge(
+            db, clusters[offset:end], user_id=user_id
+        )
+        logger.info("Merged %s duplicate leads", result.merged)
+    result.merge_seconds = time.perf_counter() - started
+    return result
+
+
+def main() -> None:
+    from app.db import AsyncSessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Merge duplicate leads")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> DedupResult:
+        try:
+            async with AsyncSessionLocal() as db:
+                return await dedup_leads(
+                    db,
+                    user_id=args.user_id,
+                    batch_size=args.batch_size,
+                    dry_run=args.dry_run,
+                )
+        finally:
+            await engine.dispose()
+
+    result = asyncio.run(run())
+    verb = "would merge" if args.dry_run else "merged"
+    print(
+        f"{result.clusters} duplicate clusters found in "
+        f"{result.cluster_seconds:.1f}s, {verb} {result.merged} leads"
+        + (f" in {result.merge_seconds:.1f}s" if not args.dry_run else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
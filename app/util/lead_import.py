@@ -0,0 +1,184 @@
+"""
+Bulk lead import from CSV or NDJSON.
+
+    python -m app.util.lead_import leads.csv --user-id 1 [--batch-size 1000]
+
+Rows are parsed lazily from the file, validated with ``LeadCreate`` in
+batches, and each batch of valid rows is loaded with one statement (``COPY``
+on Postgres, an executemany ``INSERT`` elsewhere), committed, and summarised
+in a single audit record. Invalid rows are reported with their line number and
+never abort the rest of the batch.
+"""
+
+import argparse
+import asyncio
+import codecs
+import csv
+import itertools
+import json
+import logging
+import os
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.lead import crud_lead
+from app.schema.lead import LeadCreate, LeadImportError, LeadImportResult
+from app.util.setting import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger("app")
+
+# Rows listed in a result; the counts always cover every failed row
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return "csv"
+
+
+def iter_records(file: IO[bytes], format: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(line number, record)`` pairs without reading the whole file"""
+    text = codecs.getreader("utf-8-sig")(file)
+    if format == "ndjson":
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, e
+        return
+    reader = csv.DictReader(text)
+    for record in reader:
+        # blank CSV cells mean "not given", not an empty string
+        yield reader.line_num, {
+            key.strip(): value.strip() or None
+            for key, value in record.items()
+            if key and value is not None
+        }
+
+
+def validate(
+    records: List[Tuple[int, Any]],
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[LeadImportError]]:
+    rows: List[Tuple[int, Dict[str, Any]]] = []
+    errors: List[LeadImportError] = []
+    for line_no, record in records:
+        if isinstance(record, Exception):
+            errors.append(LeadImportError(line=line_no, errors=[str(record)]))
+            continue
+        try:
+            rows.append((line_no, LeadCreate.model_validate(record).model_dump()))
+        except ValidationError as e:
+            errors.append(
+                LeadImportError(
+                    line=line_no,
+                    errors=[
+                        f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}"
+                        for err in e.errors()
+                    ],
+                )
+            )
+    return rows, errors
+
+
+async def import_leads(
+    db: AsyncSession,
+    file: IO[bytes],
+    *,
+    format: str,
+    user_id: int,
+    source: str = "upload",
+    batch_size: Optional[int] = None,
+) -> LeadImportResult:
+    batch_size = batch_size or int(getattr(settings, "LEAD_IMPORT_BATCH_SIZE", 1000))
+    result = LeadImportResult(imported=0, failed=0, batches=0, errors=[])
+
+    def report(errors: List[LeadImportError]) -> None:
+        result.failed += len(errors)
+        room = MAX_REPORTED_ERRORS - len(result.errors)
+        result.errors.extend(errors[: max(room, 0)])
+
+    async def load(rows: List[Tuple[int, Dict[str, Any]]]) -> None:
+        try:
+            await crud_lead.bulk_create(
+                db,
+                [row for _, row in rows],
+                user_id=user_id,
+                context=f"{source} batch {result.batches + 1}",
+            )
+        except Exception as e:
+            await db.rollback()
+            logger.exception("Lead import batch failed")
+            report(
+                [
+                    LeadImportError(line=line_no, errors=[f"batch not loaded: {e}"])
+                    for line_no, _ in rows
+                ]
+            )
+            return
+        result.imported += len(rows)
+        result.batches += 1
+
+    # Validation (mostly email checks) is CPU bound: run it in a worker thread
+    # so the event loop stays free, while the previous batch is being loaded
+    loading: Optional["asyncio.Task[None]"] = None
+    records = iter_records(file, format)
+    while batch := list(itertools.islice(records, batch_size)):
+        rows, errors = await asyncio.to_thread(validate, batch)
+        report(errors)
+        if loading is not None:
+            await loading
+        loading = asyncio.create_task(load(rows)) if rows else None
+    if loading is not None:
+        await loading
+    return result
+
+
+def main() -> None:
+    from app.db import AsyncSessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Import leads from CSV or NDJSON")
+    parser.add_argument("path")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run() -> LeadImportResult:
+        from app.util.audit.writer import audit_writer
+
+        await audit_writer.start()
+        try:
+            with open(args.path, "rb") as file:
+                async with AsyncSessionLocal() as db:
+                    return await import_leads(
+                        db,
+                        file,
+                        format=args.format or detect_format(args.path, None),
+                        user_id=args.user_id,
+                        source=os.path.basename(args.path),
+                        batch_size=args.batch_size,
+                    )
+        finally:
+            await audit_writer.stop()
+            await engine.dispose()
+
+    result = asyncio.run(run())
+    for error in result.errors:
+        print(f"line {error.line}: {'; '.join(error.errors)}")
+    print(
+        f"imported {result.imported} leads in {result.batches} batches, "
+        f"{result.failed} rows failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
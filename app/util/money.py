@@ -0,0 +1,31 @@
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Optional
+
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+CENT = Decimal("0.01")
+
+
+def to_cents(amount: Any) -> int:
+    """``amount`` in whole cents, rounded half up"""
+    # floats go through str() so 10.1 becomes 1010 cents, not 1009
+    value = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+    return int(value.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+class Money(TypeDecorator):
+    """
+    A currency amount stored as integer cents and read as a ``Decimal`` with
+    two places. Sums and products of cents are exact in SQL on every
+    database, which SQLite's ``NUMERIC`` (a float underneath) is not.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Optional[int]:
+        return None if value is None else to_cents(value)
+
+    def process_result_value(self, value: Any, dialect: Any) -> Optional[Decimal]:
+        return None if value is None else Decimal(int(value)).scaleb(-2)
@@ -0,0 +1,126 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable, Select
+
+# Values of the `sort` and `total` query parameters of list endpoints
+SORT_PATTERN = "^(created_at|updated_at)$"
+TOTAL_PATTERN = "^(exact|estimate)$"
+
+
+def encode_cursor(value: datetime, id: int, sort: str = "created_at") -> str:
+    """
+    Opaque cursor pointing at the last row of a page ordered by
+    ``(sort DESC, id DESC)``, where ``value`` is that row's ``sort`` column
+    """
+    raw = json.dumps([sort, value.isoformat(), id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str = "created_at") -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, id = datetime.fromisoformat(value), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        # its position means nothing in another order
+        raise HTTPException(
+            status_code=400, detail=f"Cursor was issued for sort={cursor_sort}"
+        )
+    return value, id
+
+
+def apply_keyset(
+    query: Select, created_at: Any, id: Any, cursor: Optional[str]
+) -> Select:
+    """
+    Order ``query`` newest first and, when a cursor is given, continue right
+    after the row it points at. The row-value comparison lets the database
+    seek on a ``(created_at, id)`` index instead of skipping OFFSET rows.
+    ``created_at`` may be another timestamp column, whose name the cursor
+    must have been issued for.
+    """
+    query = query.order_by(created_at.desc(), id.desc())
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor, created_at.key)
+        query = query.where(
+            # the plain bound lets Postgres prune partitions newer than the cursor
+            created_at <= cursor_created_at,
+            tuple_(created_at, id) < (cursor_created_at, cursor_id),
+        )
+    return query
+
+
+def count_query(query: Select) -> Select:
+    """``SELECT count(*)`` over the rows ``query`` matches"""
+    return query.with_only_columns(func.count(), maintain_column_froms=True).order_by(
+        None
+    )
+
+
+class _Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select) -> None:
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler: Any, **kw: Any) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def estimate_count(db: AsyncSession, query: Select) -> int:
+    """
+    The planner's row estimate for ``query`` on Postgres, which costs no
+    more than planning it. Other databases have no such estimate and get an
+    exact count.
+    """
+    if db.bind.dialect.name != "postgresql":
+        return (await db.execute(count_query(query))).scalar_one()
+    plan = (await db.execute(_Explain(query.order_by(None)))).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _item(row: Any, mappings: bool) -> Any:
+    if not mappings:
+        return row[0]
+    return {key: value for key, value in row._mapping.items() if key != "total"}
+
+
+async def fetch_page(
+    db: AsyncSession,
+    filtered: Select,
+    page: Select,
+    total: Optional[str] = None,
+    mappings: bool = False,
+) -> Tuple[List[Any], Optional[int]]:
+    """
+    Run ``page``, a paginated form of ``filtered``, and optionally count
+    every row ``filtered`` matches. An ``exact`` total rides along in the
+    page query as an uncorrelated subquery, which the database evaluates
+    once, so it costs no extra round trip and is right for cursor pages too.
+    Items are the selected entities, or with ``mappings`` dicts of the
+    selected columns.
+    """
+    if total != "exact":
+        items = [_item(row, mappings) for row in (await db.execute(page)).all()]
+        if total == "estimate":
+            return items, await estimate_count(db, filtered)
+        return items, None
+    count = count_query(filtered).scalar_subquery().label("total")
+    rows = (await db.execute(page.add_columns(count))).all()
+    if not rows:
+        # past the last row there is nothing to carry the count
+        return [], (await db.execute(count_query(filtered))).scalar_one()
+    return [_item(row, mappings) for row in rows], rows[0].total
@@ -0,0 +1,147 @@
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import DDL, Table, event, func, literal_column, or_, select
+from sqlalchemy.sql import column
+from sqlalchemy.sql import table as sql_table
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.expression import Select
+
+# FTS5 trigram queries need at least three characters
+MIN_FTS_LENGTH = 3
+# Matches ranked per search when nothing else narrows them
+RANK_WINDOW = 5000
+
+
+class TextSearch:
+    """
+    Indexed substring search over text columns of a table.
+
+    Postgres gets pg_trgm GIN indexes, which serve plain ``ILIKE '%q%'`` and
+    rank by ``similarity()``. SQLite gets an external-content FTS5 table with
+    the trigram tokenizer, kept in sync by triggers and ranked by bm25. The
+    DDL runs on ``create_all``; Alembic migrations create the same objects.
+    """
+
+    def __init__(self, table: Table, columns: Sequence[str]) -> None:
+        self.table = table
+        self.columns = list(columns)
+        self.fts_name = f"{table.name}_fts"
+        self.fts = sql_table(self.fts_name, column("rowid"), column("rank"))
+        for statement in self.sqlite_ddl():
+            event.listen(
+                table, "after_create", DDL(statement).execute_if(dialect="sqlite")
+            )
+        event.listen(
+            table,
+            "before_drop",
+            DDL(f"DROP TABLE IF EXISTS {self.fts_name}").execute_if(dialect="sqlite"),
+        )
+        for statement in self.postgresql_ddl():
+            event.listen(
+                table, "after_create", DDL(statement).execute_if(dialect="postgresql")
+            )
+
+    def postgresql_ddl(self) -> List[str]:
+        return ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+            f"CREATE INDEX IF NOT EXISTS ix_{self.table.name}_{name}_trgm "
+            f"ON {self.table.name} USING gin ({name} gin_trgm_ops)"
+            for name in self.columns
+        ]
+
+    def sqlite_ddl(self) -> List[str]:
+        name, fts, key = self.table.name, self.fts_name, self.table.primary_key
+        rowid = list(key.columns)[0].name
+        names = ", ".join(self.columns)
+        new = ", ".join(f"new.{c}" for c in self.columns)
+        old = ", ".join(f"old.{c}" for c in self.columns)
+        delete = (
+            f"INSERT INTO {fts}({fts}, rowid, {names}) "
+            f"VALUES ('delete', old.{rowid}, {old});"
+        )
+        insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.{rowid}, {new});"
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, "
+            f"content='{name}', content_rowid='{rowid}', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {name} "
+            f"BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {name} "
+            f"BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {name} "
+            f"BEGIN {delete} {insert} END",
+        ]
+
+    def _uses_fts(self, dialect: str, q: str) -> bool:
+        return dialect == "sqlite" and len(q) >= MIN_FTS_LENGTH
+
+    def _match(self, q: str, columns: Sequence[str]) -> ColumnElement:
+        # quote as a single FTS5 phrase so user input is never parsed as syntax
+        phrase = '"' + q.replace('"', '""') + '"'
+        query = f"{{{' '.join(columns)}}} : {phrase}"
+        return literal_column(self.fts_name).op("MATCH")(query)
+
+    def contains(
+        self, dialect: str, q: str, columns: Optional[Sequence[str]] = None
+    ) -> ColumnElement:
+        """Rows where any of ``columns`` contains ``q``, case-insensitively"""
+        columns = columns or self.columns
+        if self._uses_fts(dialect, q):
+            matches = select(self.fts.c.rowid).where(self._match(q, columns))
+            return list(self.table.primary_key.columns)[0].in_(matches)
+        return or_(*(self.table.c[name].ilike(f"%{q}%") for name in columns))
+
+    def ranked(
+        self,
+        query: Select,
+        dialect: str,
+        q: str,
+        window: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Select:
+        """
+        Restrict ``query`` to rows where any of ``columns`` matches ``q``,
+        best matches first.
+
+        Scoring every match of a very common term costs a full pass over its
+        postings, so with ``window`` only the newest ``window`` matches (by
+        primary key) are ranked. Callers should drop the window when other
+        filters on ``query`` already narrow the rows.
+        """
+        columns = columns or self.columns
+        key = list(self.table.primary_key.columns)[0]
+        if self._uses_fts(dialect, q):
+            matches = select(self.fts.c.rowid, self.fts.c.rank).where(
+                self._match(q, columns)
+            )
+            if window is not None:
+                matches = matches.order_by(self.fts.c.rowid.desc()).limit(window)
+            matches = matches.subquery()
+            return query.join(matches, matches.c.rowid == key).order_by(matches.c.rank)
+        matching = self.contains(dialect, q, columns)
+        if window is not None:
+            newest = select(key).where(matching).order_by(key.desc())
+            query = query.where(key.in_(newest.limit(window).scalar_subquery()))
+        else:
+            query = query.where(matching)
+        if dialect == "postgresql":
+            query = query.order_by(self._similarity(q, columns).desc())
+        return query
+
+    def _similarity(self, q: str, columns: Sequence[str]) -> Any:
+        scores = [
+            func.similarity(func.coalesce(self.table.c[name], ""), q)
+            for name in columns
+        ]
+        return func.greatest(*scores) if len(scores) > 1 else scores[0]
+
+
+def prefix_match(column: ColumnElement, prefix: str, dialect: str) -> ColumnElement:
+    """
+    ``column`` starts with ``prefix``, written so a plain B-tree index on the
+    column serves it: SQLite only does that for a case-sensitive ``GLOB``,
+    Postgres for ``LIKE`` against a ``text_pattern_ops`` index.
+    """
+    if dialect == "sqlite":
+        escaped = "".join(f"[{c}]" if c in "*?[" else c for c in prefix)
+        return column.op("GLOB")(escaped + "*")
+    escaped = "".join(f"\\{c}" if c in "%_\\" else c for c in prefix)
+    return column.like(escaped + "%", escape="\\")
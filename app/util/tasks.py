@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Coroutine, Dict, Optional, Set
+
+from app.util.setting import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger("app")
+
+
+class TaskSupervisor:
+    """
+    Owns fire-and-forget background tasks: keeps a reference to each one so it
+    cannot be garbage-collected mid-flight, bounds how many run at once, logs
+    and counts failures, and drains them on shutdown.
+
+    ``spawn`` waits for a free slot before starting the task, which applies
+    backpressure to the caller instead of piling up pending tasks.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 10) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.started = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    async def spawn(
+        self, coro: Coroutine[Any, Any, Any], name: Optional[str] = None
+    ) -> "asyncio.Task[Any]":
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        semaphore = self._semaphore
+        await semaphore.acquire()
+        task = asyncio.create_task(coro, name=name or f"{self.name}-task")
+        self.started += 1
+        self._tasks.add(task)
+        task.add_done_callback(partial(self._on_done, semaphore))
+        return task
+
+    def _on_done(self, semaphore: asyncio.Semaphore, task: "asyncio.Task[Any]") -> None:
+        self._tasks.discard(task)
+        semaphore.release()
+        if task.cancelled():
+            self.cancelled += 1
+            return
+        error = task.exception()
+        if error is None:
+            self.succeeded += 1
+            return
+        self.failed += 1
+        self.last_error = repr(error)
+        logger.error(
+            "Background task %s failed",
+            task.get_name(),
+            exc_info=(type(error), error, error.__traceback__),
+        )
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """
+        Wait for running tasks to finish, cancelling whatever is left after
+        ``timeout`` seconds
+        """
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(
+                "Cancelled %s %s task(s) still running at shutdown",
+                len(pending),
+                self.name,
+            )
+            await asyncio.wait(pending)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "started": self.started,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "last_error": self.last_error,
+        }
+
+
+# Runs the email outbox sender and the rollup refresher loops, so a loop that
+# dies is logged and counted; main.py drains it at shutdown
+background_tasks = TaskSupervisor(
+    "background",
+    max_concurrency=int(getattr(settings, "BACKGROUND_TASK_CONCURRENCY", 10)),
+)
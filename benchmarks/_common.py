@@ -0,0 +1,37 @@
+"""Setup and timing shared by the benchmarks"""
+
+import statistics
+import time
+from typing import Any, Awaitable, Callable, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base
+
+# Rows inserted per statement while seeding
+CHUNK = 10000
+
+
+async def open_database(url: str, rebuild: bool = False) -> Tuple[AsyncEngine, Any]:
+    """
+    An engine for ``url`` with every table created, and a session factory
+    bound to it. ``rebuild`` drops the tables first; without it the rows of
+    earlier runs are kept, so seeding only has to top them up.
+    """
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        if rebuild:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def median_ms(run: Callable[[], Awaitable[Any]], repeat: int) -> float:
+    """Median wall time of ``repeat`` awaited calls of ``run``, in ms"""
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,116 @@
+"""
+Listing throughput for audit rows stored as double-encoded strings (the old
+json.dumps + pydantic ``Json`` path) against native JSON values.
+
+    python -m benchmarks.audit_read --rows 1000 --rounds 50
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import Json
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import AuditLog, EntityType, Role, User
+from app.schema.auditlog import AuditLogResponse
+from app.schema.user import UserInDBBase
+from benchmarks._common import open_database
+
+
+class LegacyAuditLogResponse(AuditLogResponse):
+    before_values: Optional[Json] = None
+    after_values: Optional[Json] = None
+    user: UserInDBBase
+
+
+def payload(i: int) -> Dict[str, Any]:
+    return {
+        "id": i,
+        "name": f"Lead {i}",
+        "email": f"lead{i}@example.com",
+        "status": "New",
+        "utm": {"source": "google", "medium": "cpc", "campaign": f"c{i % 20}"},
+        "tags": ["inbound", "priority"],
+    }
+
+
+async def seed(session: AsyncSession, rows: int, encode: bool) -> None:
+    now = datetime.datetime.utcnow()
+    batch: List[Dict[str, Any]] = []
+    for i in range(rows):
+        before, after = payload(i), {**payload(i), "status": "Contacted"}
+        batch.append(
+            {
+                "entity_type": EntityType.LEAD,
+                "entity_id": i,
+                "user_id": 1,
+                "action": "Update Lead",
+                "before_values": json.dumps(before) if encode else before,
+                "after_values": json.dumps(after) if encode else after,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    await session.execute(insert(AuditLog), batch)
+    await session.commit()
+
+
+async def list_rows(
+    session: AsyncSession, schema: Type[AuditLogResponse], rows: int
+) -> None:
+    query = select(AuditLog).options(selectinload(AuditLog.user)).limit(rows)
+    items = (await session.execute(query)).scalars().all()
+    body = [
+        schema.model_validate(item, from_attributes=True).model_dump(mode="json")
+        for item in items
+    ]
+    assert isinstance(body[0]["after_values"], dict)
+    session.expunge_all()
+
+
+async def open_db(rows: int, encode: bool) -> AsyncSession:
+    _, Session = await open_database("sqlite+aiosqlite://")
+    session = Session()
+    session.add(
+        User(username="bench@example.com", hashed_password="x", role=Role(name="b"))
+    )
+    await session.commit()
+    await seed(session, rows, encode=encode)
+    return session
+
+
+async def main(rows: int, rounds: int) -> None:
+    cases = {
+        "string-encoded": (await open_db(rows, True), LegacyAuditLogResponse),
+        "native JSON": (await open_db(rows, False), AuditLogResponse),
+    }
+    timings: Dict[str, List[float]] = {name: [] for name in cases}
+    # interleave the two cases so warm-up and GC noise hit both alike
+    for _ in range(rounds):
+        for name, (session, schema) in cases.items():
+            started = time.perf_counter()
+            await list_rows(session, schema, rows)
+            timings[name].append(time.perf_counter() - started)
+    for name, (session, _) in cases.items():
+        await session.close()
+        await session.bind.dispose()
+        median = statistics.median(timings[name])
+        print(
+            f"{name:15}: {median * 1000:7.2f}ms per page of {rows} rows "
+            f"({rows / median:9.0f} rows/s)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.rounds))
@@ -0,0 +1,111 @@
+"""
+Outgoing email: a fresh SMTP connection per message, sent inline (the old
+``send_email``), against queueing to the outbox and delivering over pooled
+connections. ``aiosmtpd`` (a dev dependency) stands in for the SMTP server.
+
+    python -m benchmarks.email_outbox --messages 500 --pool-size 4
+    python -m benchmarks.email_outbox --messages 500 --latency-ms 20
+
+``--latency-ms`` delays every reply of the stand-in server, like a remote
+server would. The tables are rebuilt on every run.
+"""
+
+import argparse
+import asyncio
+import smtplib
+import time
+from typing import Any
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import SMTP as SMTPServer
+
+from app.util.email.index import build_message
+from app.util.email.outbox import OutboxSender, SMTPPool, enqueue
+from benchmarks._common import open_database
+
+HOST = "127.0.0.1"
+PORT = 8025
+BODY = "<p>" + "Invoice line. " * 200 + "</p>"
+
+
+class SlowSMTP(SMTPServer):
+    latency = 0.0
+
+    async def push(self, status: str) -> None:
+        await asyncio.sleep(self.latency)
+        await super().push(status)
+
+
+class Sink:
+    received = 0
+
+    async def handle_DATA(self, server: Any, session: Any, envelope: Any) -> str:
+        self.received += 1
+        return "250 OK"
+
+
+class SlowController(Controller):
+    def factory(self) -> SMTPServer:
+        return SlowSMTP(self.handler)
+
+
+def send_inline(to_email: str) -> None:
+    # what the route used to do for every message
+    server = smtplib.SMTP(HOST, PORT)
+    server.send_message(build_message("Invoice", to_email, BODY))
+    server.quit()
+
+
+async def main(url: str, messages: int, pool_size: int, latency_ms: float) -> None:
+    SlowSMTP.latency = latency_ms / 1000
+    sink = Sink()
+    controller = SlowController(sink, hostname=HOST, port=PORT)
+    controller.start()
+    engine, Session = await open_database(url, rebuild=True)
+    try:
+        count = min(messages, 50)
+        started = time.perf_counter()
+        for n in range(count):
+            await asyncio.to_thread(send_inline, f"inline.{n}@example.com")
+        inline = (time.perf_counter() - started) / count
+        print(f"inline send        {inline * 1000:9.2f}ms per request")
+
+        started = time.perf_counter()
+        for n in range(messages):
+            async with Session() as session:
+                enqueue(
+                    session,
+                    to_email=f"queued.{n}@example.com",
+                    subject="Invoice",
+                    html_body=BODY,
+                )
+                await session.commit()
+        queued = (time.perf_counter() - started) / messages
+        print(f"outbox enqueue     {queued * 1000:9.2f}ms per request")
+
+        pool = SMTPPool(HOST, PORT, starttls=False, size=pool_size)
+        sender = OutboxSender(pool, session_factory=Session, batch_size=100)
+        started = time.perf_counter()
+        while await sender.deliver():
+            pass
+        elapsed = time.perf_counter() - started
+        await pool.close()
+        print(f"inline throughput {1 / inline:9.1f} msg/s (one connection per message)")
+        print(
+            f"pooled throughput {messages / elapsed:9.1f} msg/s "
+            f"({pool_size} connections, {pool.connects} opened)"
+        )
+        print(f"server received {sink.received} messages")
+    finally:
+        controller.stop()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="sqlite+aiosqlite:///bench_email_outbox.db")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.messages, args.pool_size, args.latency_ms))
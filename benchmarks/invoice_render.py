@@ -0,0 +1,98 @@
+"""
+Rendering invoices: the old per-call template lookup with the quotation's
+``__dict__`` as context, against the precompiled template with a typed
+context, one by one and batched on thread and process pools.
+
+    python -m benchmarks.invoice_render --renders 10000 --lines 10
+
+Quotations are built in memory; no database is needed.
+"""
+
+import argparse
+import asyncio
+import datetime
+import time
+from decimal import Decimal
+from typing import Any, Callable, List
+
+from jinja2 import Environment, FileSystemLoader
+
+from app.models import Quotation, QuotationLineItem, QuotationStatus
+from app.util.email import render
+from app.util.email.render import (
+    invoice_context,
+    precompile_templates,
+    render_invoice,
+    render_invoices,
+)
+
+
+def quotations(count: int, lines: int) -> List[Quotation]:
+    now = datetime.datetime.utcnow()
+    return [
+        Quotation(
+            id=n,
+            status=QuotationStatus.APPROVED,
+            total_price=Decimal(lines * 1999).scaleb(-2),
+            created_at=now,
+            updated_at=now,
+            line_items=[
+                QuotationLineItem(
+                    description=f"Line {i}", quantity=1, price=Decimal("19.99")
+                )
+                for i in range(lines)
+            ],
+        )
+        for n in range(count)
+    ]
+
+
+def timed(label: str, renders: int, run: Callable[[], Any]) -> None:
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    print(f"{label:28} {elapsed * 1000:9.1f}ms {renders / elapsed:9.0f} renders/s")
+
+
+async def main(renders: int, lines: int, workers: int) -> None:
+    items = quotations(renders, lines)
+    old_env = Environment(loader=FileSystemLoader("app/util/email/templates"))
+
+    def old() -> None:
+        for quotation in items:
+            old_env.get_template(render.INVOICE_TEMPLATE).render(
+                data={"lead_name": "Bench Lead", **quotation.__dict__}
+            )
+
+    timed("old lookup + __dict__", renders, old)
+    print(f"precompiled {precompile_templates()} templates")
+    contexts: List[Any] = []
+    timed(
+        "build contexts",
+        renders,
+        lambda: contexts.extend(invoice_context(q, "Bench Lead") for q in items),
+    )
+    timed(
+        "precompiled, one by one", renders, lambda: list(map(render_invoice, contexts))
+    )
+    for kind in ("thread", "process"):
+        render.render_pool.configure(kind, workers)
+        # start the workers outside the timing
+        await render_invoices(contexts[:1])
+        started = time.perf_counter()
+        await render_invoices(contexts)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{f'batch, {workers} {kind} workers':28} {elapsed * 1000:9.1f}ms "
+            f"{renders / elapsed:9.0f} renders/s"
+        )
+    render.render_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=10000)
+    parser.add_argument("--lines", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.renders, args.lines, args.workers))
@@ -0,0 +1,83 @@
+"""
+Latency of an unrelated endpoint (GET /) while a burst of logins is running,
+with bcrypt on the event loop ("inline") versus on the hash worker pool.
+
+    python -m benchmarks.login_storm --logins 16 --workers 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import ASGITransport, AsyncClient
+
+from app.crud.audit import crud_audit
+from app.db import get_db
+from app.main import app
+from app.tests.test_seed import create_defaults, create_tables
+from app.tests.utils.db import get_test_db
+from app.util.auth.hasher import hash_pool
+
+
+async def _skip_audit(obj_in) -> None:
+    # only the hashing cost is measured here
+    return None
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def storm(client: AsyncClient, kind: str, logins: int, workers: int) -> None:
+    hash_pool.configure(kind, workers)
+    login_data = {"username": "admin@gmail.com", "password": "admin123"}
+    latencies: list = []
+    done = asyncio.Event()
+
+    async def probe() -> None:
+        # requests are due every 5ms; latency counts from the due time, so
+        # time spent waiting for a blocked event loop is included
+        due = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get("/")
+            latencies.append((time.perf_counter() - due) * 1000)
+            due = max(due + 0.005, time.perf_counter())
+
+    prober = asyncio.create_task(probe())
+    started = time.perf_counter()
+    responses = await asyncio.gather(
+        *(client.post("/auth/login", data=login_data) for _ in range(logins))
+    )
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+    assert all(r.status_code == 200 for r in responses)
+    print(
+        f"{kind:>7} | {logins} logins in {elapsed:6.2f}s | GET / n={len(latencies):4d} "
+        f"p50={statistics.median(latencies):8.2f}ms "
+        f"p99={percentile(latencies, 99):8.2f}ms max={max(latencies):8.2f}ms"
+    )
+
+
+async def main(logins: int, workers: int) -> None:
+    app.dependency_overrides[get_db] = get_test_db
+    crud_audit.create = _skip_audit  # type: ignore[method-assign]
+    await create_tables()
+    await create_defaults()
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for kind in ("inline", "thread"):
+            await storm(client, kind, logins, workers)
+    hash_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.workers))
@@ -0,0 +1,59 @@
+"""
+Compare the compiled PermissionMatcher against the per-request fnmatch loop.
+
+    python -m benchmarks.permission_matcher
+"""
+
+import fnmatch
+import timeit
+
+from app.util.auth.permissions import PermissionMatcher, get_permission_matcher
+
+METHODS = ["GET", "POST", "PUT", "DELETE"]
+
+
+def build_permissions(size: int) -> list:
+    permissions = []
+    for i in range(size):
+        method = METHODS[i % len(METHODS)]
+        if i % 3 == 0:
+            permissions.append(f"{method}:/resource{i}/")
+        else:
+            permissions.append(f"{method}:/resource{i}/*/")
+    return permissions
+
+
+def fnmatch_loop(key: str, permissions: list) -> bool:
+    for permission in permissions:
+        if fnmatch.fnmatch(key, permission):
+            return True
+    return False
+
+
+def run(size: int, number: int = 2000) -> None:
+    permissions = build_permissions(size)
+    # worst case for the loop: the granting permission is the last one
+    key = permissions[-1].replace("*", "42")
+    miss = "Patch:/unknown/1/"
+    matcher: PermissionMatcher = get_permission_matcher(permissions)
+    assert matcher.match(key) and fnmatch_loop(key, permissions)
+
+    loop_hit = timeit.timeit(lambda: fnmatch_loop(key, permissions), number=number)
+    loop_miss = timeit.timeit(lambda: fnmatch_loop(miss, permissions), number=number)
+    compiled_hit = timeit.timeit(lambda: matcher.match(key), number=number)
+    compiled_miss = timeit.timeit(lambda: matcher.match(miss), number=number)
+    compile_time = timeit.timeit(lambda: PermissionMatcher(permissions), number=1)
+
+    def us(total: float) -> str:
+        return f"{total / number * 1e6:10.2f}us"
+
+    print(
+        f"{size:>5} perms | fnmatch hit {us(loop_hit)} miss {us(loop_miss)} | "
+        f"compiled hit {us(compiled_hit)} miss {us(compiled_miss)} | "
+        f"compile {compile_time * 1e3:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    for size in (10, 100, 1000):
+        run(size)
@@ -0,0 +1,90 @@
+"""Add normalized email / phone lookup columns and text search on leads
+
+Revision ID: 5d1e8a3c7b90
+Revises: f2a4d8c61b37
+Create Date: 2026-10-17 16:22:08.351790
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1e8a3c7b90'
+down_revision: Union[str, None] = 'f2a4d8c61b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    'name', 'email', 'phone',
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term',
+]
+LOOKUPS = {
+    'email_normalized': 'lower(email)',
+    'phone_digits': "ltrim(phone, '+')",
+}
+NAMES = ', '.join(COLUMNS)
+FTS_DELETE = (
+    f"INSERT INTO leads_fts(leads_fts, rowid, {NAMES}) "
+    f"VALUES ('delete', old.id, {', '.join(f'old.{c}' for c in COLUMNS)});"
+)
+FTS_INSERT = (
+    f"INSERT INTO leads_fts(rowid, {NAMES}) "
+    f"VALUES (new.id, {', '.join(f'new.{c}' for c in COLUMNS)});"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    # SQLite can only add stored generated columns by rebuilding the table,
+    # which batch mode does (and which would drop triggers made before it)
+    with op.batch_alter_table('leads') as batch_op:
+        for name, expression in LOOKUPS.items():
+            batch_op.add_column(
+                sa.Column(name, sa.String(), sa.Computed(expression, persisted=True), nullable=True)
+            )
+    for name in LOOKUPS:
+        op.create_index(
+            f'ix_leads_{name}', 'leads', [name], unique=False,
+            postgresql_ops={name: 'text_pattern_ops'}
+        )
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name in COLUMNS:
+            op.create_index(
+                f'ix_leads_{name}_trgm', 'leads', [name],
+                postgresql_using='gin', postgresql_ops={name: 'gin_trgm_ops'}
+            )
+    elif dialect == 'sqlite':
+        op.execute(
+            f"CREATE VIRTUAL TABLE leads_fts USING fts5({NAMES}, "
+            "content='leads', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(f"CREATE TRIGGER leads_fts_ai AFTER INSERT ON leads BEGIN {FTS_INSERT} END")
+        op.execute(f"CREATE TRIGGER leads_fts_ad AFTER DELETE ON leads BEGIN {FTS_DELETE} END")
+        op.execute(
+            f"CREATE TRIGGER leads_fts_au AFTER UPDATE ON leads "
+            f"BEGIN {FTS_DELETE} {FTS_INSERT} END"
+        )
+        # Index the rows that already exist
+        op.execute("INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for name in reversed(COLUMNS):
+            op.drop_index(f'ix_leads_{name}_trgm', table_name='leads')
+    elif dialect == 'sqlite':
+        for trigger in ('leads_fts_au', 'leads_fts_ad', 'leads_fts_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS leads_fts')
+    for name in reversed(list(LOOKUPS)):
+        op.drop_index(f'ix_leads_{name}', table_name='leads')
+    with op.batch_alter_table('leads') as batch_op:
+        for name in reversed(list(LOOKUPS)):
+            batch_op.drop_column(name)
@@ -0,0 +1,38 @@
+"""Add keyset pagination indexes on leads and quotations
+
+Revision ID: 6b2f9d4e8a17
+Revises: 5d1e8a3c7b90
+Create Date: 2026-10-17 17:10:44.582613
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2f9d4e8a17'
+down_revision: Union[str, None] = '5d1e8a3c7b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_leads_created_at_id', 'leads', ['created_at', 'id'], unique=False)
+    op.create_index('ix_leads_updated_at_id', 'leads', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_quotations_created_at_id', 'quotations', ['created_at', 'id'], unique=False)
+    op.create_index('ix_quotations_updated_at_id', 'quotations', ['updated_at', 'id'], unique=False)
+    op.create_index(
+        'ix_quotations_lead_id_created_at_id', 'quotations', ['lead_id', 'created_at', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_quotations_lead_id_created_at_id', table_name='quotations')
+    op.drop_index('ix_quotations_updated_at_id', table_name='quotations')
+    op.drop_index('ix_quotations_created_at_id', table_name='quotations')
+    op.drop_index('ix_leads_updated_at_id', table_name='leads')
+    op.drop_index('ix_leads_created_at_id', table_name='leads')
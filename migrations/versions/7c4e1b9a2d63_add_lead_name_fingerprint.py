@@ -0,0 +1,62 @@
+"""Add lead name fingerprint for duplicate matching
+
+Revision ID: 7c4e1b9a2d63
+Revises: 6b2f9d4e8a17
+Create Date: 2026-10-17 17:52:31.904476
+
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e1b9a2d63'
+down_revision: Union[str, None] = '6b2f9d4e8a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH = 10000
+
+
+def _fingerprint(name):
+    # frozen copy of app.util.fingerprint.name_fingerprint
+    if not name:
+        return None
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    tokens = sorted(set(re.split(r'[^0-9a-z]+', ascii_name)) - {''})
+    return ' '.join(tokens) or None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('leads', sa.Column('name_fingerprint', sa.String(), nullable=True))
+    bind = op.get_bind()
+    leads = sa.table('leads', sa.column('id'), sa.column('name'), sa.column('name_fingerprint'))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(leads.c.id, leads.c.name)
+            .where(leads.c.id > last_id)
+            .order_by(leads.c.id)
+            .limit(BATCH)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            leads.update()
+            .where(leads.c.id == sa.bindparam('b_id'))
+            .values(name_fingerprint=sa.bindparam('b_fingerprint')),
+            [{'b_id': row.id, 'b_fingerprint': _fingerprint(row.name)} for row in rows],
+        )
+        last_id = rows[-1].id
+    op.create_index(op.f('ix_leads_name_fingerprint'), 'leads', ['name_fingerprint'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_leads_name_fingerprint'), table_name='leads')
+    op.drop_column('leads', 'name_fingerprint')
@@ -0,0 +1,53 @@
+"""Add daily UTM attribution rollup tables
+
+Revision ID: 8e3a5c1f9d24
+Revises: 7c4e1b9a2d63
+Create Date: 2026-10-17 19:04:12.518307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3a5c1f9d24'
+down_revision: Union[str, None] = '7c4e1b9a2d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'lead_attribution_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('utm_source', sa.String(), nullable=False),
+        sa.Column('utm_medium', sa.String(), nullable=False),
+        sa.Column('utm_campaign', sa.String(), nullable=False),
+        sa.Column('leads', sa.Integer(), nullable=False),
+        sa.Column('qualified', sa.Integer(), nullable=False),
+        sa.Column('quoted', sa.Integer(), nullable=False),
+        sa.Column('converted', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'utm_source', 'utm_medium', 'utm_campaign'),
+    )
+    op.create_table(
+        'lead_attribution_dirty_days',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+    )
+    # Every existing day starts out dirty; the app's refresher (or
+    # `python -m app.util.analytics.rollup`) fills the rollups from there
+    op.execute(
+        'INSERT INTO lead_attribution_dirty_days (day) '
+        'SELECT DISTINCT date(created_at) FROM leads WHERE created_at IS NOT NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('lead_attribution_dirty_days')
+    op.drop_table('lead_attribution_daily')
@@ -0,0 +1,33 @@
+"""Index quotation_line_items.quotation_id
+
+Revision ID: 9f1c7d3b5a48
+Revises: 8e3a5c1f9d24
+Create Date: 2026-10-17 20:21:47.730941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f1c7d3b5a48'
+down_revision: Union[str, None] = '8e3a5c1f9d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        op.f('ix_quotation_line_items_quotation_id'),
+        'quotation_line_items',
+        ['quotation_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_quotation_line_items_quotation_id'), table_name='quotation_line_items')
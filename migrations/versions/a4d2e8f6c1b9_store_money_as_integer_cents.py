@@ -0,0 +1,79 @@
+"""Store money as integer cents
+
+Revision ID: a4d2e8f6c1b9
+Revises: 9f1c7d3b5a48
+Create Date: 2026-10-17 21:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d2e8f6c1b9'
+down_revision: Union[str, None] = '9f1c7d3b5a48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    ('quotation_line_items', 'price'),
+    ('quotations', 'total_price'),
+    ('lead_attribution_daily', 'revenue'),
+]
+TOTALS = (
+    'UPDATE quotations SET total_price = ('
+    'SELECT coalesce(sum(quantity * price), 0) FROM quotation_line_items '
+    'WHERE quotation_line_items.quotation_id = quotations.id)'
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table, column in COLUMNS:
+        if postgresql:
+            op.alter_column(
+                table,
+                column,
+                existing_type=sa.Float(),
+                type_=sa.BigInteger(),
+                postgresql_using=f'round({column} * 100)',
+            )
+        else:
+            op.execute(f'UPDATE {table} SET {column} = CAST(round({column} * 100) AS INTEGER)')
+    # totals were summed from floats, recompute them exactly from the cents
+    op.execute(TOTALS)
+    if postgresql:
+        op.alter_column('quotations', 'total_price', existing_type=sa.BigInteger(), nullable=False)
+        return
+    for table, column in COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                column, existing_type=sa.Float(), type_=sa.BigInteger(), nullable=False
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table, column in COLUMNS:
+        if postgresql:
+            op.alter_column(
+                table,
+                column,
+                existing_type=sa.BigInteger(),
+                type_=sa.Float(),
+                nullable=column == 'total_price',
+                postgresql_using=f'{column} / 100.0',
+            )
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.BigInteger(),
+                type_=sa.Float(),
+                nullable=column == 'total_price',
+            )
+        op.execute(f'UPDATE {table} SET {column} = {column} / 100.0')
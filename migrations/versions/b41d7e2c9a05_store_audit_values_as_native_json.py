@@ -0,0 +1,87 @@
+"""Store audit log before_values and after_values as native JSON
+
+Revision ID: b41d7e2c9a05
+Revises: 9c2e4f1a7b3d
+Create Date: 2026-10-17 10:03:17.552910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d7e2c9a05'
+down_revision: Union[str, None] = '9c2e4f1a7b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+COLUMNS = ('before_values', 'after_values')
+
+
+def _unwrap_strings(bind, column: str) -> None:
+    """Rewrite rows holding a json.dumps() string as the object it encodes"""
+    if bind.dialect.name == 'postgresql':
+        text = f"({column} #>> '{{}}')"
+        is_string = f"jsonb_typeof({column}) = 'string'"
+        unwrapped = f"{text}::jsonb"
+    else:
+        text = f"json_extract({column}, '$')"
+        is_string = f"json_type({column}) = 'text'"
+        unwrapped = text
+    # Only strings that hold an encoded object, array or null are touched
+    is_string += f" AND (substr({text}, 1, 1) IN ('{{', '[') OR {text} = 'null')"
+    last_id = 0
+    while True:
+        ids = bind.execute(
+            sa.text(
+                f"SELECT id FROM audit_logs WHERE id > :last_id AND {is_string} "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {'last_id': last_id, 'limit': BATCH_SIZE},
+        ).scalars().all()
+        if not ids:
+            break
+        bind.execute(
+            sa.text(
+                f"UPDATE audit_logs SET {column} = {unwrapped} "
+                "WHERE id >= :first AND id <= :last AND " + is_string
+            ),
+            {'first': ids[0], 'last': ids[-1]},
+        )
+        last_id = ids[-1]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for column in COLUMNS:
+            op.alter_column(
+                'audit_logs',
+                column,
+                existing_type=sa.JSON(),
+                type_=postgresql.JSONB(),
+                existing_nullable=True,
+                postgresql_using=f'{column}::jsonb'
+            )
+    for column in COLUMNS:
+        _unwrap_strings(bind, column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Values stay native JSON, only the column type is reverted
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in COLUMNS:
+            op.alter_column(
+                'audit_logs',
+                column,
+                existing_type=postgresql.JSONB(),
+                type_=sa.JSON(),
+                existing_nullable=True,
+                postgresql_using=f'{column}::json'
+            )
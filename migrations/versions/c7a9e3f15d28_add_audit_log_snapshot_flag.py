@@ -0,0 +1,32 @@
+"""Add audit log snapshot flag for field-level diffs
+
+Revision ID: c7a9e3f15d28
+Revises: b41d7e2c9a05
+Create Date: 2026-10-17 11:26:04.180377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a9e3f15d28'
+down_revision: Union[str, None] = 'b41d7e2c9a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows hold full before/after values, so they are all snapshots
+    op.add_column(
+        'audit_logs',
+        sa.Column('snapshot', sa.Boolean(), server_default=sa.true(), nullable=False)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('audit_logs', 'snapshot')
@@ -0,0 +1,119 @@
+"""Partition audit_logs by month on created_at
+
+Revision ID: d58f0b6a2e91
+Revises: c7a9e3f15d28
+Create Date: 2026-10-17 12:40:52.904116
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd58f0b6a2e91'
+down_revision: Union[str, None] = 'c7a9e3f15d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions created past the current month, later ones come from
+# `python -m app.util.audit.partitions`
+MONTHS_AHEAD = 3
+INDEXES = {
+    'ix_audit_logs_id': ['id'],
+    'ix_audit_logs_created_at_id': ['created_at', 'id'],
+    'ix_audit_logs_entity': ['entity_type', 'entity_id', 'created_at'],
+    'ix_audit_logs_user_id_created_at': ['user_id', 'created_at'],
+}
+
+
+def _add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _months(bind) -> list:
+    first = bind.execute(sa.text('SELECT min(created_at) FROM audit_logs_unpartitioned')).scalar()
+    current = datetime.datetime.utcnow().date().replace(day=1)
+    month = first.date().replace(day=1) if first else current
+    months = []
+    while month <= _add_months(current, MONTHS_AHEAD):
+        months.append(month)
+        month = _add_months(month, 1)
+    return months
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    op.rename_table('audit_logs', 'audit_logs_unpartitioned')
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX IF EXISTS {name} RENAME TO {name}_old')
+    op.execute("UPDATE audit_logs_unpartitioned SET created_at = now() WHERE created_at IS NULL")
+    op.execute(
+        'CREATE TABLE audit_logs (LIKE audit_logs_unpartitioned INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE (created_at)'
+    )
+    op.execute('ALTER TABLE audit_logs ALTER COLUMN created_at SET NOT NULL')
+    # The partition key has to be part of the primary key
+    op.create_primary_key('audit_logs_pkey_partitioned', 'audit_logs', ['id', 'created_at'])
+    op.create_foreign_key(
+        'audit_logs_user_id_fkey_partitioned', 'audit_logs', 'users', ['user_id'], ['id']
+    )
+    # Keep the id sequence alive when the old table is dropped
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+
+    for month in _months(bind):
+        end = _add_months(month, 1)
+        name = f'audit_logs_y{month.year:04d}m{month.month:02d}'
+        op.execute(
+            f"CREATE TABLE {name} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        # One month per statement keeps each copy bounded on large tables
+        op.execute(
+            f'INSERT INTO audit_logs SELECT * FROM audit_logs_unpartitioned '
+            f"WHERE created_at >= '{month.isoformat()}' AND created_at < '{end.isoformat()}'"
+        )
+
+    # Catches rows past the last monthly partition instead of failing the insert
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    copied, total = (
+        bind.execute(sa.text(f'SELECT count(*) FROM {table}')).scalar()
+        for table in ('audit_logs', 'audit_logs_unpartitioned')
+    )
+    if copied != total:
+        raise RuntimeError(f'Copied {copied} of {total} audit_logs rows, aborting')
+    op.drop_table('audit_logs_unpartitioned')
+    op.execute('ALTER TABLE audit_logs RENAME CONSTRAINT audit_logs_pkey_partitioned TO audit_logs_pkey')
+    op.execute(
+        'ALTER TABLE audit_logs RENAME CONSTRAINT audit_logs_user_id_fkey_partitioned '
+        'TO audit_logs_user_id_fkey'
+    )
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'audit_logs', columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX IF EXISTS {name} RENAME TO {name}_old')
+    op.execute(
+        'CREATE TABLE audit_logs_unpartitioned (LIKE audit_logs INCLUDING DEFAULTS)'
+    )
+    op.execute('INSERT INTO audit_logs_unpartitioned SELECT * FROM audit_logs')
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs_unpartitioned.id')
+    op.drop_table('audit_logs')
+    op.rename_table('audit_logs_unpartitioned', 'audit_logs')
+    op.create_primary_key('audit_logs_pkey', 'audit_logs', ['id'])
+    op.create_foreign_key('audit_logs_user_id_fkey', 'audit_logs', 'users', ['user_id'], ['id'])
+    for name, columns in INDEXES.items():
+        op.create_index(name, 'audit_logs', columns, unique=False)
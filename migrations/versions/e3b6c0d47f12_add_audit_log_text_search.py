@@ -0,0 +1,67 @@
+"""Add trigram / FTS5 text search on audit log action and context
+
+Revision ID: e3b6c0d47f12
+Revises: d58f0b6a2e91
+Create Date: 2026-10-17 14:05:33.617248
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b6c0d47f12'
+down_revision: Union[str, None] = 'd58f0b6a2e91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FTS_DELETE = (
+    "INSERT INTO audit_logs_fts(audit_logs_fts, rowid, action, context) "
+    "VALUES ('delete', old.id, old.action, old.context);"
+)
+FTS_INSERT = (
+    "INSERT INTO audit_logs_fts(rowid, action, context) "
+    "VALUES (new.id, new.action, new.context);"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index(
+            'ix_audit_logs_action_trgm', 'audit_logs', ['action'],
+            postgresql_using='gin', postgresql_ops={'action': 'gin_trgm_ops'}
+        )
+        op.create_index(
+            'ix_audit_logs_context_trgm', 'audit_logs', ['context'],
+            postgresql_using='gin', postgresql_ops={'context': 'gin_trgm_ops'}
+        )
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE audit_logs_fts USING fts5(action, context, "
+            "content='audit_logs', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(f"CREATE TRIGGER audit_logs_fts_ai AFTER INSERT ON audit_logs BEGIN {FTS_INSERT} END")
+        op.execute(f"CREATE TRIGGER audit_logs_fts_ad AFTER DELETE ON audit_logs BEGIN {FTS_DELETE} END")
+        op.execute(
+            f"CREATE TRIGGER audit_logs_fts_au AFTER UPDATE ON audit_logs "
+            f"BEGIN {FTS_DELETE} {FTS_INSERT} END"
+        )
+        # Index the rows that already exist
+        op.execute("INSERT INTO audit_logs_fts(audit_logs_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_audit_logs_context_trgm', table_name='audit_logs')
+        op.drop_index('ix_audit_logs_action_trgm', table_name='audit_logs')
+    elif dialect == 'sqlite':
+        for trigger in ('audit_logs_fts_au', 'audit_logs_fts_ad', 'audit_logs_fts_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS audit_logs_fts')
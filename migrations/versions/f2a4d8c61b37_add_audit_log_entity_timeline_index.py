@@ -0,0 +1,35 @@
+"""Replace audit log entity index with a timeline index ending in id
+
+Revision ID: f2a4d8c61b37
+Revises: e3b6c0d47f12
+Create Date: 2026-10-17 15:48:09.226541
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a4d8c61b37'
+down_revision: Union[str, None] = 'e3b6c0d47f12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_audit_logs_entity_timeline',
+        'audit_logs',
+        ['entity_type', 'entity_id', 'created_at', 'id'],
+        unique=False
+    )
+    op.drop_index('ix_audit_logs_entity', table_name='audit_logs')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_audit_logs_entity', 'audit_logs', ['entity_type', 'entity_id', 'created_at'], unique=False)
+    op.drop_index('ix_audit_logs_entity_timeline', table_name='audit_logs')